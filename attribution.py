@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Traffic Attribution
+Attributes TCP bytes to local services, processes and cgroups from one bulk
+`ss` read per interval, keeping a bounded top-N of heavy hitters
+"""
+
+import time
+import threading
+import subprocess
+import logging
+
+import metrics
+
+# Configuration
+SS_BIN = 'ss'
+ATTRIBUTION_INTERVAL = 5  # seconds between socket table reads
+TOP_CAPACITY = 256  # keys tracked per dimension; memory stays flat beyond this
+TOP_DEFAULT = 10
+DIMENSIONS = ('port', 'process', 'cgroup')
+LOOPBACK_PREFIXES = ('127.', '::1', '::ffff:127.')
+
+logger = logging.getLogger(__name__)
+
+def parse_address(text):
+    """Split an ss address such as 10.0.0.1:443, [::1]:22 or 10.0.0.1%eth0:53 into (host, port)"""
+    host, _, port = text.rpartition(':')
+    host = host.strip('[]').split('%', 1)[0]
+    try:
+        return host, int(port)
+    except ValueError:
+        return host, 0
+
+def parse_users(text):
+    """Return (process name, pid) from an ss users:(("name",pid=1,fd=3)) field"""
+    start = text.find('(("')
+    if start < 0:
+        return None, None
+    name_end = text.find('"', start + 3)
+    name = text[start + 3:name_end]
+    pid_start = text.find('pid=', name_end)
+    pid = None
+    if pid_start >= 0:
+        digits = text[pid_start + 4:].split(',', 1)[0].rstrip(')')
+        pid = int(digits) if digits.isdigit() else None
+    return name, pid
+
+def parse_ss(output):
+    """Parse `ss -tainpH` output.
+
+    Returns (listening ports, sockets) where each socket is a tuple
+    (local, peer, process, pid, rx_bytes, tx_bytes) for connections
+    with byte counters.
+    """
+    listening = set()
+    sockets = []
+    current = None
+
+    for line in output.splitlines():
+        if not line:
+            continue
+        if line[0] in ' \t':
+            # Info line belonging to the previous socket
+            if current is None:
+                continue
+            rx = tx = None
+            for field in line.split():
+                if field.startswith('bytes_received:'):
+                    rx = int(field[15:])
+                elif field.startswith('bytes_acked:'):
+                    tx = int(field[12:])
+            if rx is not None or tx is not None:
+                sockets.append(current + (rx or 0, tx or 0))
+            current = None
+            continue
+
+        fields = line.split()
+        if len(fields) < 5:
+            current = None
+            continue
+        state, local, peer = fields[0], fields[3], fields[4]
+        if state == 'LISTEN':
+            listening.add(parse_address(local)[1])
+            current = None
+            continue
+
+        process, pid = parse_users(' '.join(fields[5:]))
+        current = (local, peer, process, pid)
+
+    return listening, sockets
+
+def read_cgroup(pid):
+    """Return the leaf cgroup name of a process (e.g. xray.service), or None"""
+    try:
+        with open(f'/proc/{pid}/cgroup', 'r') as f:
+            for line in f:
+                path = line.rstrip('\n').split(':', 2)[-1]
+                if path and path != '/':
+                    return path.rsplit('/', 1)[-1]
+    except OSError:
+        pass
+    return None
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter summary over (rx, tx) byte counts.
+
+    At most `capacity` keys are kept. A new key arriving when full evicts
+    the smallest entry and inherits its total as `error`, so a reported
+    total overestimates the true one by at most `error`.
+    """
+
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self.entries = {}  # key: [rx, tx, error]
+
+    def add(self, key, rx, tx):
+        """Account bytes to a key"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[0] += rx
+            entry[1] += tx
+            return
+        if len(self.entries) >= self.capacity:
+            victim = min(self.entries, key=lambda k: self.estimate(self.entries[k]))
+            error = self.estimate(self.entries.pop(victim))
+        else:
+            error = 0
+        self.entries[key] = [rx, tx, error]
+
+    @staticmethod
+    def estimate(entry):
+        """Upper bound of a key's total bytes"""
+        return entry[0] + entry[1] + entry[2]
+
+    def top(self, n):
+        """Return the n largest [(key, rx, tx, error)]"""
+        ranked = sorted(self.entries.items(), key=lambda item: self.estimate(item[1]), reverse=True)
+        return [(key, rx, tx, error) for key, (rx, tx, error) in ranked[:n]]
+
+class TrafficAttributor:
+    """Background thread reading the TCP socket table once per interval.
+
+    Byte counter deltas per connection are summed by local service port,
+    process and cgroup, then fed to one SpaceSaving summary per dimension
+    (totals since start) and kept as per-interval rates for the last read.
+    Loopback connections are skipped since they never touch an interface.
+    Bytes of connections that open and close between two reads are not seen.
+    """
+
+    def __init__(self, interval=ATTRIBUTION_INTERVAL, capacity=TOP_CAPACITY, ss_bin=SS_BIN):
+        self.interval = interval
+        self.capacity = capacity
+        self.ss_bin = ss_bin
+        self.summaries = {dimension: SpaceSaving(capacity) for dimension in DIMENSIONS}
+        self.rates = {dimension: {} for dimension in DIMENSIONS}
+        self.previous = None  # (local, peer): (rx_bytes, tx_bytes)
+        self.last_poll = None
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the background reader"""
+        if self.running:
+            return
+
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"Traffic attribution started with {self.interval}s interval")
+
+    def stop(self):
+        """Stop the background reader"""
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        logger.info("Traffic attribution stopped")
+
+    def read_sockets(self):
+        """Run ss once for every TCP socket"""
+        try:
+            result = subprocess.run(
+                [self.ss_bin, '-tainpH'],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            metrics.SUBPROCESS_FAILURES.inc(command='ss')
+            raise RuntimeError(f"Could not run {self.ss_bin}: {e}")
+        if result.returncode != 0:
+            metrics.SUBPROCESS_FAILURES.inc(command='ss')
+            raise RuntimeError(f"{self.ss_bin} failed: {result.stderr.strip()}")
+        return parse_ss(result.stdout)
+
+    def poll(self):
+        """Read the socket table and account the deltas since the previous read"""
+        listening, sockets = self.read_sockets()
+        now = time.monotonic()
+
+        current = {}
+        interval_totals = {dimension: {} for dimension in DIMENSIONS}
+        cgroups = {}
+        for local, peer, process, pid, rx_bytes, tx_bytes in sockets:
+            local_host, local_port = parse_address(local)
+            peer_host = parse_address(peer)[0]
+            if local_host.startswith(LOOPBACK_PREFIXES) or peer_host.startswith(LOOPBACK_PREFIXES):
+                continue
+
+            key = (local, peer)
+            current[key] = (rx_bytes, tx_bytes)
+            if self.previous is None:
+                continue  # First read only sets the baseline
+
+            last = self.previous.get(key)
+            # New connections count from zero; counters never decrease for a live socket
+            rx = rx_bytes - last[0] if last is not None and rx_bytes >= last[0] else rx_bytes
+            tx = tx_bytes - last[1] if last is not None and tx_bytes >= last[1] else tx_bytes
+            if not rx and not tx:
+                continue
+
+            if local_port in listening:
+                port_key = f"local:{local_port}"
+            else:
+                port_key = f"remote:{parse_address(peer)[1]}"
+            if pid is not None and pid not in cgroups:
+                cgroups[pid] = read_cgroup(pid)
+            keys = {
+                'port': port_key,
+                'process': process or 'unknown',
+                'cgroup': cgroups.get(pid) or 'unknown'
+            }
+            for dimension, name in keys.items():
+                totals = interval_totals[dimension].setdefault(name, [0, 0])
+                totals[0] += rx
+                totals[1] += tx
+
+        with self.lock:
+            elapsed = now - self.last_poll if self.last_poll is not None else None
+            for dimension, totals in interval_totals.items():
+                summary = self.summaries[dimension]
+                for name, (rx, tx) in totals.items():
+                    summary.add(name, rx, tx)
+                # Keep only as many per-interval rates as the summary may hold
+                largest = sorted(totals.items(), key=lambda item: item[1][0] + item[1][1], reverse=True)
+                self.rates[dimension] = {
+                    name: (rx / elapsed, tx / elapsed) for name, (rx, tx) in largest[:self.capacity]
+                } if elapsed else {}
+            self.previous = current
+            self.last_poll = now
+
+    def top(self, dimension='port', n=TOP_DEFAULT):
+        """Top-N keys of a dimension by bytes since start, with their latest rates"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+
+        with self.lock:
+            ranked = self.summaries[dimension].top(n)
+            rates = self.rates[dimension]
+            top = []
+            for name, rx, tx, error in ranked:
+                rx_rate, tx_rate = rates.get(name, (0.0, 0.0))
+                top.append({
+                    'key': name,
+                    'rx': rx,
+                    'tx': tx,
+                    'total': rx + tx,
+                    'error': error,
+                    'rx_rate': rx_rate,
+                    'tx_rate': tx_rate
+                })
+        return {
+            'by': dimension,
+            'since': self.started_at,
+            'interval': self.interval,
+            'tracked': len(self.summaries[dimension].entries),
+            'capacity': self.capacity,
+            'top': top,
+            'timestamp': time.time()
+        }
+
+    def _poll_loop(self):
+        """Main polling loop"""
+        while self.running:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error reading socket table: {e}")
+
+            self.stop_event.wait(self.interval)
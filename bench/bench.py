@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Benchmark Harness
+Load-tests the HTTP server against a fake /sys/class/net tree and a stub
+vnstat binary, and micro-benchmarks stats generation.
+
+Usage:
+    python3 bench/bench.py [--target server|local] [--clients 32] [--duration 10] [--streams 16]
+                           [--interfaces 4] [--iterations 200] [--json results.json] [server args...]
+
+Unknown arguments are passed to the server (e.g. --mode single --workers 4).
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import random
+import shutil
+import socket
+import sqlite3
+import tempfile
+import argparse
+import threading
+import subprocess
+import http.client
+import logging
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# Configuration
+DEFAULT_CLIENTS = 32
+DEFAULT_DURATION = 10  # seconds per load phase
+DEFAULT_STREAMS = 16
+DEFAULT_INTERFACES = 4
+DEFAULT_ITERATIONS = 200  # generate_stats() calls in the micro-benchmark
+TRAFFIC_TICK = 0.5  # seconds between fake counter updates
+STARTUP_TIMEOUT = 30
+STATIC_PATHS = ['/', '/style.css', '/script.js']
+VNSTAT_STUB = '''#!{python}
+import os
+import sys
+if '--version' in sys.argv:
+    print('vnStat 2.9 by Teemu Toivola <tst at iki dot fi>')
+    sys.exit(0)
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vnstat.json')) as f:
+    sys.stdout.write(f.read())
+'''
+# Tables of vnstat 2.x's database that the sqlite backends read
+VNSTAT_SCHEMA = '''
+CREATE TABLE info (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, value TEXT NOT NULL);
+CREATE TABLE interface (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, alias TEXT, active INTEGER NOT NULL,
+    created DATE NOT NULL, updated DATE NOT NULL, rxcounter INTEGER NOT NULL, txcounter INTEGER NOT NULL,
+    rxtotal INTEGER NOT NULL, txtotal INTEGER NOT NULL);
+CREATE TABLE fiveminute (id INTEGER PRIMARY KEY, interface INTEGER REFERENCES interface(id) ON DELETE CASCADE,
+    date DATE NOT NULL, rx INTEGER NOT NULL, tx INTEGER NOT NULL, CONSTRAINT u UNIQUE (interface, date));
+CREATE TABLE hour (id INTEGER PRIMARY KEY, interface INTEGER REFERENCES interface(id) ON DELETE CASCADE,
+    date DATE NOT NULL, rx INTEGER NOT NULL, tx INTEGER NOT NULL, CONSTRAINT u UNIQUE (interface, date));
+CREATE TABLE day (id INTEGER PRIMARY KEY, interface INTEGER REFERENCES interface(id) ON DELETE CASCADE,
+    date DATE NOT NULL, rx INTEGER NOT NULL, tx INTEGER NOT NULL, CONSTRAINT u UNIQUE (interface, date));
+CREATE TABLE month (id INTEGER PRIMARY KEY, interface INTEGER REFERENCES interface(id) ON DELETE CASCADE,
+    date DATE NOT NULL, rx INTEGER NOT NULL, tx INTEGER NOT NULL, CONSTRAINT u UNIQUE (interface, date));
+'''
+
+class FakeEnvironment:
+    """Temporary install dir, /sys/class/net tree, /proc/net/dev file and vnstat stub"""
+
+    def __init__(self, root, interfaces=DEFAULT_INTERFACES, seed=1):
+        self.root = root
+        self.names = ['eth0'] + [f'veth{i}' for i in range(1, interfaces)]
+        self.random = random.Random(seed)
+        self.counters = {name: [self.random.randrange(2 ** 40) for _ in range(4)] for name in self.names}
+        self.running = False
+        self.thread = None
+
+        self.install_dir = os.path.join(root, 'www')
+        self.sysfs_dir = os.path.join(root, 'sys', 'class', 'net')
+        self.proc_net_dev = os.path.join(root, 'proc', 'net', 'dev')
+        self.vnstat_bin = os.path.join(root, 'bin', 'vnstat')
+        self.vnstat_db = os.path.join(root, 'var', 'vnstat.db')
+        self.data_dir = os.path.join(root, 'data')
+
+    def create(self):
+        """Lay out the fake tree"""
+        os.makedirs(os.path.join(self.install_dir, 'api'), exist_ok=True)
+        for filename in ('index.html', 'style.css', 'script.js'):
+            shutil.copy(os.path.join(REPO_DIR, 'dashboard', filename), self.install_dir)
+
+        os.makedirs(os.path.dirname(self.proc_net_dev), exist_ok=True)
+        for name in self.names:
+            os.makedirs(os.path.join(self.sysfs_dir, name, 'statistics'), exist_ok=True)
+        self.write_counters()
+
+        os.makedirs(os.path.dirname(self.vnstat_bin), exist_ok=True)
+        with open(self.vnstat_bin, 'w') as f:
+            f.write(VNSTAT_STUB.format(python=sys.executable))
+        os.chmod(self.vnstat_bin, 0o755)
+        document = self.vnstat_document()
+        with open(os.path.join(os.path.dirname(self.vnstat_bin), 'vnstat.json'), 'w') as f:
+            json.dump(document, f)
+        self.write_vnstat_db(document)
+
+    def vnstat_document(self):
+        """vnstat 2.x JSON with default retention: 48h of 5-minute and hourly entries, 30 days, 12 months"""
+        now = time.localtime()
+        interfaces = []
+        for name in self.names:
+            fiveminutes = []
+            for offset in range(575, -1, -1):
+                moment = time.localtime(time.time() - offset * 300)
+                fiveminutes.append({
+                    'date': {'year': moment.tm_year, 'month': moment.tm_mon, 'day': moment.tm_mday},
+                    'time': {'hour': moment.tm_hour, 'minute': moment.tm_min // 5 * 5},
+                    'rx': self.random.randrange(10 ** 7, 10 ** 9),
+                    'tx': self.random.randrange(10 ** 7, 10 ** 9)
+                })
+            hours = [
+                dict(entry, time={'hour': entry['time']['hour'], 'minute': 0})
+                for entry in fiveminutes[::12]
+            ]
+            days = []
+            for offset in range(29, -1, -1):
+                day = time.localtime(time.time() - offset * 86400)
+                days.append({
+                    'date': {'year': day.tm_year, 'month': day.tm_mon, 'day': day.tm_mday},
+                    'rx': self.random.randrange(10 ** 9, 10 ** 11),
+                    'tx': self.random.randrange(10 ** 9, 10 ** 11)
+                })
+            months = [
+                {
+                    'date': {'year': now.tm_year - (now.tm_mon - i <= 0), 'month': (now.tm_mon - i - 1) % 12 + 1},
+                    'rx': self.random.randrange(10 ** 11, 10 ** 13),
+                    'tx': self.random.randrange(10 ** 11, 10 ** 13)
+                }
+                for i in range(11, -1, -1)
+            ]
+            interfaces.append({
+                'name': name,
+                'traffic': {'fiveminute': fiveminutes, 'hour': hours, 'day': days, 'month': months}
+            })
+        return {'vnstatversion': '2.9', 'jsonversion': '2', 'interfaces': interfaces}
+
+    def write_vnstat_db(self, document):
+        """Write the same traffic to a database with vnstat 2.x's schema"""
+        os.makedirs(os.path.dirname(self.vnstat_db), exist_ok=True)
+        db = sqlite3.connect(self.vnstat_db)
+        db.executescript(VNSTAT_SCHEMA)
+        db.execute("INSERT INTO info (name, value) VALUES ('dbversion', '1'), ('vnstatversion', '2.9')")
+        for interface_id, interface in enumerate(document['interfaces'], 1):
+            db.execute("INSERT INTO interface VALUES (?, ?, NULL, 1, datetime('now'), datetime('now'), 0, 0, 0, 0)",
+                       (interface_id, interface['name']))
+            for table in ('fiveminute', 'hour', 'day', 'month'):
+                rows = []
+                for entry in interface['traffic'][table]:
+                    date, clock = entry['date'], entry.get('time', {})
+                    text = f"{date['year']:04d}-{date['month']:02d}-{date.get('day', 1):02d}"
+                    if table in ('fiveminute', 'hour'):
+                        text += f" {clock['hour']:02d}:{clock['minute']:02d}"
+                    rows.append((interface_id, text, entry['rx'], entry['tx']))
+                db.executemany(f"INSERT OR REPLACE INTO {table} (interface, date, rx, tx) VALUES (?, ?, ?, ?)", rows)
+        db.commit()
+        db.close()
+
+    def write_counters(self):
+        """Write the current counters to /proc/net/dev and sysfs"""
+        lines = [
+            'Inter-|   Receive                                                |  Transmit\n',
+            ' face |bytes    packets errs drop fifo frame compressed multicast|'
+            'bytes    packets errs drop fifo colls carrier compressed\n'
+        ]
+        for name, (rx_bytes, rx_packets, tx_bytes, tx_packets) in self.counters.items():
+            lines.append(f'{name:>6}: {rx_bytes} {rx_packets} 0 0 0 0 0 0 {tx_bytes} {tx_packets} 0 0 0 0 0 0\n')
+            stats_dir = os.path.join(self.sysfs_dir, name, 'statistics')
+            for filename, value in (('rx_bytes', rx_bytes), ('tx_bytes', tx_bytes)):
+                with open(os.path.join(stats_dir, filename), 'w') as f:
+                    f.write(f'{value}\n')
+
+        temp_file = self.proc_net_dev + '.tmp'
+        with open(temp_file, 'w') as f:
+            f.writelines(lines)
+        os.replace(temp_file, self.proc_net_dev)
+
+    def start(self):
+        """Advance the counters in the background"""
+        self.running = True
+        self.thread = threading.Thread(target=self._traffic_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop advancing the counters"""
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def _traffic_loop(self):
+        """Main counter update loop"""
+        while self.running:
+            for counters in self.counters.values():
+                rx = self.random.randrange(10 ** 5, 10 ** 7)
+                tx = self.random.randrange(10 ** 5, 10 ** 7)
+                counters[0] += rx
+                counters[1] += rx // 1400 + 1
+                counters[2] += tx
+                counters[3] += tx // 1400 + 1
+            self.write_counters()
+            time.sleep(TRAFFIC_TICK)
+
+def configure_server(server, env):
+    """Point an imported server module at the fake environment"""
+    import collector
+    server.INSTALL_DIR = env.install_dir
+    server.STATS_FILE = os.path.join(env.install_dir, 'api', 'stats.json')
+    server.GENERATE_SCRIPT = os.path.join(env.install_dir, 'api', 'generate_json.sh')
+    server.static_assets = server.StaticAssetCache(env.install_dir)
+    server.native_collector = collector.NativeCollector(
+        interface=env.names[0],
+        sysfs_dir=env.sysfs_dir,
+        proc_net_dev=env.proc_net_dev,
+        vnstat_bin=env.vnstat_bin
+    )
+
+def serve(root, server_args):
+    """Run server.py in this process against the fake environment at root"""
+    import server
+    env = FakeEnvironment(root, len(os.listdir(os.path.join(root, 'sys', 'class', 'net'))))
+    configure_server(server, env)
+    sys.argv = ['server.py', '--data-dir', env.data_dir, '--vnstat-db', env.vnstat_db] + server_args
+    server.main()
+
+def free_port():
+    """Ask the kernel for an unused TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def process_usage(pid):
+    """Return (cpu seconds, rss bytes, peak rss bytes) for a process"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    memory = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmHWM'):
+                memory[key] = int(value.split()[0]) * 1024
+    return cpu, memory.get('VmRSS', 0), memory.get('VmHWM', 0)
+
+def wait_until_ready(port, process, timeout=STARTUP_TIMEOUT):
+    """Poll /api/health until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+def client_worker(port, paths, headers, deadline, latencies, errors):
+    """Issue requests over one keep-alive connection until the deadline"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            continue
+
+        if response.status >= 400:
+            errors.append(path)
+        else:
+            latencies.append(time.perf_counter() - start)
+        if response.will_close:
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.close()
+
+def stream_worker(port, deadline, first_event, events, errors):
+    """Hold one /api/stream connection open and count received events"""
+    start = time.perf_counter()
+    try:
+        sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+        sock.sendall(b'GET /api/stream HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n')
+        data = sock.recv(65536)
+        if not data.startswith(b'HTTP/1.1 200') and not data.startswith(b'HTTP/1.0 200'):
+            errors.append('/api/stream')
+            sock.close()
+            return
+        first_event.append(time.perf_counter() - start)
+
+        count = data.count(b'\nevent: ')
+        while time.monotonic() < deadline:
+            sock.settimeout(max(0.1, deadline - time.monotonic()))
+            try:
+                chunk = sock.recv(65536)
+            except socket.timeout:
+                break
+            if not chunk:
+                errors.append('/api/stream')
+                break
+            count += chunk.count(b'event: ')
+        events.append(count)
+        sock.close()
+    except OSError:
+        errors.append('/api/stream')
+
+def run_phase(name, pid, port, duration, clients=0, paths=None, headers=None, streams=0):
+    """Run one load phase and return its measurements"""
+    latencies = []
+    errors = []
+    first_event = []
+    events = []
+    deadline = time.monotonic() + duration
+
+    threads = [
+        threading.Thread(target=client_worker, args=(port, paths, headers or {}, deadline, latencies, errors))
+        for _ in range(clients)
+    ]
+    threads += [
+        threading.Thread(target=stream_worker, args=(port, deadline, first_event, events, errors))
+        for _ in range(streams)
+    ]
+
+    cpu_before = process_usage(pid)[0]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    cpu_after, rss, peak_rss = process_usage(pid)
+
+    latencies.sort()
+    first_event.sort()
+    result = {
+        'phase': name,
+        'clients': clients,
+        'streams': streams,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'cpu_seconds': cpu_after - cpu_before,
+        'cpu_percent': (cpu_after - cpu_before) / elapsed * 100,
+        'rss_mb': rss / 2 ** 20,
+        'peak_rss_mb': peak_rss / 2 ** 20
+    }
+    if streams:
+        result['stream_connect_p50_ms'] = percentile(first_event, 0.50) * 1000
+        result['stream_connect_p99_ms'] = percentile(first_event, 0.99) * 1000
+        result['stream_events'] = sum(events)
+    return result
+
+def run_load(args, env, server_args):
+    """Start the target server and run every load phase against it"""
+    port = free_port()
+    log_path = os.path.join(env.root, 'server.log')
+    if args.target == 'local':
+        command = [sys.executable, os.path.join(REPO_DIR, 'server_local.py'), '--port', str(port)] + server_args
+    else:
+        command = [sys.executable, os.path.abspath(__file__), 'serve', env.root, '--port', str(port)] + server_args
+
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, cwd=REPO_DIR, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_until_ready(port, process)
+        # Let the sampler and first stats refresh settle before measuring
+        time.sleep(1)
+        gzip_headers = {'Accept-Encoding': 'gzip'}
+        results = [
+            run_phase('stats', process.pid, port, args.duration, args.clients, ['/api/stats'], gzip_headers),
+            run_phase('static', process.pid, port, args.duration, args.clients, STATIC_PATHS, gzip_headers),
+            run_phase('mixed', process.pid, port, args.duration, args.clients,
+                      ['/api/stats'] * 3 + STATIC_PATHS, gzip_headers),
+        ]
+        if args.streams:
+            results.append(run_phase('stream', process.pid, port, args.duration,
+                                     args.clients, ['/api/stats'], gzip_headers, args.streams))
+        return results
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def run_micro(args, env):
+    """Time generate_stats() and snapshot encoding in this process"""
+    import server
+    logging.getLogger().setLevel(logging.WARNING)
+    configure_server(server, env)
+    server.COLLECTOR = 'native'
+
+    database = server.vnstat_db.VnstatDatabase(env.vnstat_db)
+
+    def query_database():
+        database.signature = None  # Force the queries instead of the mtime-cached result
+        return database.usage()
+
+    results = []
+    for name, func in (
+        ('generate_stats', server.generate_stats),
+        ('snapshot_encode', lambda: server.StatsSnapshot(stats)),
+        ('encode_msgpack', lambda: server.encoding.encode(stats, 'msgpack')),
+        ('encode_packed', lambda: server.encoding.encode(stats, 'packed')),
+        ('vnstat_json', server.native_collector.read_vnstat_usage),
+        ('vnstat_sqlite', query_database),
+        ('vnstat_cached', database.usage)
+    ):
+        stats = server.generate_stats()
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results.append({
+            'benchmark': name,
+            'iterations': len(timings),
+            'mean_ms': sum(timings) / len(timings) * 1000,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000
+        })
+    database.close()
+    return results
+
+def print_report(load_results, micro_results):
+    """Print results as plain tables"""
+    if load_results:
+        print(f"{'phase':<8} {'clients':>7} {'streams':>7} {'requests':>9} {'req/s':>9} {'p50 ms':>8} "
+              f"{'p99 ms':>8} {'errors':>6} {'cpu %':>6} {'rss MB':>7}")
+        for r in load_results:
+            print(f"{r['phase']:<8} {r['clients']:>7} {r['streams']:>7} {r['requests']:>9} {r['throughput']:>9.0f} "
+                  f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>6} {r['cpu_percent']:>6.1f} "
+                  f"{r['rss_mb']:>7.1f}")
+            if r['streams']:
+                print(f"         stream connect p50 {r['stream_connect_p50_ms']:.2f} ms, "
+                      f"p99 {r['stream_connect_p99_ms']:.2f} ms, {r['stream_events']} events received")
+        print()
+
+    if micro_results:
+        print(f"{'benchmark':<16} {'iterations':>10} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for r in micro_results:
+            print(f"{r['benchmark']:<16} {r['iterations']:>10} {r['mean_ms']:>8.3f} {r['p50_ms']:>8.3f} "
+                  f"{r['p99_ms']:>8.3f}")
+
+def parse_args():
+    """Parse command line arguments; unknown ones are passed to the server"""
+    parser = argparse.ArgumentParser(description='V2RayZone Dash benchmark harness')
+    parser.add_argument('--target', choices=['server', 'local'], default='server',
+                        help='server.py on the fake tree, or server_local.py with mock data')
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS,
+                        help='Concurrent keep-alive HTTP clients')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help='Seconds per load phase')
+    parser.add_argument('--streams', type=int, default=DEFAULT_STREAMS,
+                        help='Concurrent /api/stream clients (0 to skip the stream phase)')
+    parser.add_argument('--interfaces', type=int, default=DEFAULT_INTERFACES,
+                        help='Interfaces in the fake /sys/class/net tree')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS,
+                        help='generate_stats() calls in the micro-benchmark')
+    parser.add_argument('--skip-load', action='store_true', help='Only run the micro-benchmark')
+    parser.add_argument('--skip-micro', action='store_true', help='Only run the load test')
+    parser.add_argument('--json', help='Also write results to this file')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the fake traffic')
+    return parser.parse_known_args()
+
+def main():
+    """Main benchmark function"""
+    if len(sys.argv) > 2 and sys.argv[1] == 'serve':
+        serve(sys.argv[2], sys.argv[3:])
+        return 0
+
+    args, server_args = parse_args()
+    root = tempfile.mkdtemp(prefix='v2rayzone-bench-')
+    env = FakeEnvironment(root, args.interfaces, args.seed)
+    env.create()
+    env.start()
+
+    try:
+        load_results = [] if args.skip_load else run_load(args, env, server_args)
+        micro_results = [] if args.skip_micro else run_micro(args, env)
+    finally:
+        env.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+    print_report(load_results, micro_results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'target': args.target, 'load': load_results, 'micro': micro_results}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
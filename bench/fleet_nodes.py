@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Fleet Stand-in Nodes
+Serves /api/stats from many local ports so fleet mode can be tried without real VPSes.
+
+Usage:
+    python3 bench/fleet_nodes.py [--nodes 100] [--base-port 21000] [--delay 0.05] [--down 5]
+    python3 server.py --fleet-file /tmp/fleet_nodes.txt
+
+Nodes keep connections alive and answer If-None-Match with 304 like server.py.
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+
+# Configuration
+DEFAULT_NODES = 100
+DEFAULT_BASE_PORT = 21000
+NODES_FILE = '/tmp/fleet_nodes.txt'
+UPDATE_INTERVAL = 5  # seconds between stats changes on each node
+
+class StandInNode:
+    """One fake dashboard with slowly changing stats"""
+
+    def __init__(self, index, delay, seed):
+        self.index = index
+        self.delay = delay
+        self.random = random.Random(seed + index)
+        self.today = self.random.randrange(10 ** 9, 10 ** 11)
+        self.month = self.today * self.random.randint(5, 30)
+        self.body = b''
+        self.etag = ''
+        self.update()
+
+    def update(self):
+        """Advance counters and re-encode the stats document"""
+        rx_rate = self.random.randrange(10 ** 5, 10 ** 8)
+        tx_rate = self.random.randrange(10 ** 5, 10 ** 8)
+        self.today += (rx_rate + tx_rate) * UPDATE_INTERVAL
+        self.month += (rx_rate + tx_rate) * UPDATE_INTERVAL
+        stats = {
+            'current': {'rx_rate': rx_rate, 'tx_rate': tx_rate},
+            'today': {'rx': self.today // 2, 'tx': self.today // 2, 'total': self.today},
+            'month': {'rx': self.month // 2, 'tx': self.month // 2, 'total': self.month},
+            'daily_history': [],
+            'interface': 'eth0',
+            'server_ip': f'10.0.{self.index // 256}.{self.index % 256}',
+            'uptime': 'up 1 day',
+            'vnstat_version': '2.9',
+            'timestamp': time.time()
+        }
+        self.body = json.dumps(stats).encode('utf-8')
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+
+    async def handle(self, reader, writer):
+        """Serve keep-alive requests on one connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if request_line.split()[1] != b'/api/stats':
+                    response = b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n'
+                elif headers.get('if-none-match') == self.etag:
+                    response = f'HTTP/1.1 304 Not Modified\r\nETag: {self.etag}\r\n\r\n'.encode('ascii')
+                else:
+                    response = (f'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                                f'Content-Length: {len(self.body)}\r\nETag: {self.etag}\r\n\r\n').encode('ascii')
+                    response += self.body
+                writer.write(response)
+                await writer.drain()
+        except (ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+async def run(args):
+    """Start every node and keep their stats changing"""
+    nodes = [StandInNode(i, args.delay, args.seed) for i in range(args.nodes)]
+    servers = []
+    for node in nodes[:args.nodes - args.down]:
+        servers.append(await asyncio.start_server(node.handle, '127.0.0.1', args.base_port + node.index))
+
+    # Nodes past the running ones are listed but never started, so they show as down
+    with open(args.nodes_file, 'w') as f:
+        for node in nodes:
+            f.write(f"node{node.index:03d}=http://127.0.0.1:{args.base_port + node.index}\n")
+    print(f"{len(servers)} nodes running, {args.down} down; node list written to {args.nodes_file}")
+
+    while True:
+        await asyncio.sleep(UPDATE_INTERVAL)
+        for node in nodes:
+            node.update()
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Stand-in nodes for V2RayZone Dash fleet mode')
+    parser.add_argument('--nodes', type=int, default=DEFAULT_NODES, help='Number of nodes')
+    parser.add_argument('--base-port', type=int, default=DEFAULT_BASE_PORT, help='Port of the first node')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds each response is delayed')
+    parser.add_argument('--down', type=int, default=0, help='Nodes listed but not started')
+    parser.add_argument('--nodes-file', default=NODES_FILE, help='Where to write the node list')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the fake stats')
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    try:
+        asyncio.run(run(parse_args()))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Native Stats Collector
+Builds stats.json in-process from /sys/class/net, /proc/net/dev and vnstat
+"""
+
+import os
+import json
+import fnmatch
+import time
+import socket
+import threading
+import subprocess
+import urllib.request
+from array import array
+import logging
+
+import metrics
+
+# Configuration
+SYSFS_NET_DIR = '/sys/class/net'
+PROC_NET_DEV = '/proc/net/dev'
+PROC_NET_ROUTE = '/proc/net/route'
+PROC_UPTIME = '/proc/uptime'
+VNSTAT_BIN = 'vnstat'
+DAILY_HISTORY_DAYS = 30
+COMMON_INTERFACES = ['eth0', 'ens3', 'ens18', 'enp0s3', 'wlan0']
+PUBLIC_IP_URLS = ['https://ifconfig.me/ip', 'https://ipinfo.io/ip']
+# System info cache lifetimes in seconds: (on success, after a failed lookup)
+SYSTEM_INFO_TTLS = {
+    'server_ip': (6 * 3600, 300),
+    'vnstat_version': (24 * 3600, 3600)
+}
+COUNTER_WRAP_32 = 2 ** 32
+# Shell-style patterns never monitored unless explicitly allowed; container veth/bridge
+# interfaces come and go with every container and would pile up per-interface state
+EXCLUDE_INTERFACES = ['lo', 'veth*', 'docker*', 'br-*']
+INTERFACE_GRACE = 60  # seconds an interface may be missing (e.g. a VPN reconnecting) before it is dropped
+
+logger = logging.getLogger(__name__)
+
+def read_proc_net_dev(path=PROC_NET_DEV):
+    """Read byte and packet counters for every interface in one pass.
+
+    Returns a dict mapping interface name to a dict with rx_bytes,
+    rx_packets, tx_bytes and tx_packets.
+    """
+    counters = {}
+    with open(path, 'r') as f:
+        # The first two lines are column headers
+        for line in f.readlines()[2:]:
+            name, _, data = line.partition(':')
+            fields = data.split()
+            if len(fields) < 10:
+                continue
+            counters[name.strip()] = {
+                'rx_bytes': int(fields[0]),
+                'rx_packets': int(fields[1]),
+                'tx_bytes': int(fields[8]),
+                'tx_packets': int(fields[9])
+            }
+    return counters
+
+def read_sysfs_counters(interface, sysfs_dir=SYSFS_NET_DIR):
+    """Read rx/tx byte counters for one interface from sysfs"""
+    stats_dir = os.path.join(sysfs_dir, interface, 'statistics')
+    with open(os.path.join(stats_dir, 'rx_bytes'), 'r') as f:
+        rx_bytes = int(f.read())
+    with open(os.path.join(stats_dir, 'tx_bytes'), 'r') as f:
+        tx_bytes = int(f.read())
+    return rx_bytes, tx_bytes
+
+def read_interface_counters(interface, sysfs_dir=SYSFS_NET_DIR, proc_net_dev=PROC_NET_DEV):
+    """Read rx/tx byte counters, preferring sysfs and falling back to /proc/net/dev"""
+    try:
+        return read_sysfs_counters(interface, sysfs_dir)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        counters = read_proc_net_dev(proc_net_dev).get(interface)
+    except OSError:
+        counters = None
+
+    if counters is None:
+        return 0, 0
+    return counters['rx_bytes'], counters['tx_bytes']
+
+def select_interfaces(names, include=None, exclude=EXCLUDE_INTERFACES):
+    """Filter interface names with shell-style include/exclude patterns"""
+    selected = []
+    for name in names:
+        if include and not any(fnmatch.fnmatchcase(name, pattern) for pattern in include):
+            continue
+        if exclude and any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude):
+            continue
+        selected.append(name)
+    return selected
+
+def read_all_counters(primary, include=None, exclude=EXCLUDE_INTERFACES,
+                      sysfs_dir=SYSFS_NET_DIR, proc_net_dev=PROC_NET_DEV):
+    """Read (rx_bytes, tx_bytes, rx_packets, tx_packets) for all selected interfaces
+    in one pass over /proc/net/dev.
+
+    The primary interface is always included. Falls back to sysfs for the
+    primary interface if /proc/net/dev cannot be read; packet counts are
+    None in that case.
+    """
+    try:
+        counters = read_proc_net_dev(proc_net_dev)
+    except OSError:
+        return {primary: read_interface_counters(primary, sysfs_dir, proc_net_dev) + (None, None)}
+
+    result = {}
+    for name in select_interfaces(counters, include, exclude):
+        result[name] = _counter_tuple(counters[name])
+    if primary not in result:
+        primary_counters = counters.get(primary)
+        if primary_counters is not None:
+            result[primary] = _counter_tuple(primary_counters)
+        else:
+            result[primary] = read_interface_counters(primary, sysfs_dir, proc_net_dev) + (None, None)
+    return result
+
+def _counter_tuple(counters):
+    """Flatten a read_proc_net_dev() entry"""
+    return (counters['rx_bytes'], counters['tx_bytes'], counters['rx_packets'], counters['tx_packets'])
+
+def get_primary_interface(sysfs_dir=SYSFS_NET_DIR, proc_net_dev=PROC_NET_DEV, route_file=PROC_NET_ROUTE):
+    """Detect the primary interface without spawning `ip route`"""
+    # Method 1: Default route interface
+    try:
+        with open(route_file, 'r') as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if len(fields) > 1 and fields[1] == '00000000':
+                    return fields[0]
+    except OSError:
+        pass
+
+    # Method 2: Common interface names
+    for interface in COMMON_INTERFACES:
+        if os.path.isdir(os.path.join(sysfs_dir, interface)):
+            return interface
+
+    # Method 3: First non-loopback interface with counters
+    try:
+        for interface in read_proc_net_dev(proc_net_dev):
+            if interface != 'lo':
+                return interface
+    except OSError:
+        pass
+
+    # Fallback
+    return 'eth0'
+
+def counter_delta(previous, current):
+    """Return bytes transferred between two counter readings.
+
+    Handles 32-bit counter wraps; any other decrease is treated as a
+    counter reset (e.g. the interface was recreated) and the new value
+    is counted from zero.
+    """
+    if current >= previous:
+        return current - previous
+
+    wrapped = current + COUNTER_WRAP_32 - previous
+    if previous < COUNTER_WRAP_32 and wrapped < COUNTER_WRAP_32 // 2:
+        return wrapped
+    return current
+
+def format_uptime(uptime_seconds):
+    """Format seconds like `uptime -p` does"""
+    days = int(uptime_seconds // 86400)
+    hours = int((uptime_seconds % 86400) // 3600)
+    minutes = int((uptime_seconds % 3600) // 60)
+
+    parts = []
+    if days:
+        parts.append(f"{days} day{'s' if days != 1 else ''}")
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    if minutes or not parts:
+        parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
+
+    return 'up ' + ', '.join(parts)
+
+def read_uptime(path=PROC_UPTIME):
+    """Read system uptime from /proc/uptime"""
+    try:
+        with open(path, 'r') as f:
+            return format_uptime(float(f.readline().split()[0]))
+    except (OSError, ValueError, IndexError):
+        return 'Unknown'
+
+def get_vnstat_version(vnstat_bin=VNSTAT_BIN):
+    """Get the installed vnstat version"""
+    try:
+        result = subprocess.run(
+            [vnstat_bin, '--version'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        return result.stdout.split()[1]
+    except (OSError, subprocess.SubprocessError, IndexError):
+        metrics.SUBPROCESS_FAILURES.inc(command='vnstat')
+        return 'Unknown'
+
+def get_public_ip(timeout=5):
+    """Look up the public server IP, or None if every service failed"""
+    for url in PUBLIC_IP_URLS:
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                ip = response.read().decode('utf-8').strip()
+            if ip:
+                return ip
+        except Exception:
+            continue
+    return None
+
+def get_local_ip():
+    """Get the address of the outgoing interface without network traffic"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            # No packets are sent; this only selects the outgoing address
+            s.connect(('8.8.8.8', 80))
+            return s.getsockname()[0]
+    except OSError:
+        return 'Unknown'
+
+def load_vnstat_json(interface=None, vnstat_bin=VNSTAT_BIN, timeout=10):
+    """Run `vnstat --json` once and return the parsed document (all interfaces if none given)"""
+    command = [vnstat_bin, '--json'] if interface is None else [vnstat_bin, '-i', interface, '--json']
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        if result.returncode != 0:
+            logger.warning(f"vnstat failed for {interface}: {result.stderr.strip()}")
+            metrics.SUBPROCESS_FAILURES.inc(command='vnstat')
+            return {'interfaces': []}
+        return json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        metrics.SUBPROCESS_FAILURES.inc(command='vnstat')
+        logger.warning(f"Could not read vnstat data for {interface}: {e}")
+        return {'interfaces': []}
+
+def _entry_key(entry):
+    """Sort key for a vnstat day/month entry"""
+    date = entry.get('date', {})
+    return (date.get('year', 0), date.get('month', 0), date.get('day', 0))
+
+def _traffic_entries(traffic, name_v2, name_v1, scale):
+    """Return vnstat traffic entries oldest first, with byte values"""
+    entries = traffic.get(name_v2)
+    if entries is None:
+        entries = traffic.get(name_v1, [])
+
+    result = []
+    for entry in sorted(entries, key=_entry_key):
+        result.append({
+            'date': entry.get('date', {}),
+            'rx': int(entry.get('rx', 0)) * scale,
+            'tx': int(entry.get('tx', 0)) * scale
+        })
+    return result
+
+def empty_usage():
+    """Usage block for an interface vnstat knows nothing about"""
+    return {
+        'today': {'rx': 0, 'tx': 0, 'total': 0},
+        'month': {'rx': 0, 'tx': 0, 'total': 0},
+        'daily_history': []
+    }
+
+def parse_vnstat_interface(interface_json, scale=1, history_days=DAILY_HISTORY_DAYS):
+    """Extract today, month and daily history for one vnstat interface entry"""
+    traffic = interface_json.get('traffic', {})
+    days = _traffic_entries(traffic, 'day', 'days', scale)
+    months = _traffic_entries(traffic, 'month', 'months', scale)
+
+    result = empty_usage()
+    if days:
+        today = days[-1]
+        result['today'] = {'rx': today['rx'], 'tx': today['tx'], 'total': today['rx'] + today['tx']}
+    if months:
+        month = months[-1]
+        result['month'] = {'rx': month['rx'], 'tx': month['tx'], 'total': month['rx'] + month['tx']}
+
+    result['daily_history'] = [
+        {
+            'date': f"{day['date'].get('year', 0):04d}-{day['date'].get('month', 0):02d}-{day['date'].get('day', 0):02d}",
+            'rx': day['rx'],
+            'tx': day['tx']
+        }
+        for day in days[-history_days:]
+    ]
+    return result
+
+def parse_vnstat_all(vnstat_json, history_days=DAILY_HISTORY_DAYS):
+    """Parse every interface in a vnstat JSON document into {name: usage}"""
+    # vnstat 1.x reports KiB under "days"/"months" and names interfaces "id";
+    # 2.x reports bytes under "day"/"month" and uses "name"
+    scale = 1024 if str(vnstat_json.get('jsonversion', '2')) == '1' else 1
+
+    result = {}
+    for interface_json in vnstat_json.get('interfaces') or []:
+        name = interface_json.get('name') or interface_json.get('id')
+        if name:
+            result[name] = parse_vnstat_interface(interface_json, scale, history_days)
+    return result
+
+def aggregate_usage(blocks):
+    """Sum current/today/month over several per-interface blocks"""
+    aggregate = {
+        'current': {'rx_rate': 0, 'tx_rate': 0},
+        'today': {'rx': 0, 'tx': 0, 'total': 0},
+        'month': {'rx': 0, 'tx': 0, 'total': 0}
+    }
+    for block in blocks:
+        for section, totals in aggregate.items():
+            for key in totals:
+                totals[key] += block[section][key]
+    return aggregate
+
+def write_stats_file(stats, output_file):
+    """Atomically write stats to the output file"""
+    output_dir = os.path.dirname(output_file)
+    os.makedirs(output_dir, exist_ok=True)
+
+    temp_file = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(stats, f)
+    os.chmod(temp_file, 0o644)
+    os.replace(temp_file, output_file)
+
+class NativeCollector:
+    """Collects dashboard stats without forking bash/jq"""
+
+    def __init__(self, interface=None, sysfs_dir=SYSFS_NET_DIR, proc_net_dev=PROC_NET_DEV,
+                 vnstat_bin=VNSTAT_BIN, include=None, exclude=EXCLUDE_INTERFACES):
+        self.interface = interface
+        self.sysfs_dir = sysfs_dir
+        self.proc_net_dev = proc_net_dev
+        self.vnstat_bin = vnstat_bin
+        self.include = include
+        self.exclude = exclude
+        self.system_info = SystemInfoProvider(vnstat_bin)
+        self.lock = threading.Lock()
+        self.last_counters = None
+        self.rate_sampler = None
+        self.vnstat_db = None  # optional vnstat_db.VnstatDatabase used instead of `vnstat --json`
+
+    def get_interface(self):
+        """Return the configured or detected interface"""
+        if self.interface:
+            return self.interface
+        return get_primary_interface(self.sysfs_dir, self.proc_net_dev)
+
+    def get_current_rates(self, interface):
+        """Return {name: current rates} for all monitored interfaces.
+
+        Uses the live sampler when it is running, otherwise counter deltas
+        since the previous call from a single /proc/net/dev read.
+        """
+        if self.rate_sampler is not None and self.rate_sampler.interface == interface:
+            rates = {}
+            for name, latest in self.rate_sampler.live().items():
+                rates[name] = {'rx_rate': int(latest[1]), 'tx_rate': int(latest[2])}
+            if interface in rates:
+                return rates
+
+        counters = read_all_counters(interface, self.include, self.exclude, self.sysfs_dir, self.proc_net_dev)
+        now = time.monotonic()
+
+        with self.lock:
+            previous = self.last_counters
+            self.last_counters = (now, counters)
+
+        rates = {}
+        for name, (rx_bytes, tx_bytes, _, _) in counters.items():
+            rates[name] = {'rx_rate': 0, 'tx_rate': 0}
+            if previous is None or name not in previous[1]:
+                continue
+
+            elapsed = now - previous[0]
+            last_rx, last_tx = previous[1][name][:2]
+            if elapsed > 0:
+                rates[name] = {
+                    'rx_rate': int(counter_delta(last_rx, rx_bytes) / elapsed),
+                    'tx_rate': int(counter_delta(last_tx, tx_bytes) / elapsed)
+                }
+        return rates
+
+    def read_vnstat_usage(self):
+        """Per-interface vnstat usage from the database when configured, else from `vnstat --json`"""
+        if self.vnstat_db is not None:
+            try:
+                return self.vnstat_db.usage()
+            except RuntimeError as e:
+                logger.warning(f"{e}; falling back to vnstat --json")
+
+        # One vnstat run covers every interface
+        return parse_vnstat_all(load_vnstat_json(vnstat_bin=self.vnstat_bin))
+
+    def collect(self):
+        """Build a stats document with the stats.json schema.
+
+        Top-level fields describe the primary interface; `interfaces` holds
+        one block per monitored interface and `aggregate` their sum.
+        """
+        interface = self.get_interface()
+        rates = self.get_current_rates(interface)
+        usage = self.read_vnstat_usage()
+
+        interfaces = {}
+        for name, current in rates.items():
+            block = {'current': current}
+            block.update(usage.get(name) or empty_usage())
+            interfaces[name] = block
+        primary = interfaces[interface]
+
+        return {
+            'current': primary['current'],
+            'today': primary['today'],
+            'month': primary['month'],
+            'daily_history': primary['daily_history'],
+            'interface': interface,
+            'interfaces': interfaces,
+            'aggregate': aggregate_usage(interfaces.values()),
+            # Cached values only; slow lookups happen on the provider's thread
+            'server_ip': self.system_info.get('server_ip'),
+            'uptime': read_uptime(),
+            'vnstat_version': self.system_info.get('vnstat_version'),
+            'timestamp': time.time()
+        }
+
+    def generate(self, output_file):
+        """Collect stats and write them to the output file"""
+        stats = self.collect()
+        write_stats_file(stats, output_file)
+        return stats
+
+class SystemInfoProvider:
+    """Rarely changing system info with per-field TTLs, refreshed off the request path.
+
+    get() never blocks: it returns the cached value (or a cheap placeholder)
+    and expired fields are refreshed by the background thread, or by a
+    one-off thread when the provider was not started.
+    """
+
+    def __init__(self, vnstat_bin=VNSTAT_BIN, ttls=None):
+        self.ttls = ttls or SYSTEM_INFO_TTLS
+        self.loaders = {
+            'server_ip': get_public_ip,
+            'vnstat_version': lambda: get_vnstat_version(vnstat_bin)
+        }
+        self.values = {
+            'server_ip': get_local_ip(),  # Until the public lookup succeeds
+            'vnstat_version': 'Unknown'
+        }
+        self.expires = {field: 0 for field in self.loaders}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the background refresher"""
+        if self.running:
+            return
+
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self.thread.start()
+        logger.info("System info provider started")
+
+    def stop(self):
+        """Stop the background refresher"""
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        logger.info("System info provider stopped")
+
+    def get(self, field):
+        """Return the cached value of a field"""
+        if not self.running and time.time() >= self.expires[field]:
+            self._refresh_async(field)
+        return self.values[field]
+
+    def refresh(self, field):
+        """Load one field now, keeping the previous value if the lookup fails"""
+        with self.lock:
+            if field in self.refreshing:
+                return
+            self.refreshing.add(field)
+
+        try:
+            value = self.loaders[field]()
+            ok = value not in (None, 'Unknown')
+            if ok:
+                self.values[field] = value
+            ttl_ok, ttl_failed = self.ttls[field]
+            self.expires[field] = time.time() + (ttl_ok if ok else ttl_failed)
+        except Exception as e:
+            logger.warning(f"Could not refresh {field}: {e}")
+            self.expires[field] = time.time() + self.ttls[field][1]
+        finally:
+            with self.lock:
+                self.refreshing.discard(field)
+
+    def _refresh_async(self, field):
+        """Refresh a field on a one-off thread"""
+        if field not in self.refreshing:
+            threading.Thread(target=self.refresh, args=(field,), daemon=True).start()
+
+    def _refresh_loop(self):
+        """Refresh expired fields until stopped"""
+        while self.running:
+            now = time.time()
+            for field in self.loaders:
+                if now >= self.expires[field]:
+                    self.refresh(field)
+
+            next_expiry = min(self.expires.values())
+            self.stop_event.wait(max(1, min(60, next_expiry - time.time())))
+
+class RateRing:
+    """Fixed-size, array-backed ring buffer of (timestamp, rx_rate, tx_rate) samples"""
+
+    def __init__(self, size):
+        self.size = size
+        self.timestamps = array('d', [0.0]) * size
+        self.rx_rates = array('d', [0.0]) * size
+        self.tx_rates = array('d', [0.0]) * size
+        self.head = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, rx_rate, tx_rate):
+        """Add a sample, overwriting the oldest one when full"""
+        with self.lock:
+            self.timestamps[self.head] = timestamp
+            self.rx_rates[self.head] = rx_rate
+            self.tx_rates[self.head] = tx_rate
+            self.head = (self.head + 1) % self.size
+            if self.count < self.size:
+                self.count += 1
+
+    def latest(self):
+        """Return the newest sample or None"""
+        with self.lock:
+            if not self.count:
+                return None
+            i = (self.head - 1) % self.size
+            return self.timestamps[i], self.rx_rates[i], self.tx_rates[i]
+
+    def since(self, timestamp):
+        """Return samples newer than timestamp as oldest-first column lists"""
+        with self.lock:
+            # Walk back from the newest sample; only the requested tail is touched
+            n = 0
+            while n < self.count and self.timestamps[(self.head - 1 - n) % self.size] > timestamp:
+                n += 1
+
+            indexes = [(self.head - n + k) % self.size for k in range(n)]
+            return {
+                'timestamps': [self.timestamps[i] for i in indexes],
+                'rx_rate': [self.rx_rates[i] for i in indexes],
+                'tx_rate': [self.tx_rates[i] for i in indexes]
+            }
+
+class RateSampler:
+    """Background thread sampling interface counters into one RateRing per interface"""
+
+    def __init__(self, interface=None, interval=0.5, history_size=600,
+                 sysfs_dir=SYSFS_NET_DIR, proc_net_dev=PROC_NET_DEV,
+                 include=None, exclude=EXCLUDE_INTERFACES):
+        self.interface = interface or get_primary_interface(sysfs_dir, proc_net_dev)
+        self.interval = interval
+        self.history_size = history_size
+        self.sysfs_dir = sysfs_dir
+        self.proc_net_dev = proc_net_dev
+        self.include = include
+        self.exclude = exclude
+        self.rings = {self.interface: RateRing(history_size)}
+        self.counters = {}  # latest raw counters per interface
+        self.listeners = []
+        self.removal_listeners = []
+        self.missing = {}  # interface: monotonic time it was first missing from /proc/net/dev
+        self.started = None  # wall-clock start; older samples were preloaded from saved history
+        self.running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the background sampler"""
+        if self.running:
+            return
+
+        self.running = True
+        self.started = time.time()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"Rate sampler started (primary {self.interface}) with {self.interval}s interval")
+
+    def stop(self):
+        """Stop the background sampler"""
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        logger.info("Rate sampler stopped")
+
+    def set_interval(self, interval):
+        """Change the sampling interval; a shorter one takes effect immediately"""
+        shorter = interval < self.interval
+        self.interval = interval
+        if shorter and self.running:
+            self.stop_event.set()  # Cut the current wait short
+
+    def add_listener(self, callback):
+        """Call callback(interface, timestamp, rx_rate, tx_rate, elapsed) for every new sample"""
+        self.listeners.append(callback)
+
+    def add_removal_listener(self, callback):
+        """Call callback(interface) when an interface disappears from /proc/net/dev"""
+        self.removal_listeners.append(callback)
+
+    def interfaces(self):
+        """Interfaces with sample history"""
+        return list(self.rings)
+
+    def latest(self, interface=None):
+        """Return the newest (timestamp, rx_rate, tx_rate) sample or None"""
+        ring = self.rings.get(interface or self.interface)
+        return ring.latest() if ring is not None else None
+
+    def live(self):
+        """{interface: newest sample} for interfaces in the latest read that were sampled since start"""
+        samples = {}
+        for name in self.counters:
+            latest = self.latest(name)
+            if latest is not None and latest[0] >= self.started:
+                samples[name] = latest
+        return samples
+
+    def since(self, timestamp, interface=None):
+        """Return samples newer than timestamp"""
+        ring = self.rings.get(interface or self.interface)
+        if ring is None:
+            return {'timestamps': [], 'rx_rate': [], 'tx_rate': []}
+        return ring.since(timestamp)
+
+    def preload(self, interface, samples):
+        """Add saved (timestamp, rx_rate, tx_rate) samples, oldest first, before sampling starts"""
+        if not samples:
+            return
+        ring = self.rings.get(interface)
+        if ring is None:
+            ring = self.rings[interface] = RateRing(self.history_size)
+        for timestamp, rx_rate, tx_rate in samples:
+            ring.append(timestamp, rx_rate, tx_rate)
+
+    def _notify(self, interface, timestamp, rx_rate, tx_rate, elapsed):
+        """Pass a sample to every listener"""
+        for callback in self.listeners:
+            try:
+                callback(interface, timestamp, rx_rate, tx_rate, elapsed)
+            except Exception as e:
+                logger.error(f"Error in rate sample listener: {e}")
+
+    def _remove_missing(self, counters, now):
+        """Drop the rings of interfaces missing for INTERFACE_GRACE and tell the removal listeners"""
+        for name in list(self.missing):
+            if name in counters:
+                del self.missing[name]
+        for name in list(self.rings):
+            if name in counters or name == self.interface:
+                continue
+            if now - self.missing.setdefault(name, now) < INTERFACE_GRACE:
+                continue
+            del self.missing[name]
+            self.rings.pop(name, None)
+            logger.info(f"Interface {name} is gone; dropped its rate history")
+            for callback in self.removal_listeners:
+                try:
+                    callback(name)
+                except Exception as e:
+                    logger.error(f"Error in interface removal listener: {e}")
+
+    def _sample_loop(self):
+        """Main sampling loop"""
+        last_time = None
+        previous = {}
+        while self.running:
+            try:
+                # One read of /proc/net/dev per tick, however many interfaces there are
+                counters = read_all_counters(self.interface, self.include, self.exclude,
+                                             self.sysfs_dir, self.proc_net_dev)
+                now = time.monotonic()
+                timestamp = time.time()
+
+                if last_time is not None and now > last_time:
+                    elapsed = now - last_time
+                    for name, (rx_bytes, tx_bytes, _, _) in counters.items():
+                        if name not in previous:
+                            continue
+                        last_rx, last_tx = previous[name][:2]
+                        rx_rate = counter_delta(last_rx, rx_bytes) / elapsed
+                        tx_rate = counter_delta(last_tx, tx_bytes) / elapsed
+
+                        ring = self.rings.get(name)
+                        if ring is None:
+                            ring = self.rings[name] = RateRing(self.history_size)
+                        ring.append(timestamp, rx_rate, tx_rate)
+                        self._notify(name, timestamp, rx_rate, tx_rate, elapsed)
+
+                last_time = now
+                previous = counters
+                self.counters = counters
+                self._remove_missing(counters, now)
+
+            except Exception as e:
+                logger.error(f"Error sampling interface counters: {e}")
+
+            self.stop_event.wait(self.interval)
+            if self.running:
+                self.stop_event.clear()
@@ -0,0 +1,103 @@
+// V2RayZone Dash - Fleet View JavaScript
+
+class FleetDashboard {
+    constructor() {
+        this.updateInterval = 5000; // 5 seconds
+        this.pollTimer = null;
+        
+        this.init();
+    }
+
+    init() {
+        this.fetchFleet();
+        this.pollTimer = setInterval(() => {
+            if (!document.hidden) {
+                this.fetchFleet();
+            }
+        }, this.updateInterval);
+        
+        // Polls are skipped while hidden; catch up as soon as the tab is shown
+        document.addEventListener('visibilitychange', () => {
+            if (!document.hidden) {
+                this.fetchFleet();
+            }
+        });
+    }
+
+    async fetchFleet() {
+        try {
+            const response = await fetch('/api/fleet');
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            this.updateFleet(await response.json());
+        } catch (error) {
+            console.error('Error fetching fleet data:', error);
+            document.getElementById('last-update').textContent = 'Unavailable';
+        }
+    }
+
+    updateFleet(data) {
+        document.getElementById('fleet-ok').textContent = data.counts.ok;
+        document.getElementById('fleet-stale').textContent = data.counts.stale;
+        document.getElementById('fleet-down').textContent = data.counts.down + data.counts.pending;
+        
+        document.getElementById('fleet-rx-rate').textContent = this.formatSpeed(data.totals.current.rx_rate);
+        document.getElementById('fleet-tx-rate').textContent = this.formatSpeed(data.totals.current.tx_rate);
+        document.getElementById('fleet-today').textContent = this.formatBytes(data.totals.today.total);
+        document.getElementById('fleet-month').textContent = this.formatBytes(data.totals.month.total);
+        
+        // Rebuild the table in one pass; DOM writes happen once per refresh
+        const rows = document.createDocumentFragment();
+        for (const node of data.nodes) {
+            const row = document.createElement('tr');
+            const cells = [
+                node.name,
+                node.status,
+                node.current ? this.formatSpeed(node.current.rx_rate) : '-',
+                node.current ? this.formatSpeed(node.current.tx_rate) : '-',
+                node.today ? this.formatBytes(node.today.total) : '-',
+                node.month ? this.formatBytes(node.month.total) : '-',
+                node.age !== null ? `${Math.round(node.age)}s ago` : (node.error || '-')
+            ];
+            cells.forEach((value, index) => {
+                const cell = document.createElement('td');
+                cell.textContent = value;
+                if (index === 1) {
+                    cell.className = `fleet-status ${node.status}`;
+                    if (node.error) cell.title = node.error;
+                }
+                row.appendChild(cell);
+            });
+            rows.appendChild(row);
+        }
+        document.getElementById('fleet-nodes').replaceChildren(rows);
+        
+        document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
+    }
+
+    formatBytes(bytes) {
+        if (!bytes) return '0 B';
+        
+        const k = 1024;
+        const sizes = ['B', 'KB', 'MB', 'GB', 'TB', 'PB'];
+        const i = Math.floor(Math.log(bytes) / Math.log(k));
+        
+        return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+    }
+
+    formatSpeed(bytesPerSecond) {
+        if (!bytesPerSecond) return '0 B/s';
+        
+        const k = 1024;
+        const sizes = ['B/s', 'KB/s', 'MB/s', 'GB/s', 'TB/s'];
+        const i = Math.floor(Math.log(bytesPerSecond) / Math.log(k));
+        
+        return parseFloat((bytesPerSecond / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+    }
+}
+
+// Initialize fleet view when DOM is loaded
+document.addEventListener('DOMContentLoaded', () => {
+    new FleetDashboard();
+});
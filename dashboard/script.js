@@ -1,16 +1,62 @@
 // V2RayZone Dash - Dashboard JavaScript
 
+// Fixed-size ring of (timestamp, rx, tx) samples backed by typed arrays
+class RateRing {
+    constructor(capacity) {
+        this.capacity = capacity;
+        this.timestamps = new Float64Array(capacity);
+        this.rx = new Float64Array(capacity);
+        this.tx = new Float64Array(capacity);
+        this.head = 0; // Slot the next sample is written to
+        this.count = 0;
+    }
+
+    push(timestamp, rx, tx) {
+        this.timestamps[this.head] = timestamp;
+        this.rx[this.head] = rx;
+        this.tx[this.head] = tx;
+        this.head = (this.head + 1) % this.capacity;
+        this.count = Math.min(this.count + 1, this.capacity);
+    }
+
+    clear() {
+        this.head = 0;
+        this.count = 0;
+    }
+
+    // Copy samples oldest-first into existing arrays, reusing their storage
+    copyInto(labels, rx, tx) {
+        const start = (this.head - this.count + this.capacity) % this.capacity;
+        labels.length = rx.length = tx.length = this.count;
+        for (let i = 0; i < this.count; i++) {
+            const slot = (start + i) % this.capacity;
+            labels[i] = this.timestamps[slot];
+            rx[i] = this.rx[slot];
+            tx[i] = this.tx[slot];
+        }
+    }
+}
+
 class BandwidthDashboard {
     constructor() {
         this.updateInterval = 5000; // 5 seconds
         this.maxDataPoints = 60; // Keep last 60 data points for real-time chart
         this.isPaused = false;
         this.charts = {};
-        this.realtimeData = {
-            labels: [],
-            rx: [],
-            tx: []
-        };
+        this.realtimeData = new RateRing(this.maxDataPoints); // KB/s samples
+        this.lastRateTimestamp = 0; // Newest /api/rates sample already charted
+        this.ratesAvailable = true;
+        this.stale = false; // Stats are the snapshot a restarted server saved, not yet refreshed
+        this.stats = null; // Latest full stats document (stream deltas are merged into it)
+        this.dailyKey = null; // Signature of the daily history currently charted
+        this.eventSource = null;
+        this.streamFailed = false; // Server refused /api/stream; poll instead
+        this.pollTimer = null;
+        
+        // DOM writes and chart redraws are queued and applied once per animation frame
+        this.pendingText = new Map(); // element id -> [value, addPulse]
+        this.realtimeDirty = false;
+        this.frameRequested = false;
         
         this.init();
     }
@@ -18,7 +64,9 @@ class BandwidthDashboard {
     init() {
         this.setupCharts();
         this.setupEventListeners();
-        this.startDataFetching();
+        if (!document.hidden) {
+            this.startDataFetching();
+        }
         this.updateTimestamp();
     }
 
@@ -60,6 +108,10 @@ class BandwidthDashboard {
                         title: {
                             display: true,
                             text: 'Time'
+                        },
+                        ticks: {
+                            // Labels are raw timestamps; only the ticks actually drawn are formatted
+                            callback: (value) => this.formatTime(this.charts.realtime.data.labels[value])
                         }
                     }
                 },
@@ -67,6 +119,11 @@ class BandwidthDashboard {
                     legend: {
                         display: true,
                         position: 'top'
+                    },
+                    tooltip: {
+                        callbacks: {
+                            title: (items) => items.length ? this.formatTime(items[0].label) : ''
+                        }
                     }
                 },
                 animation: {
@@ -139,6 +196,15 @@ class BandwidthDashboard {
             this.hideErrorModal();
             this.fetchData();
         });
+
+        // Hidden tabs neither fetch nor draw; catch up when shown again
+        document.addEventListener('visibilitychange', () => {
+            if (document.hidden) {
+                this.stopDataFetching();
+            } else {
+                this.startDataFetching();
+            }
+        });
     }
 
     async fetchData() {
@@ -152,6 +218,10 @@ class BandwidthDashboard {
             this.updateDashboard(data);
             this.updateConnectionStatus(true);
             
+            if (this.ratesAvailable && !this.isPaused) {
+                await this.fetchRates();
+            }
+            
         } catch (error) {
             console.error('Error fetching data:', error);
             this.updateConnectionStatus(false, error.message);
@@ -159,6 +229,22 @@ class BandwidthDashboard {
         }
     }
 
+    async fetchRates() {
+        try {
+            const response = await fetch(`/api/rates?since=${this.lastRateTimestamp}`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            
+            this.addRates(await response.json());
+            
+        } catch (error) {
+            // Older servers have no live sampler; chart the polled rate instead
+            console.warn('Live rates unavailable, using polled rates:', error);
+            this.ratesAvailable = false;
+        }
+    }
+
     updateDashboard(data) {
         // Update current usage
         this.updateElement('current-rx', this.formatSpeed(data.current.rx_rate));
@@ -174,14 +260,24 @@ class BandwidthDashboard {
         this.updateElement('month-tx', this.formatBytes(data.month.tx));
         this.updateElement('month-total', this.formatBytes(data.month.total));
         
+        // Update billing quota (only present when the server has a cap configured)
+        this.updateQuota(data.quota);
+        
         // Update system info
         this.updateElement('interface-name', data.interface || 'Unknown');
         this.updateElement('server-ip', data.server_ip || 'Unknown');
         this.updateElement('uptime', data.uptime || 'Unknown');
         this.updateElement('vnstat-version', data.vnstat_version || 'Unknown');
         
-        // Update real-time chart
-        if (!this.isPaused) {
+        // A restarted server serves its saved snapshot until the collectors catch up
+        const stale = Boolean(data.stale);
+        if (stale !== this.stale) {
+            this.stale = stale;
+            this.updateConnectionStatus(true);
+        }
+        
+        // Update real-time chart (live samples come from /api/rates when available)
+        if (!this.isPaused && !this.ratesAvailable) {
             this.updateRealtimeChart(data.current.rx_rate, data.current.tx_rate);
         }
         
@@ -193,53 +289,98 @@ class BandwidthDashboard {
         this.updateTimestamp();
     }
 
-    updateElement(id, value, addPulse = true) {
-        const element = document.getElementById(id);
-        if (element && element.textContent !== value) {
-            element.textContent = value;
-            if (addPulse) {
-                element.classList.add('pulse');
-                setTimeout(() => element.classList.remove('pulse'), 500);
+    addRates(rates) {
+        // Samples already charted (e.g. resent after a stream reconnect) are skipped
+        const count = rates.timestamps.length;
+        for (let i = 0; i < count; i++) {
+            if (rates.timestamps[i] > this.lastRateTimestamp) {
+                if (!this.isPaused) {
+                    this.updateRealtimeChart(rates.rx_rate[i], rates.tx_rate[i], rates.timestamps[i]);
+                }
+                this.lastRateTimestamp = rates.timestamps[i];
             }
         }
+        return count;
     }
 
-    updateRealtimeChart(rxRate, txRate) {
-        const now = new Date().toLocaleTimeString();
+    updateQuota(quota) {
+        const card = document.getElementById('quota-card');
+        const period = quota && (quota.cycle || quota.day);
+        if (!card) return;
+        if (!period) {
+            card.classList.add('hidden');
+            return;
+        }
         
-        // Add new data point
-        this.realtimeData.labels.push(now);
-        this.realtimeData.rx.push(rxRate / 1024); // Convert to KB/s
-        this.realtimeData.tx.push(txRate / 1024); // Convert to KB/s
+        card.classList.remove('hidden');
+        this.updateElement('quota-used', `${this.formatBytes(period.used)} / ${this.formatBytes(period.limit)} (${period.percent}%)`);
+        this.updateElement('quota-projected', this.formatBytes(period.projected));
+        this.updateElement('quota-reset', new Date(period.end * 1000).toLocaleDateString(), false);
+    }
+
+    updateElement(id, value, addPulse = true) {
+        // Applied on the next animation frame; later writes to the same element win
+        this.pendingText.set(id, [value, addPulse]);
+        this.scheduleRender();
+    }
+
+    scheduleRender() {
+        if (this.frameRequested) return;
+        this.frameRequested = true;
+        requestAnimationFrame(() => this.render());
+    }
+
+    render() {
+        this.frameRequested = false;
         
-        // Remove old data points if we have too many
-        if (this.realtimeData.labels.length > this.maxDataPoints) {
-            this.realtimeData.labels.shift();
-            this.realtimeData.rx.shift();
-            this.realtimeData.tx.shift();
+        for (const [id, [value, addPulse]] of this.pendingText) {
+            const element = document.getElementById(id);
+            if (element && element.textContent !== value) {
+                element.textContent = value;
+                if (addPulse) {
+                    element.classList.add('pulse');
+                    setTimeout(() => element.classList.remove('pulse'), 500);
+                }
+            }
         }
+        this.pendingText.clear();
         
-        // Update chart
-        this.charts.realtime.data.labels = [...this.realtimeData.labels];
-        this.charts.realtime.data.datasets[0].data = [...this.realtimeData.rx];
-        this.charts.realtime.data.datasets[1].data = [...this.realtimeData.tx];
-        this.charts.realtime.update('none'); // No animation for real-time updates
+        // One redraw however many samples arrived since the last frame
+        if (this.realtimeDirty) {
+            this.realtimeDirty = false;
+            const chart = this.charts.realtime;
+            this.realtimeData.copyInto(chart.data.labels, chart.data.datasets[0].data, chart.data.datasets[1].data);
+            chart.update('none'); // No animation for real-time updates
+        }
+    }
+
+    updateRealtimeChart(rxRate, txRate, timestamp) {
+        const time = timestamp || Date.now() / 1000;
+        this.realtimeData.push(time, rxRate / 1024, txRate / 1024); // Convert to KB/s
+        this.realtimeDirty = true;
+        this.scheduleRender();
     }
 
     updateDailyChart(dailyHistory) {
-        const labels = dailyHistory.map(day => day.date);
-        const rxData = dailyHistory.map(day => day.rx / (1024 * 1024)); // Convert to MB
-        const txData = dailyHistory.map(day => day.tx / (1024 * 1024)); // Convert to MB
+        // Polls and stream merges repeat the same history; only redraw when it changed
+        const key = dailyHistory.map(day => `${day.date}:${day.rx}:${day.tx}`).join('|');
+        if (key === this.dailyKey) return;
+        const firstDraw = this.dailyKey === null;
+        this.dailyKey = key;
         
-        this.charts.daily.data.labels = labels;
-        this.charts.daily.data.datasets[0].data = rxData;
-        this.charts.daily.data.datasets[1].data = txData;
-        this.charts.daily.update();
+        const chart = this.charts.daily;
+        chart.data.labels = dailyHistory.map(day => day.date);
+        chart.data.datasets[0].data = dailyHistory.map(day => day.rx / (1024 * 1024)); // Convert to MB
+        chart.data.datasets[1].data = dailyHistory.map(day => day.tx / (1024 * 1024)); // Convert to MB
+        chart.update(firstDraw ? undefined : 'none'); // Animate only the initial draw
     }
 
     updateConnectionStatus(isOnline, errorMessage = '') {
         const statusElement = document.getElementById('connection-status');
-        if (isOnline) {
+        if (isOnline && this.stale) {
+            statusElement.textContent = 'Warming up';
+            statusElement.className = 'status-value stale';
+        } else if (isOnline) {
             statusElement.textContent = 'Online';
             statusElement.className = 'status-value online';
         } else {
@@ -260,14 +401,9 @@ class BandwidthDashboard {
     }
 
     clearRealtimeChart() {
-        this.realtimeData.labels = [];
-        this.realtimeData.rx = [];
-        this.realtimeData.tx = [];
-        
-        this.charts.realtime.data.labels = [];
-        this.charts.realtime.data.datasets[0].data = [];
-        this.charts.realtime.data.datasets[1].data = [];
-        this.charts.realtime.update();
+        this.realtimeData.clear();
+        this.realtimeDirty = true;
+        this.scheduleRender();
     }
 
     showErrorModal(message) {
@@ -289,6 +425,10 @@ class BandwidthDashboard {
         return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
     }
 
+    formatTime(timestamp) {
+        return new Date(timestamp * 1000).toLocaleTimeString();
+    }
+
     formatSpeed(bytesPerSecond) {
         if (bytesPerSecond === 0) return '0 B/s';
         
@@ -300,11 +440,83 @@ class BandwidthDashboard {
     }
 
     startDataFetching() {
+        // Prefer server push; fall back to polling when streaming is unavailable
+        if (this.eventSource || this.pollTimer) return;
+        if (window.EventSource && !this.streamFailed) {
+            this.startStream();
+        } else {
+            this.startPolling();
+        }
+    }
+
+    stopDataFetching() {
+        // Closing the stream also lets the server drop to its idle collection cadence
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        if (this.pollTimer) {
+            clearInterval(this.pollTimer);
+            this.pollTimer = null;
+        }
+    }
+
+    startStream() {
+        let received = false;
+        this.eventSource = new EventSource('/api/stream');
+
+        this.eventSource.addEventListener('snapshot', (event) => {
+            received = true;
+            this.stats = JSON.parse(event.data);
+            this.updateDashboard(this.stats);
+            this.updateConnectionStatus(true);
+        });
+
+        this.eventSource.addEventListener('stats', (event) => {
+            const changes = JSON.parse(event.data);
+            if (this.stats) {
+                Object.assign(this.stats, changes);
+            } else {
+                // No snapshot yet (opened during warm-up): this is the whole document
+                received = true;
+                this.stats = changes;
+                this.updateConnectionStatus(true);
+            }
+            this.updateDashboard(this.stats);
+        });
+
+        this.eventSource.addEventListener('rates', (event) => {
+            const rates = JSON.parse(event.data);
+            const count = this.addRates(rates);
+            if (count === 0) return;
+
+            this.updateElement('current-rx', this.formatSpeed(rates.rx_rate[count - 1]));
+            this.updateElement('current-tx', this.formatSpeed(rates.tx_rate[count - 1]));
+            this.updateTimestamp();
+        });
+
+        this.eventSource.onerror = () => {
+            // EventSource reconnects on its own unless the server refused the stream
+            if (this.eventSource.readyState === EventSource.CLOSED || !received) {
+                console.warn('Live stream unavailable, falling back to polling');
+                this.streamFailed = true;
+                this.eventSource.close();
+                this.eventSource = null;
+                this.startPolling();
+            } else {
+                this.updateConnectionStatus(false, 'Stream disconnected');
+            }
+        };
+    }
+
+    startPolling() {
+        if (this.pollTimer) return;
+
         // Initial fetch
         this.fetchData();
         
         // Set up interval for regular updates
-        setInterval(() => {
+        this.pollTimer = setInterval(() => {
             if (!this.isPaused) {
                 this.fetchData();
             }
@@ -314,16 +526,7 @@ class BandwidthDashboard {
 
 // Initialize dashboard when DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
-    new BandwidthDashboard();
-});
-
-// Handle page visibility changes to pause/resume updates
-document.addEventListener('visibilitychange', () => {
-    if (document.hidden) {
-        console.log('Page hidden, pausing updates');
-    } else {
-        console.log('Page visible, resuming updates');
-    }
+    window.dashboard = new BandwidthDashboard();
 });
 
 // Handle window resize for responsive charts
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Response Encodings
+Opt-in compact encodings for API documents: MessagePack and packed typed arrays
+"""
+
+import sys
+import json
+import struct
+from array import array
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Configuration
+FORMATS = ('json', 'msgpack', 'packed')
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'packed': 'application/vnd.v2rayzone.packed'
+}
+# Accept header media types that select a compact format
+ACCEPT_TYPES = {
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.v2rayzone.packed': 'packed'
+}
+PACKED_MAGIC = b'V2ZP'
+PACKED_PREFIX = struct.Struct('<4sI')  # magic, header length
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+def negotiate_format(requested=None, accept=''):
+    """Pick a format from ?format= or, failing that, an explicit Accept media type.
+
+    Raises ValueError for an unknown ?format= value; JSON is the default.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in FORMATS:
+            raise ValueError(f"'format' must be one of {', '.join(FORMATS)}")
+        return requested
+
+    best, best_quality = 'json', 0.0
+    for item in (accept or '').split(','):
+        media_type, _, params = item.strip().partition(';')
+        fmt = ACCEPT_TYPES.get(media_type.strip().lower())
+        if fmt is None:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+def encode(document, fmt='json'):
+    """Encode a document in one of FORMATS"""
+    if fmt == 'msgpack':
+        return pack_msgpack(document)
+    if fmt == 'packed':
+        return pack_arrays(document)
+    return json.dumps(document, default=_json_default).encode('utf-8')
+
+def _json_default(value):
+    """Let json.dumps handle array columns"""
+    if isinstance(value, array):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def pack_msgpack(document):
+    """Encode as MessagePack, with the msgpack package when it is installed"""
+    if msgpack is not None:
+        return msgpack.packb(document, default=_json_default, use_bin_type=True)
+    out = bytearray()
+    _pack_value(document, out)
+    return bytes(out)
+
+def _pack_value(value, out):
+    """Append one value in MessagePack format (fallback encoder)"""
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xff)
+        elif 0 <= value < 2 ** 64:
+            if value < 2 ** 8:
+                out += struct.pack('>BB', 0xcc, value)
+            elif value < 2 ** 16:
+                out += struct.pack('>BH', 0xcd, value)
+            elif value < 2 ** 32:
+                out += struct.pack('>BI', 0xce, value)
+            else:
+                out += struct.pack('>BQ', 0xcf, value)
+        elif -2 ** 63 <= value < 0:
+            out += struct.pack('>Bq', 0xd3, value)
+        else:
+            out += struct.pack('>Bd', 0xcb, float(value))
+    elif isinstance(value, float):
+        out += struct.pack('>Bd', 0xcb, value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        _pack_header(len(data), out, 0xa0, 32, 0xd9, 0xda, 0xdb)
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        _pack_header(len(value), out, None, 0, 0xc4, 0xc5, 0xc6)
+        out += value
+    elif isinstance(value, dict):
+        _pack_header(len(value), out, 0x80, 16, None, 0xde, 0xdf)
+        for key, item in value.items():
+            _pack_value(key, out)
+            _pack_value(item, out)
+    elif isinstance(value, (list, tuple, array)):
+        _pack_header(len(value), out, 0x90, 16, None, 0xdc, 0xdd)
+        for item in value:
+            _pack_value(item, out)
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+def _pack_header(length, out, fix_base, fix_limit, code8, code16, code32):
+    """Append a str/bin/array/map length header using the smallest form"""
+    if fix_base is not None and length < fix_limit:
+        out.append(fix_base | length)
+    elif code8 is not None and length < 2 ** 8:
+        out += struct.pack('>BB', code8, length)
+    elif length < 2 ** 16:
+        out += struct.pack('>BH', code16, length)
+    else:
+        out += struct.pack('>BI', code32, length)
+
+def pack_arrays(document):
+    """Encode as a JSON header followed by little-endian typed arrays.
+
+    Layout: b'V2ZP', uint32 header length, UTF-8 JSON header (space-padded
+    to an 8-byte boundary), then the arrays, each starting 8-byte aligned so
+    a client can view them in place (Float64Array / Int32Array).
+
+    The header is {"arrays": [[type, offset, length], ...], "data": doc}.
+    In doc, numeric lists are replaced by {"$a": index}, and lists of
+    flat records with the same keys by {"$r": {key: column}}, where each
+    numeric column is again {"$a": index}. Offsets are relative to the
+    start of the array section; types are "f64" and "i32".
+    """
+    blocks = []
+    descriptors = []
+    data = _extract_arrays(document, blocks, descriptors)
+
+    header = json.dumps({'arrays': descriptors, 'data': data}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(PACKED_PREFIX.size + len(header)) % 8)
+    return b''.join([PACKED_PREFIX.pack(PACKED_MAGIC, len(header)), header] + blocks)
+
+def _extract_arrays(value, blocks, descriptors):
+    """Replace numeric lists in a document with references to packed arrays"""
+    if isinstance(value, dict):
+        return {key: _extract_arrays(item, blocks, descriptors) for key, item in value.items()}
+    if isinstance(value, array) or (isinstance(value, (list, tuple)) and _is_numeric(value)):
+        return {'$a': _add_array(value, blocks, descriptors)}
+    if isinstance(value, (list, tuple)):
+        columns = _record_columns(value)
+        if columns is not None:
+            return {'$r': {key: _extract_arrays(column, blocks, descriptors) for key, column in columns.items()}}
+        return [_extract_arrays(item, blocks, descriptors) for item in value]
+    return value
+
+def _is_numeric(values):
+    """True for a non-empty list of ints and floats (bools excluded)"""
+    return bool(values) and all(type(v) in (int, float) for v in values)
+
+def _record_columns(values):
+    """Turn a list of flat dicts sharing their keys into {key: column}, or None"""
+    if not values or not all(isinstance(v, dict) for v in values):
+        return None
+    keys = list(values[0])
+    for record in values:
+        if list(record) != keys or any(isinstance(v, (dict, list, tuple)) for v in record.values()):
+            return None
+    return {key: [record[key] for record in values] for key in keys}
+
+def _add_array(values, blocks, descriptors):
+    """Pack one numeric list as i32 when every value fits, f64 otherwise"""
+    if isinstance(values, array) and values.typecode == 'd':
+        packed = values
+    elif all(type(v) is int and INT32_RANGE[0] <= v <= INT32_RANGE[1] for v in values):
+        packed = array('i', values)
+    else:
+        packed = array('d', values)
+
+    data = packed.tobytes() if sys.byteorder == 'little' else _swapped(packed)
+    offset = sum(len(block) for block in blocks)
+    descriptors.append(['f64' if packed.typecode == 'd' else 'i32', offset, len(packed)])
+    # i32 arrays may end mid-word; pad so the next array stays 8-byte aligned
+    blocks.append(data + b'\0' * (-len(data) % 8))
+    return len(descriptors) - 1
+
+def _swapped(packed):
+    """Little-endian bytes of an array on a big-endian host"""
+    copy = array(packed.typecode, packed)
+    copy.byteswap()
+    return copy.tobytes()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Fleet Aggregator
+Polls many remote /api/stats endpoints concurrently over keep-alive connections
+"""
+
+import ssl
+import json
+import gzip
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+import logging
+
+# Configuration
+FLEET_INTERVAL = 5  # seconds between polling rounds
+FLEET_TIMEOUT = 4  # seconds per node request; keeps a round within one interval
+FLEET_CONCURRENCY = 128  # requests in flight at once
+FLEET_STALE_AFTER = 3  # polling intervals without a good response before a node is stale
+STATS_PATH = '/api/stats'
+MAX_BODY_SIZE = 8 * 1024 * 1024
+USER_AGENT = 'V2RayZone-Dash-Fleet'  # nodes do not count these polls as viewers
+
+logger = logging.getLogger(__name__)
+
+def parse_node(spec):
+    """Parse 'url' or 'name=url' into (name, url); a bare host gets http:// and port 2053,
+    a URL with an explicit scheme is used as given"""
+    name, sep, url = spec.strip().partition('=')
+    if not sep or '://' in name:
+        name, url = '', spec.strip()
+    bare = '://' not in url
+    if bare:
+        url = f"http://{url}"
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        raise ValueError(f"Invalid node: {spec}")
+    if bare and parsed.port is None:
+        url = url.replace(parsed.netloc, f"{parsed.netloc}:2053", 1)
+    return name or parsed.netloc, url.rstrip('/')
+
+def load_nodes(specs=None, nodes_file=None):
+    """Collect nodes from comma-separated specs and/or a file with one node per line"""
+    entries = list(specs or [])
+    if nodes_file:
+        with open(nodes_file, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    entries.append(line)
+
+    nodes = []
+    seen = set()
+    for entry in entries:
+        name, url = parse_node(entry)
+        if url not in seen:
+            seen.add(url)
+            nodes.append((name, url))
+    return nodes
+
+class NodeConnection:
+    """One persistent HTTP/1.1 connection to a node, reused across polling rounds"""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.secure = parsed.scheme == 'https'
+        self.port = parsed.port or (443 if self.secure else 80)
+        # IPv6 literals need their brackets back in the Host header
+        host = f"[{self.host}]" if ':' in self.host else self.host
+        self.host_header = f"{host}:{self.port}"
+        self.base_path = parsed.path.rstrip('/')
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Open the TCP (or TLS) connection"""
+        context = ssl.create_default_context() if self.secure else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    def close(self):
+        """Drop the connection"""
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def get(self, path, etag=None):
+        """GET a path, returning (status, headers, body); retries once on a dead idle connection"""
+        reused = self.writer is not None
+        try:
+            return await self._request(path, etag)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            if not reused:
+                raise
+        # The node closed the idle keep-alive connection; reconnect once
+        return await self._request(path, etag)
+
+    async def _request(self, path, etag):
+        """Send one request and read the response"""
+        if self.writer is None:
+            await self.connect()
+
+        lines = [
+            f"GET {self.base_path}{path} HTTP/1.1",
+            f"Host: {self.host_header}",
+            "Accept: application/json",
+            "Accept-Encoding: gzip",
+            "Connection: keep-alive",
+            f"User-Agent: {USER_AGENT}"
+        ]
+        if etag:
+            lines.append(f"If-None-Match: {etag}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('ascii'))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by node")
+        parts = status_line.decode('latin-1').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ValueError(f"Bad status line: {status_line!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if status in (204, 304):
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > MAX_BODY_SIZE:
+                raise ValueError("Response too large")
+            body = await self.reader.readexactly(length)
+        else:
+            body = await self.reader.read(MAX_BODY_SIZE)
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close' or parts[0] == 'HTTP/1.0':
+            self.close()
+        if headers.get('content-encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return status, headers, body
+
+    async def _read_chunked(self):
+        """Read a chunked transfer-encoded body"""
+        body = bytearray()
+        while True:
+            size = int((await self.reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                await self.reader.readline()
+                return bytes(body)
+            body += await self.reader.readexactly(size)
+            await self.reader.readline()
+            if len(body) > MAX_BODY_SIZE:
+                raise ValueError("Response too large")
+
+class FleetNode:
+    """Latest snapshot and health of one remote dashboard"""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.connection = NodeConnection(url)
+        self.stats = None
+        self.etag = None
+        self.last_success = None  # monotonic time of the last good response
+        self.last_attempt = None
+        self.latency = None
+        self.error = None
+        self.failures = 0
+
+    def status(self, stale_after):
+        """ok, stale (old snapshot) or down (never reached)"""
+        if self.last_success is None:
+            return 'down' if self.last_attempt is not None else 'pending'
+        if time.monotonic() - self.last_success > stale_after:
+            return 'stale'
+        return 'ok'
+
+class FleetPoller:
+    """Runs an asyncio loop on a background thread that refreshes every node each interval.
+
+    All nodes are fetched concurrently (bounded by `concurrency`) with a
+    per-request timeout shorter than the interval, so one slow node never
+    delays the others. After each round on_update(view) is called.
+    """
+
+    def __init__(self, nodes, interval=FLEET_INTERVAL, timeout=FLEET_TIMEOUT,
+                 concurrency=FLEET_CONCURRENCY, on_update=None):
+        self.nodes = [FleetNode(name, url) for name, url in nodes]
+        self.interval = interval
+        self.timeout = min(timeout, interval)
+        self.concurrency = concurrency
+        self.stale_after = interval * FLEET_STALE_AFTER
+        self.on_update = on_update
+        self.round_duration = None
+        self.loop = None
+        self.stop_event = None
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        """Start the polling thread"""
+        if self.running:
+            return
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info(f"Fleet poller started for {len(self.nodes)} nodes with {self.interval}s interval")
+
+    def stop(self):
+        """Stop polling and close all connections"""
+        self.running = False
+        if self.loop is not None and self.stop_event is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        if self.thread:
+            self.thread.join(self.interval + self.timeout)
+        logger.info("Fleet poller stopped")
+
+    def _run(self):
+        """Thread entry point"""
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._poll_loop())
+        finally:
+            for node in self.nodes:
+                node.connection.close()
+            self.loop.close()
+
+    async def _poll_loop(self):
+        """Poll every node once per interval"""
+        self.stop_event = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while self.running:
+            started = time.monotonic()
+            await asyncio.gather(*(self._poll_node(node, semaphore) for node in self.nodes))
+            self.round_duration = time.monotonic() - started
+
+            if self.on_update is not None:
+                try:
+                    self.on_update(self.view())
+                except Exception as e:
+                    logger.error(f"Error publishing fleet view: {e}")
+
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), max(0.0, self.interval - self.round_duration))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_node(self, node, semaphore):
+        """Fetch one node's stats, keeping its previous snapshot on failure"""
+        async with semaphore:
+            started = time.monotonic()
+            node.last_attempt = started
+            try:
+                status, headers, body = await asyncio.wait_for(
+                    node.connection.get(STATS_PATH, node.etag), self.timeout)
+                if status == 200:
+                    node.stats = json.loads(body)
+                    node.etag = headers.get('etag')
+                elif status != 304:
+                    raise RuntimeError(f"HTTP {status}")
+                node.last_success = time.monotonic()
+                node.latency = node.last_success - started
+                node.error = None
+                node.failures = 0
+            except Exception as e:
+                node.connection.close()
+                node.error = str(e) or type(e).__name__
+                node.failures += 1
+                if node.failures == 1:
+                    logger.warning(f"Fleet node {node.name} unreachable: {node.error}")
+
+    def view(self):
+        """Combined fleet document: per-node summaries plus totals over nodes with data"""
+        now = time.monotonic()
+        totals = {
+            'current': {'rx_rate': 0, 'tx_rate': 0},
+            'today': {'rx': 0, 'tx': 0, 'total': 0},
+            'month': {'rx': 0, 'tx': 0, 'total': 0}
+        }
+        counts = {'ok': 0, 'stale': 0, 'down': 0, 'pending': 0}
+        nodes = []
+
+        for node in self.nodes:
+            status = node.status(self.stale_after)
+            counts[status] += 1
+            summary = {
+                'name': node.name,
+                'url': node.url,
+                'status': status,
+                'age': round(now - node.last_success, 3) if node.last_success is not None else None,
+                'latency_ms': round(node.latency * 1000, 2) if node.latency is not None else None,
+                'error': node.error
+            }
+            stats = node.stats
+            if stats is not None:
+                # Whole-node usage; top-level fields only cover the node's primary interface
+                usage = stats.get('aggregate') or stats
+                for section, fields in totals.items():
+                    values = usage.get(section) or {}
+                    summary[section] = {key: values.get(key, 0) for key in fields}
+                    if status == 'ok':
+                        for key in fields:
+                            fields[key] += values.get(key, 0) or 0
+                for key in ('interface', 'server_ip', 'uptime', 'timestamp'):
+                    summary[key] = stats.get(key)
+            nodes.append(summary)
+
+        return {
+            'nodes': nodes,
+            'totals': totals,
+            'counts': counts,
+            'interval': self.interval,
+            'round_duration': self.round_duration,
+            'timestamp': time.time()
+        }
@@ -69,6 +69,9 @@ install_dependencies() {
     log "Installing dependencies..."
     apt install -y vnstat curl jq net-tools python3 python3-pip
     
+    # Optional: brotli compression for dashboard assets
+    apt install -y python3-brotli >/dev/null 2>&1 || warn "python3-brotli not available, using gzip only"
+    
     # Enable and start vnstat
     systemctl enable vnstat
     systemctl start vnstat
@@ -110,6 +113,10 @@ download_dashboard() {
     # Download JavaScript file
     curl -s "$GITHUB_REPO/dashboard/script.js" -o script.js
     
+    # Download fleet view
+    curl -s "$GITHUB_REPO/dashboard/fleet.html" -o fleet.html
+    curl -s "$GITHUB_REPO/dashboard/fleet.js" -o fleet.js
+    
     # Download API script
     mkdir -p api
     curl -s "$GITHUB_REPO/api/generate_json.sh" -o api/generate_json.sh
@@ -117,6 +124,15 @@ download_dashboard() {
     
     # Download Python server
     curl -s "$GITHUB_REPO/server.py" -o server.py
+    curl -s "$GITHUB_REPO/collector.py" -o collector.py
+    curl -s "$GITHUB_REPO/percentiles.py" -o percentiles.py
+    curl -s "$GITHUB_REPO/vnstat_db.py" -o vnstat_db.py
+    curl -s "$GITHUB_REPO/encoding.py" -o encoding.py
+    curl -s "$GITHUB_REPO/fleet.py" -o fleet.py
+    curl -s "$GITHUB_REPO/attribution.py" -o attribution.py
+    curl -s "$GITHUB_REPO/quota.py" -o quota.py
+    curl -s "$GITHUB_REPO/metrics.py" -o metrics.py
+    curl -s "$GITHUB_REPO/timeseries.py" -o timeseries.py
     
     log "Dashboard files downloaded successfully"
 }
@@ -152,7 +168,6 @@ Requires=vnstat.service
 Type=simple
 User=root
 WorkingDirectory=$INSTALL_DIR
-ExecStartPre=/bin/bash $INSTALL_DIR/api/generate_json.sh
 ExecStart=/usr/bin/python3 $INSTALL_DIR/server.py
 Restart=always
 RestartSec=5
@@ -165,12 +180,12 @@ EOF
     systemctl enable "$SERVICE_NAME"
 }
 
-# Setup cron job for data updates
+# Remove the legacy cron job for data updates
 setup_cron() {
-    log "Setting up cron job for data updates..."
+    log "Removing legacy cron job for data updates..."
     
-    # Add cron job to update stats every minute
-    (crontab -l 2>/dev/null; echo "* * * * * /bin/bash $INSTALL_DIR/api/generate_json.sh >/dev/null 2>&1") | crontab -
+    # server.py now collects stats in-process; generate_json.sh is only a fallback
+    (crontab -l 2>/dev/null | grep -v "$INSTALL_DIR/api/generate_json.sh") | crontab - || true
 }
 
 # Get server IP
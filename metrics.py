@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Metrics
+Minimal Prometheus text-format metrics (counters, gauges, histograms)
+"""
+
+import math
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def format_value(value):
+    """Format a sample value for the exposition format"""
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def format_labels(labels):
+    """Format a label dict as {name="value",...}"""
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+class Metric:
+    """Base class for a labelled metric family.
+
+    With a callback, values are not stored but computed at scrape time from
+    callback(), which yields (labels, value) pairs.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        # Unlabelled metrics are exported as 0 before their first update
+        self.values = {} if self.labelnames else {(): 0}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        """Label values in declaration order"""
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (name, labels, value) tuples"""
+        if self.callback is not None:
+            for labels, value in self.callback():
+                yield self.name, labels, value
+            return
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def render(self):
+        """Yield exposition lines for this family"""
+        yield f'# HELP {self.name} {self.documentation}\n'
+        yield f'# TYPE {self.name} {self.type}\n'
+        for name, labels, value in self.samples():
+            yield f'{name}{format_labels(labels)} {format_value(value)}\n'
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter"""
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        """Set the gauge"""
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        """Increase the gauge"""
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """Decrease the gauge"""
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        """Yield cumulative bucket, sum and count samples"""
+        with self.lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self.values.items()]
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', dict(labels, le=format_value(float(bound))), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+class Registry:
+    """Ordered set of metric families and custom collectors"""
+
+    def __init__(self):
+        self.collectors = []
+
+    def register(self, collector):
+        """Add a metric family (or any object with a render() generator)"""
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Yield the whole exposition text line by line"""
+        for collector in self.collectors:
+            yield from collector.render()
+
+REGISTRY = Registry()
+
+# Dashboard self-instrumentation
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'v2rayzone_http_request_duration_seconds', 'HTTP request latency by route', ['route']))
+COLLECTOR_DURATION = REGISTRY.register(Histogram(
+    'v2rayzone_collector_duration_seconds', 'Stats collector run duration', ['collector', 'result']))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'v2rayzone_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result']))
+REFRESH_REQUESTS = REGISTRY.register(Counter(
+    'v2rayzone_refresh_requests_total', 'Forced /api/refresh requests by outcome', ['result']))
+SUBPROCESS_FAILURES = REGISTRY.register(Counter(
+    'v2rayzone_subprocess_failures_total', 'Failed or timed out subprocess runs', ['command']))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'v2rayzone_http_requests_in_flight', 'HTTP requests currently being handled'))
+OPEN_CONNECTIONS = REGISTRY.register(Gauge(
+    'v2rayzone_http_connections_open', 'Client connections held by the worker pool'))
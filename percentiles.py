@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Billing Percentiles
+95th-percentile, peak and burst statistics per interface and billing window
+"""
+
+import math
+import time
+import threading
+from array import array
+import logging
+
+import quota
+
+# Configuration
+BUCKET_SECONDS = 300  # 5-minute buckets, as used for 95th-percentile billing
+PERCENTILES = (50, 95, 99)
+BILLED_PERCENTILE = 95  # percentile that sets the burst threshold and billable rate
+HISTORY_RESOLUTION = 'minute'  # history store resolution replayed into a window at startup
+DIRECTIONS = ('rx', 'tx')
+
+logger = logging.getLogger(__name__)
+
+def nearest_rank(sorted_values, percentile):
+    """Nearest-rank percentile: the highest value left after discarding the top (100 - p)%"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class BurstTracker:
+    """Runs of consecutive samples above a threshold rate, for one direction"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.longest = 0.0
+        self.current = 0.0  # seconds into the ongoing burst, 0 when below the threshold
+        self.since = None  # timestamp the ongoing burst started
+
+    def add(self, timestamp, rate, elapsed, threshold):
+        """Extend or end the ongoing burst"""
+        if threshold is None or rate <= threshold:
+            self.current = 0.0
+            self.since = None
+            return
+        if self.since is None:
+            self.since = timestamp - elapsed
+            self.count += 1
+        self.current += elapsed
+        self.seconds += elapsed
+        self.longest = max(self.longest, self.current)
+
+    def status(self, threshold):
+        """Burst summary"""
+        return {
+            'threshold': threshold,
+            'count': self.count,
+            'seconds': round(self.seconds, 1),
+            'longest': round(self.longest, 1),
+            'active_since': self.since
+        }
+
+class BillingWindow:
+    """One interface's billing window as fixed arrays of 5-minute buckets.
+
+    A sample adds its bytes to the bucket of its timestamp, so updates are
+    O(1) and memory is fixed by the window length (about 9000 buckets for a
+    month). Percentiles are taken over completed buckets and recomputed only
+    when a bucket completes.
+    """
+
+    def __init__(self, start, end, bucket_seconds=BUCKET_SECONDS, burst_threshold=None):
+        self.start = start
+        self.end = end
+        self.bucket_seconds = bucket_seconds
+        self.burst_threshold = burst_threshold  # bytes/s; None follows the billed percentile
+        slots = math.ceil((end - start) / bucket_seconds)
+        self.bytes = {direction: array('d', [0.0]) * slots for direction in DIRECTIONS}
+        self.seconds = array('d', [0.0]) * slots  # seconds of samples seen per bucket
+        self.totals = {direction: 0.0 for direction in DIRECTIONS}
+        self.covered = 0.0
+        self.peaks = {direction: (0.0, None) for direction in DIRECTIONS}  # (rate, timestamp)
+        self.bursts = {direction: BurstTracker() for direction in DIRECTIONS}
+        self.version = 0  # bumped when completed buckets change after the fact
+        self.cache_key = None
+        self.cache = None
+
+    def slot(self, timestamp):
+        """Bucket index of a timestamp"""
+        return int((timestamp - self.start) // self.bucket_seconds)
+
+    def add(self, timestamp, rates, elapsed):
+        """Account one live sample: {direction: bytes per second} over `elapsed` seconds"""
+        slot = self.slot(timestamp)
+        if not 0 <= slot < len(self.seconds):
+            return
+        self.seconds[slot] += elapsed
+        self.covered += elapsed
+        for direction, rate in rates.items():
+            self.bytes[direction][slot] += rate * elapsed
+            self.totals[direction] += rate * elapsed
+            if rate > self.peaks[direction][0]:
+                self.peaks[direction] = (rate, timestamp)
+            threshold = self.threshold(direction, timestamp)
+            self.bursts[direction].add(timestamp, rate, elapsed, threshold)
+
+    def add_record(self, timestamp, seconds, byte_counts, peaks):
+        """Account one history record (no burst tracking at that resolution).
+
+        Does not bump `version`; load_history does that once per batch so
+        live samples keep hitting the percentile cache during a replay.
+        """
+        slot = self.slot(timestamp)
+        if not 0 <= slot < len(self.seconds):
+            return
+        self.seconds[slot] += seconds
+        self.covered += seconds
+        for direction in DIRECTIONS:
+            self.bytes[direction][slot] += byte_counts[direction]
+            self.totals[direction] += byte_counts[direction]
+            if peaks[direction] > self.peaks[direction][0]:
+                self.peaks[direction] = (peaks[direction], timestamp)
+
+    def threshold(self, direction, now):
+        """Burst threshold: the configured rate, or the billed percentile so far"""
+        if self.burst_threshold is not None:
+            return self.burst_threshold
+        return self.percentiles(now)[direction][f"p{BILLED_PERCENTILE}"]
+
+    def percentiles(self, now):
+        """Percentiles and 5-minute peaks over completed buckets, cached until the next one completes"""
+        completed = max(0, min(self.slot(now), len(self.seconds)))
+        key = (completed, self.version)
+        if key == self.cache_key:
+            return self.cache
+
+        result = {}
+        for direction in DIRECTIONS:
+            values = sorted(
+                self.bytes[direction][i] / self.seconds[i]
+                for i in range(completed) if self.seconds[i] > 0
+            )
+            result[direction] = {f"p{p}": nearest_rank(values, p) for p in PERCENTILES}
+            result[direction]['peak_5min'] = values[-1] if values else None
+            result[direction]['buckets'] = len(values)
+        self.cache_key, self.cache = key, result
+        return result
+
+    def status(self, now):
+        """Summary of the window up to now"""
+        percentiles = self.percentiles(now)
+        covered = self.covered
+        summary = {
+            'window': {'start': self.start, 'end': self.end},
+            'bucket_seconds': self.bucket_seconds,
+            'buckets': percentiles['rx']['buckets'],
+            'covered_seconds': round(covered, 1)
+        }
+        for direction in DIRECTIONS:
+            total = self.totals[direction]
+            rate, timestamp = self.peaks[direction]
+            values = {key: value for key, value in percentiles[direction].items() if key != 'buckets'}
+            values['mean'] = total / covered if covered else None
+            values['bytes'] = int(total)
+            values['peak'] = {'rate': rate, 'timestamp': timestamp}
+            values['bursts'] = self.bursts[direction].status(self.threshold(direction, now))
+            summary[direction] = values
+
+        billed = [summary[d][f"p{BILLED_PERCENTILE}"] for d in DIRECTIONS]
+        summary['billable'] = max(billed) if None not in billed else None
+        return summary
+
+class PercentileTracker:
+    """Rate sampler listener keeping a BillingWindow per interface.
+
+    Windows follow the billing cycle (quota.cycle_bounds). When a cycle
+    ends its final summary is kept as 'previous' and the arrays start over,
+    so memory stays constant however long the server runs. Windows of
+    interfaces that disappear are kept, so a VPN device that reconnects
+    carries on with its billing window.
+    """
+
+    def __init__(self, billing_day=1, bucket_seconds=BUCKET_SECONDS, burst_threshold=None):
+        if not 1 <= billing_day <= 31:
+            raise ValueError("Billing day must be between 1 and 31")
+        self.billing_day = billing_day
+        self.bucket_seconds = bucket_seconds
+        self.burst_threshold = burst_threshold
+        self.windows = {}  # interface: BillingWindow
+        self.previous = {}  # interface: summary of the last completed window
+        self.lock = threading.Lock()
+
+    def _window(self, interface, timestamp):
+        """The interface's window containing timestamp, rolling over at the end of a cycle"""
+        window = self.windows.get(interface)
+        if window is not None and timestamp < window.end:
+            return window
+        if window is not None:
+            self.previous[interface] = window.status(window.end)
+        start, end = quota.cycle_bounds(timestamp, self.billing_day)
+        window = self.windows[interface] = BillingWindow(start, end, self.bucket_seconds, self.burst_threshold)
+        return window
+
+    def add_sample(self, interface, timestamp, rx_rate, tx_rate, elapsed):
+        """Rate sampler listener: account one sample in O(1)"""
+        with self.lock:
+            self._window(interface, timestamp).add(timestamp, {'rx': rx_rate, 'tx': tx_rate}, elapsed)
+
+    def load_history(self, store, interfaces, until=None):
+        """Replay stored history from the start of the current windows up to `until` (default: now).
+
+        Runs once at startup so a restart does not reset the window; live
+        samples after `until` arrive through add_sample as usual.
+        """
+        until = until if until is not None else time.time()
+        step = store.resolutions[HISTORY_RESOLUTION][0]
+        loaded = 0
+        for interface in interfaces:
+            with self.lock:
+                window = self._window(interface, until)
+            try:
+                # record: bucket start, seconds covered, rx bytes, tx bytes, rx min/max, tx min/max
+                records = [record for record in store.read(interface, HISTORY_RESOLUTION, window.start, until - step)
+                           if record[0] + step <= until and record[1] > 0]
+            except Exception as e:
+                logger.warning(f"Could not load {interface} history into its billing window: {e}")
+                continue
+
+            # One lock acquisition and one cache invalidation per interface
+            with self.lock:
+                for record in records:
+                    window.add_record(record[0], record[1], {'rx': record[2], 'tx': record[3]},
+                                      {'rx': record[5], 'tx': record[7]})
+                window.version += 1
+            loaded += len(records)
+        if loaded:
+            logger.info(f"Loaded {loaded} {HISTORY_RESOLUTION}s of history into the billing windows")
+
+    def status(self, interface=None, include_previous=False):
+        """{interface: summary} for the current windows, optionally with the previous ones"""
+        now = time.time()
+        with self.lock:
+            names = [interface] if interface is not None else sorted(self.windows)
+            result = {'interfaces': {}}
+            for name in names:
+                window = self.windows.get(name)
+                if window is not None:
+                    result['interfaces'][name] = window.status(min(now, window.end))
+            if include_previous:
+                result['previous'] = {name: self.previous[name] for name in names if name in self.previous}
+        result['billing_day'] = self.billing_day
+        result['percentile'] = BILLED_PERCENTILE
+        return result
+
+    def interfaces(self):
+        """Interfaces with a billing window"""
+        with self.lock:
+            return list(self.windows)
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Quota Engine
+Tracks transfer against monthly/daily caps and fires threshold alerts
+"""
+
+import os
+import json
+import math
+import time
+import queue
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime, timedelta
+import logging
+
+# Configuration
+THRESHOLDS = [80, 90, 100]  # percent of a limit that raise an alert
+PROJECTION_WINDOW = 3600  # seconds; time constant of the rate used for projection
+PROJECTION_WARMUP = 900  # seconds of samples before projection alerts may fire
+STATE_SAVE_INTERVAL = 60  # seconds between state writes while counting
+WEBHOOK_TIMEOUT = 10
+COMMAND_TIMEOUT = 30
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4, 'P': 1024 ** 5}
+DIRECTIONS = ('total', 'rx', 'tx')
+
+logger = logging.getLogger(__name__)
+
+def parse_size(value):
+    """Parse a byte size such as 500G, 1.5T or 1073741824 (binary units)"""
+    text = value.strip().upper().replace('IB', '').rstrip('B')
+    unit = text[-1:] if text[-1:] in SIZE_UNITS and text[-1:] else ''
+    number = text[:-1] if unit else text
+    try:
+        size = float(number) * SIZE_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Invalid size: {value}")
+    if not math.isfinite(size):
+        raise ValueError(f"Size must be finite: {value}")
+    if size <= 0:
+        raise ValueError(f"Size must be positive: {value}")
+    return int(size)
+
+def cycle_bounds(timestamp, billing_day):
+    """Return (start, end) timestamps of the billing cycle containing timestamp.
+
+    Cycles start at local midnight on billing_day; in shorter months a
+    billing day past the month's end falls on its last day.
+    """
+    def cycle_start(year, month):
+        if month < 1:
+            year, month = year - 1, month + 12
+        elif month > 12:
+            year, month = year + 1, month - 12
+        next_month = datetime(year + month // 12, month % 12 + 1, 1)
+        last_day = (next_month - timedelta(days=1)).day
+        return datetime(year, month, min(billing_day, last_day))
+
+    now = datetime.fromtimestamp(timestamp)
+    start = cycle_start(now.year, now.month)
+    if start > now:
+        start = cycle_start(now.year, now.month - 1)
+    end = cycle_start(start.year, start.month + 1)
+    return start.timestamp(), end.timestamp()
+
+def day_bounds(timestamp):
+    """Return (start, end) timestamps of the local day containing timestamp"""
+    start = datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+def write_json_atomic(data, path):
+    """Write JSON through a temp file so readers never see a partial file.
+
+    The temp file is unique per writer, so concurrent saves never replace
+    the file with each other's partial output.
+    """
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_file, path)
+
+class LogNotifier:
+    """Writes alerts to the server log"""
+
+    def notify(self, alert):
+        """Log one alert"""
+        logger.warning(f"Quota alert: {alert['message']}")
+
+class WebhookNotifier:
+    """POSTs alerts as JSON to a URL"""
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def notify(self, alert):
+        """POST one alert"""
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alert).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'User-Agent': 'V2RayZone-Dash'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+class CommandNotifier:
+    """Runs a local command with the alert as JSON on stdin and in V2RAYZONE_ALERT_* variables"""
+
+    def __init__(self, command, timeout=COMMAND_TIMEOUT):
+        self.command = command
+        self.timeout = timeout
+
+    def notify(self, alert):
+        """Run the command for one alert"""
+        env = dict(os.environ)
+        for key, value in alert.items():
+            env[f"V2RAYZONE_ALERT_{key.upper()}"] = str(value)
+        result = subprocess.run(
+            self.command,
+            shell=True,
+            input=json.dumps(alert),
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+            env=env
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Alert command failed: {result.stderr.strip()}")
+
+class QuotaPeriod:
+    """Usage against one limit (a billing cycle or a day) with its next alert threshold precomputed"""
+
+    def __init__(self, name, limit, thresholds):
+        self.name = name
+        self.limit = limit
+        self.thresholds = sorted(thresholds)
+        self.start = 0.0
+        self.end = 0.0
+        self.used = 0.0
+        self.fired = []  # threshold percentages already alerted this period
+        self.projection_fired = False
+        self.next_level = None
+        self.next_bytes = math.inf
+
+    def reset(self, start, end):
+        """Begin a new period"""
+        self.start = start
+        self.end = end
+        self.used = 0.0
+        self.fired = []
+        self.projection_fired = False
+        self.update_next()
+
+    def update_next(self):
+        """Cache the byte count at which the next threshold alert fires"""
+        pending = [level for level in self.thresholds if level not in self.fired]
+        self.next_level = pending[0] if pending else None
+        self.next_bytes = self.limit * self.next_level / 100 if pending else math.inf
+
+    def crossed(self):
+        """Return thresholds crossed since the last call, marking them fired"""
+        crossed = []
+        while self.used >= self.next_bytes:
+            crossed.append(self.next_level)
+            self.fired.append(self.next_level)
+            self.update_next()
+        return crossed
+
+    def projected(self, rate, now):
+        """Usage expected at the end of the period at the given rate"""
+        return self.used + rate * max(0.0, self.end - now)
+
+    def to_state(self):
+        """Serializable state"""
+        return {'start': self.start, 'end': self.end, 'used': self.used,
+                'fired': self.fired, 'projection_fired': self.projection_fired}
+
+    def load_state(self, state):
+        """Restore state saved by to_state()"""
+        self.start = state['start']
+        self.end = state['end']
+        self.used = state['used']
+        self.fired = [level for level in state.get('fired', []) if level in self.thresholds]
+        self.projection_fired = state.get('projection_fired', False)
+        self.update_next()
+
+class QuotaTracker:
+    """Incremental quota accounting fed by live rate samples.
+
+    Every sample costs O(1): bytes are added to the cycle and day totals,
+    the projection rate is an exponentially weighted average, and each
+    period compares against its precomputed next threshold. Alerts are
+    delivered on a separate thread so slow webhooks never delay sampling.
+    vnstat totals from each stats refresh are folded in with sync().
+    """
+
+    def __init__(self, monthly_limit=None, daily_limit=None, billing_day=1, thresholds=None,
+                 interface=None, direction='total', notifiers=None, state_file=None):
+        if not 1 <= billing_day <= 31:
+            raise ValueError("Billing day must be between 1 and 31")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Direction must be one of {', '.join(DIRECTIONS)}")
+
+        self.billing_day = billing_day
+        self.interface = interface  # None sums every monitored interface; callers pass the primary one
+        self.direction = direction
+        self.notifiers = notifiers if notifiers is not None else [LogNotifier()]
+        self.state_file = state_file
+        thresholds = thresholds or THRESHOLDS
+        self.periods = {}
+        if monthly_limit:
+            self.periods['cycle'] = QuotaPeriod('cycle', monthly_limit, thresholds)
+        if daily_limit:
+            self.periods['day'] = QuotaPeriod('day', daily_limit, thresholds)
+
+        self.rate = 0.0  # smoothed bytes per second used for projection
+        self.rate_seconds = 0.0  # seconds of samples behind the smoothed rate
+        self.last_save = 0.0
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # one save at a time, so an older state never lands last
+        self.alerts = queue.Queue()
+        self.recent_alerts = []
+        self.thread = None
+
+        now = time.time()
+        for period in self.periods.values():
+            period.reset(*self._bounds(period.name, now))
+        self.load_state()
+
+    def _bounds(self, name, timestamp):
+        """Period boundaries containing timestamp"""
+        if name == 'cycle':
+            return cycle_bounds(timestamp, self.billing_day)
+        return day_bounds(timestamp)
+
+    def _sample_bytes(self, rx, tx):
+        """Bytes that count against the quota"""
+        if self.direction == 'rx':
+            return rx
+        if self.direction == 'tx':
+            return tx
+        return rx + tx
+
+    def start(self):
+        """Start the alert delivery thread"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._delivery_loop, daemon=True)
+        self.thread.start()
+        limits = ', '.join(f"{name} {period.limit} bytes" for name, period in self.periods.items())
+        logger.info(f"Quota tracker started ({limits})")
+
+    def stop(self):
+        """Save state and stop delivering alerts"""
+        self.save_state()
+        if self.thread is not None:
+            self.alerts.put(None)
+            self.thread.join(COMMAND_TIMEOUT)
+            self.thread = None
+        logger.info("Quota tracker stopped")
+
+    def add_sample(self, interface, timestamp, rx_rate, tx_rate, elapsed):
+        """Rate sampler listener: account one sample in O(1)"""
+        if self.interface is not None and interface != self.interface:
+            return
+
+        rate = self._sample_bytes(rx_rate, tx_rate)
+        with self.lock:
+            weight = 1 - math.exp(-elapsed / PROJECTION_WINDOW)
+            self.rate += (rate - self.rate) * weight
+            self.rate_seconds += elapsed
+
+            for period in self.periods.values():
+                if timestamp >= period.end:
+                    period.reset(*self._bounds(period.name, timestamp))
+                period.used += rate * elapsed
+            self._evaluate(timestamp)
+
+            save = timestamp - self.last_save >= STATE_SAVE_INTERVAL
+        if save:
+            self.save_state()
+
+    def sync(self, stats):
+        """Fold vnstat totals from a stats document into the live counts.
+
+        Live counting only sees traffic since the server started, so the
+        larger of the two is kept. Runs once per stats refresh, not per sample.
+        """
+        blocks = stats.get('interfaces') or {stats.get('interface'): stats}
+        if self.interface is not None:
+            blocks = {self.interface: blocks.get(self.interface) or {}}
+
+        now = time.time()
+        totals = {'cycle': 0, 'day': 0}
+        for block in blocks.values():
+            today = block.get('today') or {}
+            totals['day'] += self._sample_bytes(today.get('rx', 0), today.get('tx', 0))
+            totals['cycle'] += self._vnstat_cycle_usage(block, now)
+
+        with self.lock:
+            for name, period in self.periods.items():
+                if now >= period.end:
+                    period.reset(*self._bounds(name, now))
+                period.used = max(period.used, totals[name])
+            self._evaluate(now)
+
+    def _vnstat_cycle_usage(self, block, now):
+        """Usage in the current billing cycle according to vnstat"""
+        if self.billing_day == 1:
+            month = block.get('month') or {}
+            return self._sample_bytes(month.get('rx', 0), month.get('tx', 0))
+
+        start = datetime.fromtimestamp(cycle_bounds(now, self.billing_day)[0]).strftime('%Y-%m-%d')
+        return sum(self._sample_bytes(day.get('rx', 0), day.get('tx', 0))
+                   for day in block.get('daily_history') or [] if day.get('date', '') >= start)
+
+    def _evaluate(self, now):
+        """Queue alerts for crossed thresholds and projected overruns (lock must be held)"""
+        for name, period in self.periods.items():
+            for level in period.crossed():
+                self._queue_alert('threshold', period, now, level=level)
+
+            if (not period.projection_fired and self.rate_seconds >= PROJECTION_WARMUP
+                    and period.used < period.limit and period.projected(self.rate, now) >= period.limit):
+                period.projection_fired = True
+                self._queue_alert('projection', period, now)
+
+    def _queue_alert(self, kind, period, now, level=None):
+        """Build an alert and hand it to the delivery thread"""
+        label = 'Billing cycle' if period.name == 'cycle' else 'Daily'
+        projected = period.projected(self.rate, now)
+        if kind == 'threshold':
+            message = f"{label} usage reached {level}% of quota ({int(period.used)} of {period.limit} bytes)"
+        else:
+            message = f"{label} usage projected to exceed quota ({int(projected)} of {period.limit} bytes)"
+
+        alert = {
+            'type': kind,
+            'period': period.name,
+            'level': level,
+            'used': int(period.used),
+            'limit': period.limit,
+            'projected': int(projected),
+            'period_start': period.start,
+            'period_end': period.end,
+            'interface': self.interface or '*',
+            'timestamp': now,
+            'message': message
+        }
+        self.recent_alerts = (self.recent_alerts + [alert])[-20:]
+        self.alerts.put(alert)
+        self.last_save = 0.0  # Persist fired alerts right away
+
+    def _delivery_loop(self):
+        """Deliver queued alerts to every notifier"""
+        while True:
+            alert = self.alerts.get()
+            if alert is None:
+                break
+            for notifier in self.notifiers:
+                try:
+                    notifier.notify(alert)
+                except Exception as e:
+                    logger.error(f"Error delivering quota alert via {type(notifier).__name__}: {e}")
+
+    def status(self):
+        """Current usage, limits and projections"""
+        now = time.time()
+        with self.lock:
+            result = {
+                'interface': self.interface or '*',
+                'direction': self.direction,
+                'billing_day': self.billing_day,
+                'rate': self.rate,
+                'recent_alerts': list(self.recent_alerts)
+            }
+            for name, period in self.periods.items():
+                result[name] = {
+                    'limit': period.limit,
+                    'used': int(period.used),
+                    'percent': round(period.used / period.limit * 100, 2),
+                    'projected': int(period.projected(self.rate, now)),
+                    'start': period.start,
+                    'end': period.end,
+                    'alerts_fired': list(period.fired)
+                }
+        return result
+
+    def load_state(self):
+        """Restore counts and fired alerts from the state file, if it matches the current periods"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load quota state: {e}")
+            return
+
+        if (state.get('billing_day') != self.billing_day or state.get('interface') != self.interface
+                or state.get('direction') != self.direction):
+            logger.info("Quota settings changed, starting with fresh quota state")
+            return
+
+        self.rate = state.get('rate', 0.0)
+        self.rate_seconds = state.get('rate_seconds', 0.0)
+        for name, period in self.periods.items():
+            saved = state.get('periods', {}).get(name)
+            # Only resume the period that is still running; limits may have changed
+            if saved and saved['start'] == period.start:
+                period.load_state(saved)
+
+    def save_state(self):
+        """Persist counts and fired alerts"""
+        if not self.state_file:
+            return
+        with self.save_lock:
+            with self.lock:
+                state = {
+                    'billing_day': self.billing_day,
+                    'interface': self.interface,
+                    'direction': self.direction,
+                    'rate': self.rate,
+                    'rate_seconds': self.rate_seconds,
+                    'periods': {name: period.to_state() for name, period in self.periods.items()}
+                }
+                self.last_save = time.time()
+            try:
+                write_json_atomic(state, self.state_file)
+            except OSError as e:
+                logger.error(f"Could not save quota state: {e}")
@@ -7,19 +7,77 @@ Lightweight Python server for the bandwidth dashboard
 import os
 import sys
 import json
+import math
+import gzip
 import time
+import signal
+import socket
 import threading
+import hashlib
+import select
+import selectors
+import argparse
 import subprocess
+from array import array
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 import logging
 
+import attribution
+import collector
+import encoding
+import fleet
+import metrics
+import percentiles
+import quota
+import timeseries
+import vnstat_db
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Configuration
 PORT = 2053
 INSTALL_DIR = '/opt/v2rayzone-dash'
 STATS_FILE = '/opt/v2rayzone-dash/api/stats.json'
 GENERATE_SCRIPT = '/opt/v2rayzone-dash/api/generate_json.sh'
+DATA_DIR = '/opt/v2rayzone-dash/data'  # persistent traffic history
+COLLECTOR = 'native'  # 'native' (in-process) or 'script' (generate_json.sh)
+VNSTAT_BACKEND = 'json'  # native collector's vnstat source: 'json' (vnstat --json), 'sqlite' or 'sqlite-copy'
+RATE_SAMPLE_INTERVAL = 0.5  # seconds between live rate samples
+RATE_HISTORY_SIZE = 600  # number of live rate samples kept in memory
+STATS_MAX_AGE = 10  # seconds before a stats snapshot is refreshed in the background
+STATS_ACTIVE_INTERVAL = 5  # seconds between stats refreshes while someone is watching
+STATS_IDLE_INTERVAL = 300  # seconds between stats refreshes with no viewers
+RATE_IDLE_INTERVAL = 5  # seconds between live rate samples with no viewers
+VIEWER_TIMEOUT = 30  # seconds after its last poll a client still counts as a viewer
+COLLECTOR_MAX_DUTY = 0.25  # fraction of the time a slow collector may spend running
+COLLECTOR_MAX_BACKOFF = 600  # seconds; upper bound on the retry delay of a failing collector
+REFRESH_MIN_INTERVAL = 5  # seconds; /api/refresh never starts collector runs closer together than this
+REFRESH_CLIENT_RATE = 0.1  # forced refreshes per second each client earns (one per 10s)
+REFRESH_CLIENT_BURST = 3  # forced refreshes a client may make back to back
+REFRESH_MAX_CLIENTS = 4096  # client token buckets tracked at once
+REFRESH_MAX_WAITERS = 4  # /api/refresh requests that may wait on an in-flight run
+SERVER_MODE = 'threaded'  # 'threaded' (bounded worker pool) or 'single'
+WORKERS = 16  # request handler threads in threaded mode
+MAX_CONNECTIONS = 64  # open connections accepted before replying 503
+KEEPALIVE_TIMEOUT = 15  # seconds an idle keep-alive connection is kept open (without holding a worker)
+REQUEST_TIMEOUT = 5  # seconds a worker waits on a client that has started sending a request
+KEEPALIVE_LINGER = 0.01  # seconds a worker waits for a quick follow-up request before parking the connection
+KEEPALIVE_BATCH = 16  # back-to-back requests a connection may handle while others wait for a worker
+COMPRESS_MIN_SIZE = 512  # bytes; smaller bodies are only sent uncompressed
+STREAM_INTERVAL = 1.0  # seconds between /api/stream pushes
+STREAM_MAX_SUBSCRIBERS = 256  # concurrent /api/stream clients
+STREAM_MAX_PENDING = 256 * 1024  # bytes buffered for a slow stream client before it is dropped
+STREAM_HEARTBEAT = 15  # seconds of silence before a keep-alive comment is sent
+METRICS_CHUNK_SIZE = 16 * 1024  # bytes of exposition text per chunk written by /metrics
+# /api/history columns: bucket start, rx avg/min/max rate and bytes, tx avg/min/max rate and bytes
+HISTORY_COLUMNS = ['t', 'rx_avg', 'rx_min', 'rx_max', 'rx_bytes', 'tx_avg', 'tx_min', 'tx_max', 'tx_bytes']
 
 # Setup logging
 logging.basicConfig(
@@ -28,26 +86,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Polls of these routes mark the client as an active viewer
+VIEWER_ROUTES = {'/api/stats', '/api/rates', '/api/history', '/api/quota', '/api/stream'}
+
+# Routes with their own latency series; everything else is reported as 'other'
+ROUTES = {'/api/stats', '/api/health', '/api/refresh', '/api/rates', '/api/stream', '/api/history',
+          '/api/quota', '/api/percentiles', '/api/top', '/api/fleet', '/metrics', '/', '/index.html', '/style.css', '/script.js',
+          '/fleet', '/fleet.js'}
+
 class DashboardHandler(SimpleHTTPRequestHandler):
     """Custom HTTP handler for the dashboard"""
     
+    # Headers and body are separate writes; with Nagle on, keep-alive clients
+    # stall ~40ms per response waiting for a delayed ACK
+    disable_nagle_algorithm = True
+    
     def __init__(self, *args, **kwargs):
         # Change to the installation directory
         os.chdir(INSTALL_DIR)
         super().__init__(*args, **kwargs)
     
     def do_GET(self):
-        """Handle GET requests"""
+        """Handle GET requests, recording per-route latency"""
+        path = urlparse(self.path).path
+        start = time.perf_counter()
+        if (path in VIEWER_ROUTES and stats_updater is not None
+                and not self.headers.get('User-Agent', '').startswith(fleet.USER_AGENT)):
+            stats_updater.viewer_seen(self.client_address[0])
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            self.route_request()
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            metrics.REQUEST_DURATION.observe(time.perf_counter() - start,
+                                             route=path if path in ROUTES else 'other')
+    
+    def route_request(self):
+        """Dispatch a GET request to its handler"""
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
         # API endpoints
         if path == '/api/stats':
-            self.handle_stats_api()
+            self.handle_stats_api(parse_qs(parsed_path.query))
         elif path == '/api/health':
             self.handle_health_api()
         elif path == '/api/refresh':
             self.handle_refresh_api()
+        elif path == '/api/rates':
+            self.handle_rates_api(parse_qs(parsed_path.query))
+        elif path == '/api/stream':
+            self.handle_stream_api()
+        elif path == '/api/history':
+            self.handle_history_api(parse_qs(parsed_path.query))
+        elif path == '/api/quota':
+            self.handle_quota_api()
+        elif path == '/api/percentiles':
+            self.handle_percentiles_api(parse_qs(parsed_path.query))
+        elif path == '/api/top':
+            self.handle_top_api(parse_qs(parsed_path.query))
+        elif path == '/api/fleet':
+            self.handle_fleet_api(parse_qs(parsed_path.query))
+        elif path == '/metrics':
+            self.handle_metrics()
         # Static files
         elif path == '/' or path == '/index.html':
             self.serve_file('index.html', 'text/html')
@@ -55,36 +156,31 @@ class DashboardHandler(SimpleHTTPRequestHandler):
             self.serve_file('style.css', 'text/css')
         elif path == '/script.js':
             self.serve_file('script.js', 'application/javascript')
+        elif path == '/fleet' or path == '/fleet.html':
+            self.serve_file('fleet.html', 'text/html')
+        elif path == '/fleet.js':
+            self.serve_file('fleet.js', 'application/javascript')
         else:
             self.send_error(404, 'File not found')
     
-    def handle_stats_api(self):
+    def handle_stats_api(self, query):
         """Handle /api/stats endpoint"""
         try:
-            # Check if stats file exists and is recent
-            if not os.path.exists(STATS_FILE):
-                logger.warning(f"Stats file not found: {STATS_FILE}")
-                self.generate_stats()
+            fmt = self.request_format(query)
+            if fmt is None:
+                return
             
-            # Check if file is older than 10 seconds
-            file_age = time.time() - os.path.getmtime(STATS_FILE)
-            if file_age > 10:
-                logger.info("Stats file is old, regenerating...")
-                self.generate_stats()
+            # Cold start without a saved snapshot: answer at once instead of waiting on the collectors
+            if stats_cache.snapshot is None and stats_cache.refreshing():
+                self.send_error_json(503, "Stats are still being collected", {'Retry-After': '1'})
+                return
             
-            # Read and serve the stats file
-            with open(STATS_FILE, 'r') as f:
-                stats_data = f.read()
+            # Served from memory; stale snapshots are refreshed in the background
+            snapshot = stats_cache.get()
             
-            # Validate JSON
-            json.loads(stats_data)  # This will raise an exception if invalid
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-            self.end_headers()
-            self.wfile.write(stats_data.encode('utf-8'))
+            # no-cache (not no-store) lets pollers revalidate with If-None-Match
+            self.send_cached_body(snapshot.format_variants(fmt), encoding.CONTENT_TYPES[fmt], 'no-cache',
+                                  {'Access-Control-Allow-Origin': '*'}, vary='Accept, Accept-Encoding')
             
         except Exception as e:
             logger.error(f"Error serving stats API: {e}")
@@ -93,28 +189,56 @@ class DashboardHandler(SimpleHTTPRequestHandler):
     def handle_health_api(self):
         """Handle /api/health endpoint"""
         try:
+            snapshot = stats_cache.snapshot
             health_data = {
                 'status': 'healthy',
                 'timestamp': datetime.now().isoformat(),
                 'server': 'V2RayZone Dash',
                 'version': '1.0',
-                'uptime': self.get_server_uptime()
+                'uptime': self.get_server_uptime(),
+                'stats': 'warming' if snapshot is None else 'stale' if snapshot.stale else 'fresh'
             }
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(health_data).encode('utf-8'))
+            self.send_json_response(health_data)
             
         except Exception as e:
             logger.error(f"Error serving health API: {e}")
             self.send_error_json(500, f"Health check failed: {str(e)}")
     
     def handle_refresh_api(self):
-        """Handle /api/refresh endpoint - force regenerate stats"""
+        """Handle /api/refresh endpoint - force regenerate stats, subject to admission control"""
         try:
-            self.generate_stats()
+            client = self.client_address[0]
+            snapshot = stats_cache.snapshot
+            if not stats_cache.refreshing():
+                # A snapshot this recent is what a forced run would return; answer with it for free
+                if snapshot is not None and not snapshot.stale and snapshot.age() < refresh_limiter.min_interval:
+                    metrics.REFRESH_REQUESTS.inc(result='fresh')
+                    self.send_json_response({
+                        'status': 'success',
+                        'message': 'Stats are already fresh',
+                        'age': round(snapshot.age(), 3),
+                        'timestamp': datetime.now().isoformat()
+                    })
+                    return
+                retry_after = refresh_limiter.interval_remaining()
+                if retry_after > 0:
+                    self.reject_refresh(retry_after)
+                    return
+            
+            # Tokens are only spent on starting or joining a run
+            retry_after = refresh_limiter.admit(client)
+            if retry_after > 0:
+                self.reject_refresh(retry_after)
+                return
+            refresh_limiter.forced()
+            
+            # Joins a run already in flight instead of starting another
+            if stats_cache.refresh(max_waiters=refresh_limiter.max_waiters) is None:
+                refresh_limiter.refund(client)
+                self.reject_refresh(stats_cache.last_duration)
+                return
+            metrics.REFRESH_REQUESTS.inc(result='refreshed')
             
             response_data = {
                 'status': 'success',
@@ -122,39 +246,331 @@ class DashboardHandler(SimpleHTTPRequestHandler):
                 'timestamp': datetime.now().isoformat()
             }
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(response_data).encode('utf-8'))
+            self.send_json_response(response_data)
             
         except Exception as e:
             logger.error(f"Error refreshing stats: {e}")
             self.send_error_json(500, f"Failed to refresh stats: {str(e)}")
     
-    def serve_file(self, filename, content_type):
-        """Serve a static file"""
+    def reject_refresh(self, retry_after):
+        """Answer an over-limit /api/refresh with 429 and when to retry"""
+        metrics.REFRESH_REQUESTS.inc(result='rejected')
+        self.send_error_json(429, "Too many refresh requests",
+                             {'Retry-After': str(max(1, math.ceil(retry_after)))})
+    
+    def handle_rates_api(self, query):
+        """Handle /api/rates endpoint - live rate samples newer than ?since=<ts>"""
         try:
-            file_path = os.path.join(INSTALL_DIR, filename)
+            fmt = self.request_format(query)
+            if fmt is None:
+                return
+            if rate_sampler is None:
+                self.send_error_json(503, "Rate sampler is not running")
+                return
             
-            if not os.path.exists(file_path):
-                self.send_error(404, f'File not found: {filename}')
+            try:
+                since = float(query.get('since', ['0'])[0])
+            except ValueError:
+                self.send_error_json(400, "Invalid 'since' timestamp")
+                return
+            if not math.isfinite(since):
+                self.send_error_json(400, "'since' must be a finite timestamp")
+                return
+            
+            interface = query.get('iface', [rate_sampler.interface])[0]
+            if interface not in rate_sampler.interfaces():
+                self.send_error_json(404, f"Unknown interface: {interface}")
+                return
+            
+            response_data = {
+                'interface': interface,
+                'interval': rate_sampler.interval,
+                'timestamp': time.time()
+            }
+            response_data.update(rate_sampler.since(since, interface))
+            
+            self.send_formatted_response(response_data, fmt)
+            
+        except Exception as e:
+            logger.error(f"Error serving rates API: {e}")
+            self.send_error_json(500, f"Internal server error: {str(e)}")
+    
+    def handle_history_api(self, query):
+        """Handle /api/history endpoint - downsampled rx/tx series as columns"""
+        try:
+            fmt = self.request_format(query)
+            if fmt is None:
+                return
+            if history_store is None:
+                self.send_error_json(503, "Traffic history is disabled")
+                return
+            
+            try:
+                now = time.time()
+                end = float(query.get('to', [now])[0])
+                start = float(query.get('from', [end - 3600])[0])
+                step = int(query.get('step', ['0'])[0])
+                max_points = int(query.get('points', [timeseries.MAX_POINTS])[0])
+            except ValueError:
+                self.send_error_json(400, "Invalid from/to/step/points parameter")
+                return
+            if not (math.isfinite(start) and math.isfinite(end)):
+                self.send_error_json(400, "'from' and 'to' must be finite timestamps")
+                return
+            if start >= end:
+                self.send_error_json(400, "'from' must be before 'to'")
+                return
+            
+            interface = query.get('iface', [rate_sampler.interface if rate_sampler else ''])[0]
+            if interface not in history_store.interfaces():
+                self.send_error_json(404, f"Unknown interface: {interface}")
+                return
+            step, resolution = timeseries.plan_query(history_store.resolutions, start, end, step, max_points, now)
+            
+            columns = {name: array('d') for name in HISTORY_COLUMNS}
+            records = history_store.read(interface, resolution, start, end)
+            for bucket in timeseries.downsample(records, int(start), step):
+                ts, seconds, rx_bytes, tx_bytes, rx_min, rx_max, tx_min, tx_max = bucket
+                for name, value in zip(HISTORY_COLUMNS, (ts, rx_bytes / seconds, rx_min, rx_max, rx_bytes,
+                                                         tx_bytes / seconds, tx_min, tx_max, tx_bytes)):
+                    columns[name].append(value)
+            
+            header = {
+                'interface': interface,
+                'from': start,
+                'to': end,
+                'step': step,
+                'resolution': resolution,
+                'points': len(columns['t'])
+            }
+            if fmt == 'json':
+                self.send_chunked_response(self.encode_columns(header, columns), 'application/json')
+            else:
+                header.update(columns)
+                self.send_formatted_response(header, fmt)
+            
+        except Exception as e:
+            logger.error(f"Error serving history API: {e}")
+            self.send_error_json(500, f"Internal server error: {str(e)}")
+    
+    def handle_quota_api(self):
+        """Handle /api/quota endpoint - usage against configured caps"""
+        try:
+            if quota_tracker is None:
+                self.send_error_json(404, "No quota configured")
+                return
+            
+            self.send_json_response(quota_tracker.status())
+            
+        except Exception as e:
+            logger.error(f"Error serving quota API: {e}")
+            self.send_error_json(500, f"Internal server error: {str(e)}")
+    
+    def handle_percentiles_api(self, query):
+        """Handle /api/percentiles endpoint - 95th percentile, peaks and bursts per billing window"""
+        try:
+            fmt = self.request_format(query)
+            if fmt is None:
+                return
+            if percentile_tracker is None:
+                self.send_error_json(503, "Rate sampler is not running")
+                return
+            
+            interface = query.get('iface', [None])[0]
+            if interface is not None and interface not in percentile_tracker.interfaces():
+                self.send_error_json(404, f"Unknown interface: {interface}")
+                return
+            
+            response_data = percentile_tracker.status(interface, include_previous=True)
+            response_data['timestamp'] = time.time()
+            self.send_formatted_response(response_data, fmt)
+            
+        except Exception as e:
+            logger.error(f"Error serving percentiles API: {e}")
+            self.send_error_json(500, f"Internal server error: {str(e)}")
+    
+    def handle_top_api(self, query):
+        """Handle /api/top endpoint - heavy hitters by port, process or cgroup"""
+        try:
+            if traffic_attributor is None:
+                self.send_error_json(404, "Traffic attribution is disabled (start with --attribution)")
+                return
+            
+            dimension = query.get('by', ['port'])[0]
+            if dimension not in attribution.DIMENSIONS:
+                self.send_error_json(400, f"'by' must be one of {', '.join(attribution.DIMENSIONS)}")
+                return
+            try:
+                n = max(1, min(int(query.get('n', [attribution.TOP_DEFAULT])[0]), traffic_attributor.capacity))
+            except ValueError:
+                self.send_error_json(400, "Invalid 'n' parameter")
+                return
+            
+            self.send_json_response(traffic_attributor.top(dimension, n))
+            
+        except Exception as e:
+            logger.error(f"Error serving top API: {e}")
+            self.send_error_json(500, f"Internal server error: {str(e)}")
+    
+    def handle_fleet_api(self, query):
+        """Handle /api/fleet endpoint - combined view of all polled nodes"""
+        try:
+            fmt = self.request_format(query)
+            if fmt is None:
+                return
+            if fleet_poller is None:
+                self.send_error_json(404, "Fleet mode is disabled (start with --fleet-nodes or --fleet-file)")
                 return
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            snapshot = fleet_snapshot
+            if snapshot is None:
+                self.send_error_json(503, "First fleet polling round has not finished")
+                return
+            
+            self.send_cached_body(snapshot.format_variants(fmt), encoding.CONTENT_TYPES[fmt], 'no-cache',
+                                  {'Access-Control-Allow-Origin': '*'}, vary='Accept, Accept-Encoding')
+            
+        except Exception as e:
+            logger.error(f"Error serving fleet API: {e}")
+            self.send_error_json(500, f"Internal server error: {str(e)}")
+    
+    def handle_metrics(self):
+        """Handle /metrics endpoint - Prometheus text exposition format"""
+        try:
+            self.send_chunked_response(encode_lines(metrics.REGISTRY.render(), METRICS_CHUNK_SIZE),
+                                       'text/plain; version=0.0.4; charset=utf-8')
+        except Exception as e:
+            logger.error(f"Error serving metrics: {e}")
+    
+    def request_format(self, query):
+        """Negotiate the response format from ?format= or Accept; sends 400 and returns None if invalid"""
+        try:
+            return encoding.negotiate_format(query.get('format', [None])[0], self.headers.get('Accept', ''))
+        except ValueError as e:
+            self.send_error_json(400, str(e))
+            return None
+    
+    def send_formatted_response(self, data, fmt):
+        """Send a document as JSON or, when negotiated, a compact encoding"""
+        if fmt == 'json':
+            self.send_json_response(data)
+            return
+        
+        self.send_cached_body(compress_variants(encoding.encode(data, fmt)), encoding.CONTENT_TYPES[fmt],
+                              'no-cache', {'Access-Control-Allow-Origin': '*'}, vary='Accept, Accept-Encoding')
+    
+    @staticmethod
+    def encode_columns(header, columns):
+        """Yield a columnar JSON document piece by piece"""
+        yield json.dumps(header)[:-1].encode('utf-8')
+        for name, values in columns.items():
+            yield f', "{name}": '.encode('utf-8')
+            yield json.dumps(values.tolist()).encode('utf-8')
+        yield b'}'
+    
+    def send_chunked_response(self, chunks, content_type):
+        """Stream a response body without building it in memory first"""
+        chunked = self.protocol_version == 'HTTP/1.1' and self.request_version == 'HTTP/1.1'
+        
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-cache')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            # HTTP/1.0: the end of the body is marked by closing the connection
+            self.close_connection = True
+        self.end_headers()
+        
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if chunked:
+                self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b'\r\n')
+            else:
+                self.wfile.write(chunk)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+    
+    def handle_stream_api(self):
+        """Handle /api/stream endpoint - Server-Sent Events push of rate and stats changes"""
+        try:
+            if stream_hub is None or not stream_hub.has_capacity():
+                self.send_error_json(503, "Stream is not available")
+                return
             
             self.send_response(200)
-            self.send_header('Content-Type', content_type)
-            self.send_header('Cache-Control', 'public, max-age=300')  # 5 minutes cache
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(content.encode('utf-8'))
+            self.wfile.flush()
+            
+            # Hand the socket to the shared producer and free this worker thread
+            self.close_connection = True
+            self.server.detach_request(self.request)
+            stream_hub.subscribe(self.request)
+            
+        except Exception as e:
+            logger.error(f"Error opening stream: {e}")
+    
+    def serve_file(self, filename, content_type):
+        """Serve a static file from the in-memory asset cache"""
+        try:
+            asset = static_assets.get(filename, content_type)
+            if asset is None:
+                self.send_error(404, f'File not found: {filename}')
+                return
+            
+            self.send_cached_body(asset.variants, content_type, 'public, max-age=300')  # 5 minutes cache
             
         except Exception as e:
             logger.error(f"Error serving file {filename}: {e}")
             self.send_error(500, f'Internal server error: {str(e)}')
     
-    def send_error_json(self, code, message):
+    def send_cached_body(self, variants, content_type, cache_control, extra_headers=None, vary='Accept-Encoding'):
+        """Send a pre-encoded body, negotiating encoding and answering If-None-Match with 304"""
+        content_encoding = choose_encoding(self.headers.get('Accept-Encoding', ''), variants)
+        body, etag = variants[content_encoding]
+        
+        not_modified = etag_matches(self.headers.get('If-None-Match'), etag)
+        if not_modified:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if content_encoding != 'identity':
+                self.send_header('Content-Encoding', content_encoding)
+        
+        self.send_header('ETag', etag)
+        self.send_header('Vary', vary)
+        self.send_header('Cache-Control', cache_control)
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        
+        if not not_modified:
+            self.wfile.write(body)
+    
+    def send_json_response(self, data, code=200, extra_headers=None):
+        """Send JSON response"""
+        body = json.dumps(data).encode('utf-8')
+        
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_error_json(self, code, message, extra_headers=None):
         """Send JSON error response"""
         error_data = {
             'error': True,
@@ -163,38 +579,7 @@ class DashboardHandler(SimpleHTTPRequestHandler):
             'timestamp': datetime.now().isoformat()
         }
         
-        self.send_response(code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(error_data).encode('utf-8'))
-    
-    def generate_stats(self):
-        """Generate stats using the bash script"""
-        try:
-            if not os.path.exists(GENERATE_SCRIPT):
-                raise FileNotFoundError(f"Generate script not found: {GENERATE_SCRIPT}")
-            
-            # Run the generate script
-            result = subprocess.run(
-                ['bash', GENERATE_SCRIPT],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode != 0:
-                logger.error(f"Generate script failed: {result.stderr}")
-                raise RuntimeError(f"Script execution failed: {result.stderr}")
-            
-            logger.info("Stats generated successfully")
-            
-        except subprocess.TimeoutExpired:
-            logger.error("Generate script timed out")
-            raise RuntimeError("Stats generation timed out")
-        except Exception as e:
-            logger.error(f"Error generating stats: {e}")
-            raise
+        self.send_json_response(error_data, code, extra_headers)
     
     def get_server_uptime(self):
         """Get server uptime"""
@@ -214,12 +599,929 @@ class DashboardHandler(SimpleHTTPRequestHandler):
         """Override log message to use our logger"""
         logger.info(f"{self.address_string()} - {format % args}")
 
-class StatsUpdater:
-    """Background thread to update stats periodically"""
+def compress_variants(body):
+    """Return {encoding: (body, strong ETag)} for the identity body and its compressed forms"""
+    digest = hashlib.sha1(body).hexdigest()[:20]
+    variants = {'identity': (body, f'"{digest}"')}
+    
+    if len(body) >= COMPRESS_MIN_SIZE:
+        compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body)
+        
+        # Each encoding gets its own ETag since the bytes differ
+        suffixes = {'gzip': 'gz', 'br': 'br'}
+        for content_encoding, data in compressed.items():
+            if len(data) < len(body):
+                variants[content_encoding] = (data, f'"{digest}-{suffixes[content_encoding]}"')
+    
+    return variants
+
+def choose_encoding(accept_encoding, variants):
+    """Pick the best available encoding allowed by an Accept-Encoding header"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    
+    for content_encoding in ('br', 'gzip'):
+        if content_encoding in variants and accepted.get(content_encoding, accepted.get('*', 0)) > 0:
+            return content_encoding
+    return 'identity'
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    # Weak comparison, as required for If-None-Match
+    return etag in candidates or f'W/{etag}' in candidates
+
+class StaticAsset:
+    """Static file held in memory with precompressed variants"""
+    
+    def __init__(self, file_path):
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.variants = compress_variants(body)
+
+class StaticAssetCache:
+    """Loads static files once and reloads them only when they change on disk"""
+    
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.assets = {}
+        self.lock = threading.Lock()
+    
+    def get(self, filename, content_type):
+        """Return the cached asset, or None if the file does not exist"""
+        file_path = os.path.join(self.root_dir, filename)
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        
+        asset = self.assets.get(filename)
+        if asset is None or asset.mtime != stat.st_mtime or asset.size != stat.st_size:
+            metrics.CACHE_REQUESTS.inc(cache='static', result='miss')
+            with self.lock:
+                asset = StaticAsset(file_path)
+                self.assets[filename] = asset
+        else:
+            metrics.CACHE_REQUESTS.inc(cache='static', result='hit')
+        return asset
+
+static_assets = StaticAssetCache(INSTALL_DIR)
+native_collector = collector.NativeCollector()
+rate_sampler = None
+stream_hub = None
+history_store = None
+quota_tracker = None
+traffic_attributor = None
+percentile_tracker = None
+fleet_poller = None
+fleet_snapshot = None
+stats_updater = None
+
+def run_generate_script():
+    """Generate stats using the bash script"""
+    try:
+        if not os.path.exists(GENERATE_SCRIPT):
+            raise FileNotFoundError(f"Generate script not found: {GENERATE_SCRIPT}")
+        
+        # Run the generate script
+        result = subprocess.run(
+            ['bash', GENERATE_SCRIPT],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        
+        if result.returncode != 0:
+            logger.error(f"Generate script failed: {result.stderr}")
+            metrics.SUBPROCESS_FAILURES.inc(command='generate_json')
+            raise RuntimeError(f"Script execution failed: {result.stderr}")
+        
+    except subprocess.TimeoutExpired:
+        logger.error("Generate script timed out")
+        metrics.SUBPROCESS_FAILURES.inc(command='generate_json')
+        raise RuntimeError("Stats generation timed out")
+
+@contextmanager
+def observe_collector(name):
+    """Time one collector run into the duration histogram"""
+    start = time.perf_counter()
+    result = 'error'
+    try:
+        yield
+        result = 'success'
+    finally:
+        metrics.COLLECTOR_DURATION.observe(time.perf_counter() - start, collector=name, result=result)
+
+def read_stats_file():
+    """Read and validate stats.json"""
+    with open(STATS_FILE, 'r') as f:
+        return json.load(f)
+
+def generate_stats():
+    """Generate stats.json, falling back to the bash script if the native collector fails.
     
-    def __init__(self, interval=60):
+    Returns the generated stats document.
+    """
+    try:
+        stats = None
+        if COLLECTOR == 'native':
+            try:
+                with observe_collector('native'):
+                    stats = native_collector.generate(STATS_FILE)
+            except Exception as e:
+                logger.warning(f"Native collector failed, falling back to script: {e}")
+        
+        if stats is None:
+            with observe_collector('script'):
+                run_generate_script()
+                stats = read_stats_file()
+        
+        logger.info("Stats generated successfully")
+        return stats
+        
+    except Exception as e:
+        logger.error(f"Error generating stats: {e}")
+        raise
+
+class StatsSnapshot:
+    """Pre-encoded stats document shared by all requests"""
+    
+    def __init__(self, data, generated_at=None, stale=False):
+        self.data = data
+        self.stale = stale  # loaded from disk at startup, not yet refreshed
+        self.body = json.dumps(data).encode('utf-8')
+        self.variants = compress_variants(self.body)
+        self.formats = {'json': self.variants}
+        self.etag = self.variants['identity'][1]
+        self.generated_at = generated_at if generated_at is not None else time.time()
+    
+    def format_variants(self, fmt):
+        """Variants in a response format, encoded on first use and kept with the snapshot"""
+        variants = self.formats.get(fmt)
+        if variants is None:
+            # Concurrent first requests may both encode; the results are identical
+            variants = self.formats[fmt] = compress_variants(encoding.encode(self.data, fmt))
+        return variants
+    
+    def age(self):
+        """Seconds since the snapshot was generated"""
+        return time.time() - self.generated_at
+
+def backoff_delay(failures, base=STATS_ACTIVE_INTERVAL):
+    """Exponential retry delay after consecutive collector failures"""
+    return min(base * 2 ** failures, COLLECTOR_MAX_BACKOFF) if failures else 0
+
+class StatsCache:
+    """In-memory stats snapshot with single-flight, stale-while-revalidate refreshes"""
+    
+    def __init__(self, max_age=STATS_MAX_AGE):
+        self.max_age = max_age
+        self.snapshot = None
+        self.refresh_lock = threading.Lock()
+        self.waiters = 0  # requests blocked on the in-flight refresh
+        self.waiters_lock = threading.Lock()
+        self.failures = 0  # consecutive failed refreshes
+        self.retry_at = 0  # monotonic time before which stale hits do not retry
+        self.last_duration = 0.0
+    
+    def load_file(self):
+        """Seed the cache from the stats.json written by the previous run, marked stale"""
+        try:
+            stats = read_stats_file()
+            stats['stale'] = True
+            self.snapshot = StatsSnapshot(stats, os.path.getmtime(STATS_FILE), stale=True)
+            logger.info(f"Serving saved stats ({self.snapshot.age():.0f}s old) until the collectors warm up")
+        except Exception as e:
+            logger.warning(f"Could not load existing stats file: {e}")
+    
+    def refreshing(self):
+        """Whether a refresh is in flight"""
+        return self.refresh_lock.locked()
+    
+    def get(self):
+        """Return the current snapshot, triggering a background refresh if stale"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            # Nothing to serve yet; wait for (or run) the single in-flight refresh
+            metrics.CACHE_REQUESTS.inc(cache='stats', result='miss')
+            if time.monotonic() < self.retry_at:
+                raise RuntimeError(f"Stats generation failing, retrying in {self.retry_at - time.monotonic():.0f}s")
+            logger.warning("No stats snapshot available, generating...")
+            return self.refresh()
+        
+        if snapshot.age() > self.max_age:
+            metrics.CACHE_REQUESTS.inc(cache='stats', result='stale')
+            self.refresh_async()
+        else:
+            metrics.CACHE_REQUESTS.inc(cache='stats', result='hit')
+        return snapshot
+    
+    def refresh(self, max_waiters=None):
+        """Regenerate the snapshot, joining an in-flight refresh if there is one.
+        
+        With max_waiters set, returns None instead of joining when that
+        many callers are already waiting on the in-flight refresh.
+        """
+        if not self.refresh_lock.acquire(blocking=False):
+            with self.waiters_lock:
+                if max_waiters is not None and self.waiters >= max_waiters:
+                    return None
+                self.waiters += 1
+            # Another thread is already refreshing; wait for its result
+            try:
+                with self.refresh_lock:
+                    pass
+            finally:
+                with self.waiters_lock:
+                    self.waiters -= 1
+            if self.snapshot is None:
+                raise RuntimeError("Stats generation failed")
+            return self.snapshot
+        
+        try:
+            return self._refresh_locked()
+        finally:
+            self.refresh_lock.release()
+    
+    def refresh_async(self):
+        """Start a background refresh unless one is already running or the collector is backing off"""
+        if time.monotonic() < self.retry_at or not self.refresh_lock.acquire(blocking=False):
+            return
+        
+        def run():
+            try:
+                self._refresh_locked()
+            except Exception:
+                pass  # Already logged; keep serving the previous snapshot
+            finally:
+                self.refresh_lock.release()
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _refresh_locked(self):
+        """Generate stats and swap in a new snapshot (refresh_lock must be held)"""
+        start = time.perf_counter()
+        try:
+            stats = generate_stats()
+            stats['stale'] = False
+            if percentile_tracker is not None:
+                stats['percentiles'] = percentile_tracker.status()
+            if quota_tracker is not None:
+                quota_tracker.sync(stats)
+                stats['quota'] = quota_tracker.status()
+            self.snapshot = StatsSnapshot(stats)
+            self.failures = 0
+            return self.snapshot
+        except Exception:
+            self.failures += 1
+            self.retry_at = time.monotonic() + backoff_delay(self.failures)
+            raise
+        finally:
+            self.last_duration = time.perf_counter() - start
+
+stats_cache = StatsCache()
+
+class RefreshLimiter:
+    """Per-client token buckets for /api/refresh.
+    
+    Each client may force `burst` refreshes back to back and earns `rate`
+    more per second, and forced runs start at most once per `min_interval`.
+    Checks are O(1) and never block, so rejected requests cost no more than
+    the 429 itself.
+    """
+    
+    def __init__(self, rate=REFRESH_CLIENT_RATE, burst=REFRESH_CLIENT_BURST, min_interval=REFRESH_MIN_INTERVAL,
+                 max_clients=REFRESH_MAX_CLIENTS, max_waiters=REFRESH_MAX_WAITERS):
+        self.rate = rate
+        self.burst = burst
+        self.min_interval = min_interval
+        self.max_clients = max_clients
+        self.max_waiters = max_waiters
+        self.buckets = {}  # client: [tokens, monotonic time of the last update]
+        self.last_forced = None  # monotonic time the last forced run was started
+        self.lock = threading.Lock()
+    
+    def interval_remaining(self):
+        """Seconds until another forced run may start"""
+        if self.last_forced is None:
+            return 0
+        return self.min_interval - (time.monotonic() - self.last_forced)
+    
+    def forced(self):
+        """Record that a forced run was started or joined"""
+        self.last_forced = time.monotonic()
+    
+    def admit(self, client):
+        """Take a token for client; returns 0 if admitted, else seconds until one is available"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                if len(self.buckets) >= self.max_clients:
+                    self._prune(now)
+                bucket = self.buckets[client] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            
+            if bucket[0] < 1:
+                return (1 - bucket[0]) / self.rate
+            bucket[0] -= 1
+            return 0
+    
+    def refund(self, client):
+        """Give back a token taken for a run the client could not join"""
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + 1)
+    
+    def _prune(self, now):
+        """Forget refilled buckets, then the longest-tracked half if still full (lock must be held)"""
+        for client in [c for c, (tokens, seen) in self.buckets.items()
+                       if tokens + (now - seen) * self.rate >= self.burst]:
+            del self.buckets[client]
+        if len(self.buckets) >= self.max_clients:
+            for client in list(self.buckets)[:max(1, self.max_clients // 2)]:
+                del self.buckets[client]
+
+refresh_limiter = RefreshLimiter()
+
+def history_interfaces(store, sampler):
+    """Interfaces with stored history that the sampler would also sample now"""
+    stored = store.interfaces()
+    try:
+        present = collector.read_proc_net_dev(sampler.proc_net_dev)
+    except OSError:
+        present = stored
+    names = set(collector.select_interfaces([name for name in stored if name in present],
+                                            sampler.include, sampler.exclude))
+    names.add(sampler.interface)
+    return sorted(names & set(stored))
+
+def load_rate_history(store, sampler):
+    """Seed the live rate rings from the per-second history so charts survive a restart"""
+    end = time.time()
+    start = end - sampler.history_size * sampler.interval
+    
+    loaded = 0
+    for name in history_interfaces(store, sampler):
+        # record: bucket start, seconds covered, rx bytes, tx bytes, ...
+        samples = [(record[0], record[2] / record[1], record[3] / record[1])
+                   for record in store.read(name, 'second', start, end) if record[1] > 0]
+        sampler.preload(name, samples)
+        loaded += len(samples)
+    if loaded:
+        logger.info(f"Loaded {loaded} saved rate samples")
+
+def publish_fleet_view(view):
+    """Fleet poller callback: pre-encode the combined view once per polling round"""
+    global fleet_snapshot
+    fleet_snapshot = StatsSnapshot(view)
+
+def encode_lines(lines, chunk_size):
+    """Join text lines into encoded chunks of roughly chunk_size bytes"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+def interface_counter_samples(index):
+    """Metric callback yielding one raw counter column from the latest sampler read"""
+    def samples():
+        counters = rate_sampler.counters if rate_sampler is not None else {}
+        for name, values in counters.items():
+            if values[index] is not None:
+                yield {'interface': name}, values[index]
+    return samples
+
+def interface_rate_samples(index):
+    """Metric callback yielding the newest live rate per interface"""
+    def samples():
+        if rate_sampler is None:
+            return
+        for name, latest in rate_sampler.live().items():
+            yield {'interface': name}, latest[index]
+    return samples
+
+def interface_usage_samples():
+    """Metric callback yielding today/month totals from the current stats snapshot"""
+    snapshot = stats_cache.snapshot
+    if snapshot is None:
+        return
+    data = snapshot.data
+    blocks = data.get('interfaces') or {data.get('interface', 'unknown'): data}
+    for name, block in blocks.items():
+        for period in ('today', 'month'):
+            usage = block.get(period) or {}
+            for direction in ('rx', 'tx'):
+                if direction in usage:
+                    yield {'interface': name, 'period': period, 'direction': direction}, usage[direction]
+
+def snapshot_age_samples():
+    """Metric callback yielding the age of the current stats snapshot"""
+    if stats_cache.snapshot is not None:
+        yield {}, stats_cache.snapshot.age()
+
+def quota_samples(field):
+    """Metric callback yielding quota usage or limits per period"""
+    def samples():
+        if quota_tracker is None:
+            return
+        status = quota_tracker.status()
+        for period in ('cycle', 'day'):
+            if period in status:
+                yield {'period': period}, status[period][field]
+    return samples
+
+def percentile_samples(direction):
+    """Metric callback yielding the billed percentile rate per interface"""
+    def samples():
+        if percentile_tracker is None:
+            return
+        for name, summary in percentile_tracker.status()['interfaces'].items():
+            value = summary[direction][f"p{percentiles.BILLED_PERCENTILE}"]
+            if value is not None:
+                yield {'interface': name}, value
+    return samples
+
+def fleet_node_samples():
+    """Metric callback yielding fleet node counts by status"""
+    if fleet_snapshot is None:
+        return
+    for status, count in fleet_snapshot.data['counts'].items():
+        yield {'status': status}, count
+
+def viewer_samples():
+    """Metric callback yielding the number of active viewers"""
+    yield {}, stats_updater.viewer_count() if stats_updater is not None else 0
+
+def refresh_interval_samples():
+    """Metric callback yielding the current stats refresh interval"""
+    if stats_updater is not None:
+        yield {}, stats_updater.interval
+
+def stream_subscriber_samples():
+    """Metric callback yielding the number of open /api/stream clients"""
+    yield {}, len(stream_hub.subscribers) if stream_hub is not None else 0
+
+# Traffic metrics, read from in-memory state at scrape time
+for metric in (
+    metrics.Counter('v2rayzone_interface_receive_bytes_total', 'Interface rx byte counter',
+                    ['interface'], interface_counter_samples(0)),
+    metrics.Counter('v2rayzone_interface_transmit_bytes_total', 'Interface tx byte counter',
+                    ['interface'], interface_counter_samples(1)),
+    metrics.Counter('v2rayzone_interface_receive_packets_total', 'Interface rx packet counter',
+                    ['interface'], interface_counter_samples(2)),
+    metrics.Counter('v2rayzone_interface_transmit_packets_total', 'Interface tx packet counter',
+                    ['interface'], interface_counter_samples(3)),
+    metrics.Gauge('v2rayzone_interface_receive_rate_bytes', 'Live rx rate in bytes per second',
+                  ['interface'], interface_rate_samples(1)),
+    metrics.Gauge('v2rayzone_interface_transmit_rate_bytes', 'Live tx rate in bytes per second',
+                  ['interface'], interface_rate_samples(2)),
+    metrics.Gauge('v2rayzone_interface_usage_bytes', 'Bytes transferred today/this month according to vnstat',
+                  ['interface', 'period', 'direction'], interface_usage_samples),
+    metrics.Gauge('v2rayzone_quota_used_bytes', 'Transfer counted against the quota in the current period',
+                  ['period'], quota_samples('used')),
+    metrics.Gauge('v2rayzone_quota_limit_bytes', 'Configured quota per period',
+                  ['period'], quota_samples('limit')),
+    metrics.Gauge('v2rayzone_quota_projected_bytes', 'Projected transfer at the end of the period',
+                  ['period'], quota_samples('projected')),
+    metrics.Gauge('v2rayzone_interface_receive_p95_bytes', '95th percentile 5-minute rx rate in this billing window',
+                  ['interface'], percentile_samples('rx')),
+    metrics.Gauge('v2rayzone_interface_transmit_p95_bytes', '95th percentile 5-minute tx rate in this billing window',
+                  ['interface'], percentile_samples('tx')),
+    metrics.Gauge('v2rayzone_fleet_nodes', 'Polled fleet nodes by status',
+                  ['status'], fleet_node_samples),
+    metrics.Gauge('v2rayzone_stats_age_seconds', 'Age of the served stats snapshot',
+                  callback=snapshot_age_samples),
+    metrics.Gauge('v2rayzone_stream_subscribers', 'Open /api/stream connections',
+                  callback=stream_subscriber_samples),
+    metrics.Gauge('v2rayzone_viewers', 'Recent pollers plus open streams driving the collection cadence',
+                  callback=viewer_samples),
+    metrics.Gauge('v2rayzone_stats_refresh_interval_seconds', 'Current background stats refresh interval',
+                  callback=refresh_interval_samples)
+):
+    metrics.REGISTRY.register(metric)
+
+class StreamSubscriber:
+    """Non-blocking /api/stream connection with a bounded send buffer"""
+    
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.pending = bytearray()
+    
+    def send(self, data):
+        """Queue data and write as much as the socket accepts; False if the client is gone or too slow"""
+        self.pending += data
+        try:
+            while self.pending:
+                sent = self.sock.send(self.pending)
+                del self.pending[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        return len(self.pending) <= STREAM_MAX_PENDING
+    
+    def close(self):
+        """Close the connection"""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class StreamHub:
+    """Single producer that pushes rate samples and changed stats to all /api/stream clients"""
+    
+    def __init__(self, interval=STREAM_INTERVAL, max_subscribers=STREAM_MAX_SUBSCRIBERS):
         self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.produce_lock = threading.Lock()
+        self.last_snapshot = None
+        self.last_rate_timestamp = time.time()
+        self.last_send = time.monotonic()
         self.running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        """Start the producer thread"""
+        if self.running:
+            return
+        
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._produce_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"Stream hub started with {self.interval}s interval")
+    
+    def stop(self):
+        """Stop the producer and disconnect all clients"""
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        with self.lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for subscriber in subscribers:
+            subscriber.close()
+        logger.info("Stream hub stopped")
+    
+    def has_capacity(self):
+        """Whether another client can subscribe"""
+        return self.running and len(self.subscribers) < self.max_subscribers
+    
+    def subscribe(self, sock):
+        """Register a client and send it the full current state"""
+        subscriber = StreamSubscriber(sock)
+        
+        # Hold off the producer so the next push continues exactly where this state ends
+        with self.produce_lock:
+            initial = b'retry: 3000\n\n'
+            snapshot = self.last_snapshot or stats_cache.snapshot
+            if snapshot is not None:
+                initial += b'event: snapshot\ndata: ' + snapshot.body + b'\n\n'
+            if rate_sampler is not None:
+                rates = rate_sampler.since(time.time() - 30)
+                count = sum(1 for t in rates['timestamps'] if t <= self.last_rate_timestamp)
+                rates = {key: values[:count] for key, values in rates.items()}
+                initial += self.format_event('rates', rates)
+            
+            if not subscriber.send(initial):
+                subscriber.close()
+                return
+            with self.lock:
+                self.subscribers.append(subscriber)
+    
+    @staticmethod
+    def format_event(event, data):
+        """Encode one Server-Sent Event"""
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+    
+    def build_message(self):
+        """Encode everything that changed since the previous push (once for all clients)"""
+        message = b''
+        
+        if rate_sampler is not None:
+            rates = rate_sampler.since(self.last_rate_timestamp)
+            if rates['timestamps']:
+                self.last_rate_timestamp = rates['timestamps'][-1]
+                message += self.format_event('rates', rates)
+        
+        snapshot = stats_cache.get() if stats_cache.snapshot is not None else None
+        if snapshot is not None and self.last_snapshot is None:
+            # First document since start-up: clients that connected while warming up have no base yet
+            self.last_snapshot = snapshot
+            message += b'event: snapshot\ndata: ' + snapshot.body + b'\n\n'
+        elif snapshot is not None and snapshot is not self.last_snapshot:
+            previous = self.last_snapshot.data
+            changed = {key: value for key, value in snapshot.data.items() if previous.get(key) != value}
+            self.last_snapshot = snapshot
+            if changed:
+                message += self.format_event('stats', changed)
+        
+        return message
+    
+    def broadcast(self, message):
+        """Send a message to every client, dropping disconnected or stalled ones"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        
+        dropped = [subscriber for subscriber in subscribers if not subscriber.send(message)]
+        if dropped:
+            with self.lock:
+                self.subscribers = [s for s in self.subscribers if s not in dropped]
+            for subscriber in dropped:
+                subscriber.close()
+    
+    def _produce_loop(self):
+        """Main producer loop"""
+        while self.running:
+            self.stop_event.wait(self.interval)
+            if not self.running:
+                break
+            
+            try:
+                with self.produce_lock:
+                    if not self.subscribers:
+                        # Nobody listening; new clients get the full state on subscribe
+                        self.last_rate_timestamp = time.time()
+                        self.last_snapshot = stats_cache.snapshot
+                        continue
+                    
+                    message = self.build_message()
+                    if not message and time.monotonic() - self.last_send >= STREAM_HEARTBEAT:
+                        message = b': keep-alive\n\n'
+                    if message:
+                        self.last_send = time.monotonic()
+                        self.broadcast(message)
+                
+            except Exception as e:
+                logger.error(f"Error in stream producer: {e}")
+
+class DashboardHTTPServer(HTTPServer):
+    """HTTPServer that lets handlers detach long-lived connections (e.g. /api/stream)"""
+    
+    def __init__(self, server_address, handler_class):
+        self.detached_requests = set()
+        self.detached_lock = threading.Lock()
+        super().__init__(server_address, handler_class)
+    
+    def detach_request(self, request):
+        """Keep the socket open after the handler returns; its new owner closes it"""
+        with self.detached_lock:
+            self.detached_requests.add(request)
+    
+    def shutdown_request(self, request):
+        """Close the connection unless it was detached"""
+        with self.detached_lock:
+            if request in self.detached_requests:
+                self.detached_requests.discard(request)
+                return
+        super().shutdown_request(request)
+
+class ParkingHandlerMixin:
+    """Handles the requests a connection sends back to back, then returns it to the server.
+    
+    The pooled server waits for the next request on idle keep-alive
+    connections itself, so they hold a worker for at most KEEPALIVE_LINGER,
+    and not at all while other connections are queued for a worker.
+    """
+    
+    def handle(self):
+        """Handle one request, plus any that follow within KEEPALIVE_LINGER"""
+        self.close_connection = True
+        self.handle_one_request()
+        handled = 1
+        while not self.close_connection and self.request_pending(handled):
+            self.handle_one_request()
+            handled += 1
+    
+    def request_pending(self, handled):
+        """Whether more request bytes are buffered, or arrive within KEEPALIVE_LINGER"""
+        try:
+            self.connection.settimeout(0)
+            if self.rfile.peek(1):
+                return True
+            if handled >= KEEPALIVE_BATCH and self.server.work_queued():
+                return False  # Let a queued connection have the worker
+            return bool(select.select([self.connection], [], [], KEEPALIVE_LINGER)[0])
+        except (OSError, ValueError):
+            return False
+        finally:
+            try:
+                self.connection.settimeout(self.timeout)
+            except OSError:
+                pass
+
+class PooledHTTPServer(DashboardHTTPServer):
+    """HTTPServer that handles requests on a bounded thread pool.
+    
+    Connections are only handed to a worker once they are readable; between
+    keep-alive requests they are parked on a selector watched by one poller
+    thread. Idle connections are closed after KEEPALIVE_TIMEOUT, and when all
+    connection slots are taken the longest-idle one makes room for a new client.
+    """
+    
+    def __init__(self, server_address, handler_class, workers=WORKERS, max_connections=MAX_CONNECTIONS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-worker')
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+        self.active_connections = set()
+        self.connections_lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.parked = {}  # waiting connection: (client address, monotonic deadline); oldest first
+        self.parked_lock = threading.Lock()
+        self.queued = 0  # readable connections submitted but not yet picked up by a worker
+        self.queued_lock = threading.Lock()
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.selector.register(self.wakeup_recv, selectors.EVENT_READ)
+        self.polling = True
+        self.poller = None
+        # Set up before binding: HTTPServer calls server_close() if binding fails
+        super().__init__(server_address, type(handler_class.__name__, (ParkingHandlerMixin, handler_class), {}))
+        self.poller = threading.Thread(target=self._poll_loop, name='http-poller', daemon=True)
+        self.poller.start()
+    
+    def process_request(self, request, client_address):
+        """Park a new connection until it sends a request, or reject it when at capacity"""
+        if not self.connection_slots.acquire(blocking=False):
+            # An idle keep-alive connection gives up its slot before a new client is turned away
+            if not (self._evict_idle() and self.connection_slots.acquire(blocking=False)):
+                try:
+                    request.sendall(b'HTTP/1.1 503 Service Unavailable\r\n'
+                                    b'Content-Length: 0\r\nRetry-After: 1\r\nConnection: close\r\n\r\n')
+                except OSError:
+                    pass
+                self.shutdown_request(request)
+                return
+        
+        with self.connections_lock:
+            self.active_connections.add(request)
+            metrics.OPEN_CONNECTIONS.set(len(self.active_connections))
+        self._park(request, client_address)
+    
+    def finish_request(self, request, client_address):
+        """Handle the requests received so far; returns True to keep the connection for more"""
+        handler = self.RequestHandlerClass(request, client_address, self)
+        return not handler.close_connection
+    
+    def process_request_worker(self, request, client_address):
+        """Handle a readable connection on a worker thread, then park or close it"""
+        with self.queued_lock:
+            self.queued -= 1
+        keep_alive = False
+        try:
+            keep_alive = self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        if keep_alive and self.polling:
+            self._park(request, client_address)
+        else:
+            self._release(request)
+    
+    def work_queued(self):
+        """Whether connections are waiting for a free worker"""
+        return self.queued > 0
+    
+    def _park(self, request, client_address):
+        """Wait for the connection's next request without holding a worker"""
+        with self.parked_lock:
+            self.parked[request] = (client_address, time.monotonic() + KEEPALIVE_TIMEOUT)
+            self.selector.register(request, selectors.EVENT_READ)
+        try:
+            self.wakeup_send.send(b'\0')
+        except OSError:
+            pass
+    
+    def _unpark(self, request):
+        """Take a connection off the selector; returns its client address, or None if already taken"""
+        with self.parked_lock:
+            entry = self.parked.pop(request, None)
+            if entry is not None:
+                self.selector.unregister(request)
+        return entry[0] if entry is not None else None
+    
+    def _evict_idle(self):
+        """Close the longest-idle parked connection; returns whether one was closed"""
+        with self.parked_lock:
+            request = next(iter(self.parked), None)
+        if request is None or self._unpark(request) is None:
+            return False
+        self._release(request)
+        return True
+    
+    def _release(self, request):
+        """Close a connection (unless detached) and free its slot"""
+        with self.connections_lock:
+            self.active_connections.discard(request)
+            metrics.OPEN_CONNECTIONS.set(len(self.active_connections))
+        self.shutdown_request(request)
+        self.connection_slots.release()
+    
+    def _poll_loop(self):
+        """Hand readable connections to the pool and drop ones idle past KEEPALIVE_TIMEOUT"""
+        while self.polling:
+            ready = self.selector.select(timeout=1)
+            for key, _ in ready:
+                if key.fileobj is self.wakeup_recv:
+                    self.wakeup_recv.recv(4096)
+                    continue
+                client_address = self._unpark(key.fileobj)
+                if client_address is not None:
+                    with self.queued_lock:
+                        self.queued += 1
+                    self.executor.submit(self.process_request_worker, key.fileobj, client_address)
+            
+            now = time.monotonic()
+            with self.parked_lock:
+                expired = [request for request, (_, deadline) in self.parked.items() if deadline <= now]
+            for request in expired:
+                if self._unpark(request) is not None:
+                    self._release(request)
+    
+    def server_close(self):
+        """Stop accepting, let in-flight requests finish and close idle keep-alive connections"""
+        super().server_close()
+        self.polling = False
+        if self.poller is not None:
+            self.wakeup_send.send(b'\0')
+            self.poller.join()
+        with self.parked_lock:
+            parked = list(self.parked)
+        for request in parked:
+            if self._unpark(request) is not None:
+                self._release(request)
+        with self.connections_lock:
+            connections = list(self.active_connections)
+        for request in connections:
+            try:
+                # Unblocks workers still reading a request
+                request.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.selector.close()
+        self.wakeup_recv.close()
+        self.wakeup_send.close()
+
+class StatsUpdater:
+    """Background thread refreshing stats at a cadence driven by viewer demand.
+    
+    A client counts as a viewer for viewer_timeout seconds after polling a
+    viewer route, and every open /api/stream connection counts as one.
+    While anyone is watching, stats are refreshed every active_interval and
+    live rates sampled every sample_interval; with no viewers both drop to
+    the idle cadence. The first viewer after an idle spell wakes the loop
+    at once. A slow collector stretches the interval so it runs at most
+    COLLECTOR_MAX_DUTY of the time, and failures back off exponentially.
+    """
+    
+    def __init__(self, active_interval=STATS_ACTIVE_INTERVAL, idle_interval=STATS_IDLE_INTERVAL,
+                 viewer_timeout=VIEWER_TIMEOUT, sampler=None, sample_interval=RATE_SAMPLE_INTERVAL,
+                 idle_sample_interval=RATE_IDLE_INTERVAL):
+        self.active_interval = active_interval
+        self.idle_interval = max(idle_interval, active_interval)
+        self.viewer_timeout = viewer_timeout
+        self.sampler = sampler
+        self.sample_interval = sample_interval
+        self.idle_sample_interval = max(idle_sample_interval, sample_interval)
+        self.viewers = {}  # client address: monotonic time of its last poll
+        self.viewers_lock = threading.Lock()
+        self.interval = idle_interval
+        self.running = False
+        self.stop_event = threading.Event()
         self.thread = None
     
     def start(self):
@@ -228,45 +1530,200 @@ class StatsUpdater:
             return
         
         self.running = True
+        self.stop_event.clear()
         self.thread = threading.Thread(target=self._update_loop, daemon=True)
         self.thread.start()
-        logger.info(f"Stats updater started with {self.interval}s interval")
+        logger.info(f"Stats updater started ({self.active_interval}s while watched, "
+                    f"{self.idle_interval}s idle)")
     
-    def stop(self):
+    def stop(self, timeout=35):
         """Stop the background updater"""
         self.running = False
+        self.stop_event.set()
         if self.thread:
-            self.thread.join()
+            # An in-flight generate_json.sh run may take up to its 30s timeout
+            self.thread.join(timeout)
         logger.info("Stats updater stopped")
     
+    def viewer_seen(self, client):
+        """Record a poll from a client, waking the loop if nobody was watching"""
+        now = time.monotonic()
+        with self.viewers_lock:
+            idle = not self._has_viewers_locked(now)
+            self.viewers[client] = now
+        if idle and self.running:
+            self.stop_event.set()
+    
+    def viewer_count(self):
+        """Clients seen within viewer_timeout plus open streams"""
+        now = time.monotonic()
+        with self.viewers_lock:
+            for client in [c for c, seen in self.viewers.items() if now - seen > self.viewer_timeout]:
+                del self.viewers[client]
+            count = len(self.viewers)
+        return count + (len(stream_hub.subscribers) if stream_hub is not None else 0)
+    
+    def _has_viewers_locked(self, now):
+        """Whether any poller or stream is still active (viewers_lock must be held)"""
+        if stream_hub is not None and stream_hub.subscribers:
+            return True
+        return any(now - seen <= self.viewer_timeout for seen in self.viewers.values())
+    
+    def next_interval(self, active):
+        """Refresh interval for the current demand, stretched for a slow or failing collector"""
+        interval = self.active_interval if active else self.idle_interval
+        interval = max(interval, stats_cache.last_duration / COLLECTOR_MAX_DUTY)
+        return max(interval, backoff_delay(stats_cache.failures, self.active_interval))
+    
     def _update_loop(self):
         """Main update loop"""
         while self.running:
-            try:
-                # Generate stats
-                result = subprocess.run(
-                    ['bash', GENERATE_SCRIPT],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode == 0:
+            active = self.viewer_count() > 0
+            if self.sampler is not None:
+                self.sampler.set_interval(self.sample_interval if active else self.idle_sample_interval)
+            
+            self.interval = self.next_interval(active)
+            snapshot = stats_cache.snapshot
+            age = snapshot.age() if snapshot is not None else None
+            if age is None or age >= self.interval or snapshot.stale:
+                try:
+                    stats_cache.refresh()
                     logger.debug("Background stats update successful")
-                else:
-                    logger.warning(f"Background stats update failed: {result.stderr}")
+                    
+                except Exception as e:
+                    logger.error(f"Error in background stats update: {e}")
                 
-            except Exception as e:
-                logger.error(f"Error in background stats update: {e}")
+                self.interval = self.next_interval(active)
+                wait = self.interval
+            else:
+                # A request-triggered refresh ran meanwhile; wait out the rest
+                wait = self.interval - age
             
-            # Wait for next update
-            for _ in range(self.interval):
-                if not self.running:
-                    break
-                time.sleep(1)
+            # Wait for next update, or for the first viewer after an idle spell
+            self.stop_event.wait(wait)
+            if self.running:
+                self.stop_event.clear()
+
+def create_server(server_address, handler_class, mode=SERVER_MODE, workers=WORKERS,
+                  max_connections=MAX_CONNECTIONS):
+    """Create the HTTP server for the selected serving mode"""
+    if mode == 'single':
+        return DashboardHTTPServer(server_address, handler_class)
+    
+    # Keep-alive needs HTTP/1.1; idle connections wait on the server's poller, not on a worker
+    handler_class.protocol_version = 'HTTP/1.1'
+    handler_class.timeout = REQUEST_TIMEOUT
+    return PooledHTTPServer(server_address, handler_class, workers, max_connections)
+
+def install_shutdown_handler(httpd):
+    """Stop serve_forever() cleanly on SIGTERM (e.g. systemctl stop)"""
+    def handle_sigterm(signum, frame):
+        logger.info("Received SIGTERM, shutting down...")
+        # shutdown() blocks until serve_forever() returns, so call it off the main thread
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+def parse_thresholds(value):
+    """Parse a comma-separated list of alert percentages"""
+    try:
+        thresholds = sorted(set(float(item) for item in split_patterns(value)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid thresholds: {value}")
+    if not thresholds or thresholds[0] <= 0:
+        raise argparse.ArgumentTypeError("Thresholds must be positive percentages")
+    return thresholds
+
+def parse_size(value):
+    """argparse wrapper for quota.parse_size"""
+    try:
+        return quota.parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def split_patterns(value):
+    """Parse a comma-separated list of interface patterns"""
+    return [pattern.strip() for pattern in value.split(',') if pattern.strip()]
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='V2RayZone Dash web server')
+    parser.add_argument('--port', type=int, default=PORT,
+                        help='Port to listen on')
+    parser.add_argument('--collector', choices=['native', 'script'], default=COLLECTOR,
+                        help='Stats collector: in-process native collector or generate_json.sh')
+    parser.add_argument('--vnstat-backend', choices=['json', 'sqlite', 'sqlite-copy'], default=VNSTAT_BACKEND,
+                        help="Native collector's vnstat source: `vnstat --json`, the database read in place, "
+                             "or an in-memory copy of it")
+    parser.add_argument('--vnstat-db', default=vnstat_db.VNSTAT_DB,
+                        help='vnstat 2.x database for the sqlite backends')
+    parser.add_argument('--sample-interval', type=float, default=RATE_SAMPLE_INTERVAL,
+                        help='Seconds between live rate samples while someone is watching')
+    parser.add_argument('--idle-sample-interval', type=float, default=RATE_IDLE_INTERVAL,
+                        help='Seconds between live rate samples with no viewers')
+    parser.add_argument('--refresh-min-interval', type=float, default=REFRESH_MIN_INTERVAL,
+                        help='Minimum seconds between collector runs forced via /api/refresh')
+    parser.add_argument('--refresh-burst', type=int, default=REFRESH_CLIENT_BURST,
+                        help='Back-to-back /api/refresh calls allowed per client (refilled one per 10s)')
+    parser.add_argument('--active-interval', type=float, default=STATS_ACTIVE_INTERVAL,
+                        help='Seconds between stats refreshes while someone is watching')
+    parser.add_argument('--idle-interval', type=float, default=STATS_IDLE_INTERVAL,
+                        help='Seconds between stats refreshes with no viewers')
+    parser.add_argument('--rate-history', type=int, default=RATE_HISTORY_SIZE,
+                        help='Number of live rate samples kept for /api/rates')
+    parser.add_argument('--interfaces', type=split_patterns, default=None,
+                        help='Comma-separated interface patterns to monitor (default: all)')
+    parser.add_argument('--exclude-interfaces', type=split_patterns, default=collector.EXCLUDE_INTERFACES,
+                        help='Comma-separated interface patterns to skip (default: lo and container veth*/docker*/br-*)')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='Directory for the persistent traffic history')
+    parser.add_argument('--no-history', action='store_true',
+                        help='Do not record traffic history to disk')
+    parser.add_argument('--quota-monthly', type=parse_size, default=None,
+                        help='Transfer cap per billing cycle, e.g. 1T or 500G (binary units)')
+    parser.add_argument('--quota-daily', type=parse_size, default=None,
+                        help='Transfer cap per day, e.g. 50G')
+    parser.add_argument('--billing-day', type=int, default=1,
+                        help='Day of month the billing cycle starts (1-31); also bounds the percentile windows')
+    parser.add_argument('--burst-threshold', type=parse_size, default=None,
+                        help='Rate in bytes/s (e.g. 50M) above which samples count as a burst '
+                             '(default: the window\'s 95th percentile)')
+    parser.add_argument('--quota-thresholds', type=parse_thresholds, default=quota.THRESHOLDS,
+                        help='Comma-separated percentages of a cap that raise alerts (default: 80,90,100)')
+    parser.add_argument('--quota-interface', default=None,
+                        help='Interface counted against the quota (default: the primary interface)')
+    parser.add_argument('--quota-direction', choices=quota.DIRECTIONS, default='total',
+                        help='Traffic counted against the quota')
+    parser.add_argument('--alert-webhook', default=None,
+                        help='URL that receives quota alerts as a JSON POST')
+    parser.add_argument('--alert-command', default=None,
+                        help='Shell command run for each quota alert (alert JSON on stdin)')
+    parser.add_argument('--attribution', action='store_true',
+                        help='Attribute TCP traffic to ports, processes and cgroups for /api/top')
+    parser.add_argument('--attribution-interval', type=float, default=attribution.ATTRIBUTION_INTERVAL,
+                        help='Seconds between socket table reads for /api/top')
+    parser.add_argument('--fleet-nodes', type=split_patterns, default=None,
+                        help='Comma-separated remote dashboards to aggregate (host[:port], URL or name=URL)')
+    parser.add_argument('--fleet-file', default=None,
+                        help='File listing remote dashboards to aggregate, one per line')
+    parser.add_argument('--fleet-interval', type=float, default=fleet.FLEET_INTERVAL,
+                        help='Seconds between fleet polling rounds')
+    parser.add_argument('--mode', choices=['threaded', 'single'], default=SERVER_MODE,
+                        help='HTTP serving mode: bounded thread pool or single-threaded')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='Request handler threads in threaded mode')
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help='Open connections accepted before replying 503 in threaded mode')
+    return parser.parse_args()
 
 def main():
     """Main server function"""
+    global COLLECTOR, rate_sampler, stream_hub, history_store, quota_tracker, traffic_attributor, fleet_poller
+    global stats_updater, refresh_limiter, percentile_tracker
+    args = parse_args()
+    COLLECTOR = args.collector
+    refresh_limiter = RefreshLimiter(burst=args.refresh_burst, min_interval=args.refresh_min_interval)
+    
     try:
         # Change to installation directory
         if os.path.exists(INSTALL_DIR):
@@ -278,30 +1735,122 @@ def main():
         # Create stats directory if it doesn't exist
         os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
         
-        # Generate initial stats
-        logger.info("Generating initial stats...")
-        try:
-            subprocess.run(['bash', GENERATE_SCRIPT], check=True, timeout=30)
-        except Exception as e:
-            logger.warning(f"Failed to generate initial stats: {e}")
+        # Start live rate sampler
+        rate_sampler = collector.RateSampler(
+            interface=native_collector.interface,
+            interval=args.sample_interval,
+            history_size=args.rate_history,
+            include=args.interfaces,
+            exclude=args.exclude_interfaces,
+            sysfs_dir=native_collector.sysfs_dir,
+            proc_net_dev=native_collector.proc_net_dev
+        )
+        native_collector.include = args.interfaces
+        native_collector.exclude = args.exclude_interfaces
+        native_collector.rate_sampler = rate_sampler
+        
+        # Query vnstat's database directly instead of dumping it with `vnstat --json`
+        if args.vnstat_backend != 'json':
+            native_collector.vnstat_db = vnstat_db.VnstatDatabase(args.vnstat_db,
+                                                                  copy=args.vnstat_backend == 'sqlite-copy')
+        
+        # Keep public IP / vnstat version lookups off the request path
+        native_collector.system_info.start()
+        
+        # Record every live sample into the on-disk history
+        if not args.no_history:
+            history_store = timeseries.TimeSeriesStore(args.data_dir)
+            try:
+                load_rate_history(history_store, rate_sampler)
+            except Exception as e:
+                logger.warning(f"Could not load saved rate history: {e}")
+            rate_sampler.add_listener(history_store.add_sample)
+            rate_sampler.add_removal_listener(history_store.release)
+        
+        # 95th percentile, peaks and bursts per billing window; stored history is replayed in the background
+        percentile_tracker = percentiles.PercentileTracker(billing_day=args.billing_day,
+                                                           burst_threshold=args.burst_threshold)
+        if history_store is not None:
+            threading.Thread(target=percentile_tracker.load_history, daemon=True,
+                             args=(history_store, history_interfaces(history_store, rate_sampler), time.time())).start()
+        rate_sampler.add_listener(percentile_tracker.add_sample)
+        
+        # Count live samples against the transfer caps
+        if args.quota_monthly or args.quota_daily:
+            notifiers = [quota.LogNotifier()]
+            if args.alert_webhook:
+                notifiers.append(quota.WebhookNotifier(args.alert_webhook))
+            if args.alert_command:
+                notifiers.append(quota.CommandNotifier(args.alert_command))
+            os.makedirs(args.data_dir, exist_ok=True)
+            quota_tracker = quota.QuotaTracker(
+                monthly_limit=args.quota_monthly,
+                daily_limit=args.quota_daily,
+                billing_day=args.billing_day,
+                thresholds=args.quota_thresholds,
+                interface=args.quota_interface or rate_sampler.interface,
+                direction=args.quota_direction,
+                notifiers=notifiers,
+                state_file=os.path.join(args.data_dir, 'quota.json')
+            )
+            quota_tracker.start()
+            rate_sampler.add_listener(quota_tracker.add_sample)
+        rate_sampler.start()
+        
+        # Optional per-port/process breakdown for /api/top
+        if args.attribution:
+            traffic_attributor = attribution.TrafficAttributor(interval=args.attribution_interval)
+            traffic_attributor.start()
+        
+        # Aggregate remote dashboards for /fleet
+        if args.fleet_nodes or args.fleet_file:
+            nodes = fleet.load_nodes(args.fleet_nodes, args.fleet_file)
+            fleet_poller = fleet.FleetPoller(nodes, interval=args.fleet_interval, on_update=publish_fleet_view)
+            fleet_poller.start()
+        
+        # Serve the snapshot saved by the last run at once; the updater's first pass warms the collectors up
+        stats_cache.load_file()
+        
+        # Refresh stats and sample rates quickly only while someone is watching
+        stats_updater = StatsUpdater(
+            active_interval=args.active_interval,
+            idle_interval=args.idle_interval,
+            sampler=rate_sampler,
+            sample_interval=args.sample_interval,
+            idle_sample_interval=args.idle_sample_interval
+        )
+        stats_updater.start()
         
-        # Start background stats updater
-        updater = StatsUpdater(interval=60)  # Update every minute
-        updater.start()
+        # Start /api/stream producer
+        stream_hub = StreamHub()
+        stream_hub.start()
         
         # Start HTTP server
-        server_address = ('', PORT)
-        httpd = HTTPServer(server_address, DashboardHandler)
+        httpd = create_server(('', args.port), DashboardHandler, args.mode, args.workers, args.max_connections)
+        install_shutdown_handler(httpd)
         
-        logger.info(f"V2RayZone Dash server starting on port {PORT}")
-        logger.info(f"Dashboard available at: http://localhost:{PORT}")
+        logger.info(f"V2RayZone Dash server starting on port {args.port} ({args.mode} mode)")
+        logger.info(f"Dashboard available at: http://localhost:{args.port}")
         
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             logger.info("Server interrupted by user")
         finally:
-            updater.stop()
+            stats_updater.stop()
+            stream_hub.stop()
+            rate_sampler.stop()
+            native_collector.system_info.stop()
+            if native_collector.vnstat_db is not None:
+                native_collector.vnstat_db.close()
+            if fleet_poller is not None:
+                fleet_poller.stop()
+            if traffic_attributor is not None:
+                traffic_attributor.stop()
+            if quota_tracker is not None:
+                quota_tracker.stop()
+            if history_store is not None:
+                history_store.close()
             httpd.server_close()
             logger.info("Server stopped")
     
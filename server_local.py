@@ -8,18 +8,28 @@ import os
 import sys
 import json
 import time
+import argparse
 import threading
 import subprocess
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import SimpleHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 import logging
 
+from server import create_server, install_shutdown_handler, SERVER_MODE, WORKERS, MAX_CONNECTIONS
+import simulator
+
 # Configuration for local testing
 PORT = 2053
 INSTALL_DIR = os.path.dirname(os.path.abspath(__file__))
 STATS_FILE = os.path.join(INSTALL_DIR, 'api', 'stats.json')
 GENERATE_SCRIPT = os.path.join(INSTALL_DIR, 'api', 'generate_json.sh')
+SIMULATION_SPEED = 1.0  # simulated seconds per wall-clock second
+
+# Simulated traffic behind the mock stats (set in main)
+traffic = None
+clock = None
+traffic_lock = threading.Lock()
 
 # Setup logging
 logging.basicConfig(
@@ -28,9 +38,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def generate_mock_stats():
+    """Generate mock statistics for local testing"""
+    try:
+        # Create api directory if it doesn't exist
+        api_dir = os.path.join(INSTALL_DIR, 'api')
+        os.makedirs(api_dir, exist_ok=True)
+
+        # Advance the simulation to now; totals and rates come from one seeded stream
+        with traffic_lock:
+            traffic.advance(clock.now())
+            mock_data = traffic.stats(server_ip='127.0.0.1', uptime='Local Test Mode')
+
+        # Write mock data to stats file; readers never see a partial file
+        temp_file = f"{STATS_FILE}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_file, 'w') as f:
+            json.dump(mock_data, f)
+        os.replace(temp_file, STATS_FILE)
+
+        logger.info("Generated mock statistics for local testing")
+
+    except Exception as e:
+        logger.error(f"Error generating mock stats: {e}")
+
 class DashboardHandler(SimpleHTTPRequestHandler):
     """Custom HTTP handler for the dashboard"""
     
+    # Headers and body are separate writes; with Nagle on, keep-alive clients
+    # stall ~40ms per response waiting for a delayed ACK
+    disable_nagle_algorithm = True
+    
     def __init__(self, *args, **kwargs):
         # Change to the installation directory
         os.chdir(INSTALL_DIR)
@@ -82,20 +119,20 @@ class DashboardHandler(SimpleHTTPRequestHandler):
         try:
             # For local testing, generate mock data if stats file doesn't exist
             if not os.path.exists(STATS_FILE):
-                self.generate_mock_stats()
+                generate_mock_stats()
             
             # Check if stats file is older than 10 seconds
             if os.path.exists(STATS_FILE):
                 file_age = time.time() - os.path.getmtime(STATS_FILE)
                 if file_age > 10:
-                    self.generate_mock_stats()
+                    generate_mock_stats()
             
-            # Read and return stats
+            # Served as written; the mock generator already produced valid JSON
             if os.path.exists(STATS_FILE):
-                with open(STATS_FILE, 'r') as f:
-                    stats_data = json.load(f)
+                with open(STATS_FILE, 'rb') as f:
+                    body = f.read()
                 
-                self.send_json_response(stats_data)
+                self.send_json_body(body)
             else:
                 self.send_error(500, "Stats file not available")
                 
@@ -116,77 +153,25 @@ class DashboardHandler(SimpleHTTPRequestHandler):
     def handle_refresh_api(self):
         """Handle /api/refresh endpoint"""
         try:
-            self.generate_mock_stats()
+            generate_mock_stats()
             self.send_json_response({"status": "refreshed", "timestamp": datetime.now().isoformat()})
         except Exception as e:
             logger.error(f"Error refreshing stats: {e}")
             self.send_error(500, "Failed to refresh stats")
     
-    def generate_mock_stats(self):
-        """Generate mock statistics for local testing"""
-        try:
-            # Create api directory if it doesn't exist
-            api_dir = os.path.join(INSTALL_DIR, 'api')
-            os.makedirs(api_dir, exist_ok=True)
-            
-            # Generate mock data
-            import random
-            current_time = datetime.now()
-            
-            mock_data = {
-                "current": {
-                    "rx_rate": random.randint(1000000, 10000000),  # 1-10 MB/s
-                    "tx_rate": random.randint(500000, 5000000),    # 0.5-5 MB/s
-                    "interface": "eth0"
-                },
-                "today": {
-                    "rx": random.randint(1000000000, 10000000000),  # 1-10 GB
-                    "tx": random.randint(500000000, 5000000000),    # 0.5-5 GB
-                    "date": current_time.strftime("%Y-%m-%d")
-                },
-                "monthly": {
-                    "rx": random.randint(50000000000, 500000000000),  # 50-500 GB
-                    "tx": random.randint(25000000000, 250000000000),  # 25-250 GB
-                    "month": current_time.strftime("%Y-%m")
-                },
-                "daily_history": [
-                    {
-                        "date": (current_time.replace(day=current_time.day-i)).strftime("%Y-%m-%d"),
-                        "rx": random.randint(1000000000, 10000000000),
-                        "tx": random.randint(500000000, 5000000000)
-                    } for i in range(7, 0, -1)
-                ],
-                "system": {
-                    "server_ip": "127.0.0.1",
-                    "uptime": "Local Test Mode",
-                    "vnstat_version": "Mock Data v1.0"
-                },
-                "meta": {
-                    "generated_at": current_time.isoformat(),
-                    "interface": "eth0",
-                    "status": "mock_data"
-                }
-            }
-            
-            # Write mock data to stats file
-            with open(STATS_FILE, 'w') as f:
-                json.dump(mock_data, f, indent=2)
-            
-            logger.info("Generated mock statistics for local testing")
-            
-        except Exception as e:
-            logger.error(f"Error generating mock stats: {e}")
-    
     def send_json_response(self, data):
         """Send JSON response"""
+        self.send_json_body(json.dumps(data).encode('utf-8'))
+    
+    def send_json_body(self, body):
+        """Send an already encoded JSON body"""
         try:
-            json_data = json.dumps(data, indent=2)
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-Length', len(json_data.encode('utf-8')))
+            self.send_header('Content-Length', len(body))
             self.end_headers()
-            self.wfile.write(json_data.encode('utf-8'))
+            self.wfile.write(body)
         except Exception as e:
             logger.error(f"Error sending JSON response: {e}")
             self.send_error(500, "Failed to send response")
@@ -202,8 +187,7 @@ class DashboardHandler(SimpleHTTPRequestHandler):
 class StatsUpdater:
     """Background thread to update stats periodically"""
     
-    def __init__(self, handler_class):
-        self.handler_class = handler_class
+    def __init__(self):
         self.running = False
         self.thread = None
     
@@ -225,9 +209,7 @@ class StatsUpdater:
         """Background update loop"""
         while self.running:
             try:
-                # Create a temporary handler instance to generate mock stats
-                temp_handler = self.handler_class(None, None, None)
-                temp_handler.generate_mock_stats()
+                generate_mock_stats()
                 logger.debug("Updated stats in background")
             except Exception as e:
                 logger.error(f"Error in background stats update: {e}")
@@ -238,8 +220,34 @@ class StatsUpdater:
                     break
                 time.sleep(1)
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='V2RayZone Dash local test server')
+    parser.add_argument('--port', type=int, default=PORT,
+                        help='Port to listen on')
+    parser.add_argument('--mode', choices=['threaded', 'single'], default=SERVER_MODE,
+                        help='HTTP serving mode: bounded thread pool or single-threaded')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='Request handler threads in threaded mode')
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help='Open connections accepted before replying 503 in threaded mode')
+    parser.add_argument('--seed', type=int, default=simulator.DEFAULT_SEED,
+                        help='Seed for the simulated traffic; the same seed gives the same traffic')
+    parser.add_argument('--interfaces', type=lambda v: [p for p in v.split(',') if p],
+                        default=simulator.DEFAULT_INTERFACES,
+                        help='Comma-separated simulated interfaces; the first one is primary')
+    parser.add_argument('--speed', type=float, default=SIMULATION_SPEED,
+                        help='Simulated seconds per real second (e.g. 3600 for an hour per second)')
+    parser.add_argument('--trace', help='Replay a trace recorded with simulator.py record')
+    parser.add_argument('--counter-bits', type=int, choices=[32, 64], default=64,
+                        help='Width of the simulated interface counters (32 wraps every few minutes)')
+    return parser.parse_args()
+
 def main():
     """Main server function"""
+    global traffic, clock
+    args = parse_args()
+    
     try:
         # Check if installation directory exists
         if not os.path.exists(INSTALL_DIR):
@@ -254,17 +262,26 @@ def main():
         api_dir = os.path.join(INSTALL_DIR, 'api')
         os.makedirs(api_dir, exist_ok=True)
         
+        # Simulated traffic, backfilled so month totals and daily history are populated
+        clock = simulator.SimulatedClock(args.speed)
+        traffic = simulator.TrafficSimulator(simulator.create_source(args.interfaces, args.seed, args.trace),
+                                             args.counter_bits, args.seed)
+        traffic.backfill(clock.now())
+        logger.info(f"Simulating {', '.join(traffic.interfaces)} (seed {args.seed}, speed {args.speed}x"
+                    f"{', trace ' + args.trace if args.trace else ''})")
+        
         # Start background stats updater
-        updater = StatsUpdater(DashboardHandler)
+        updater = StatsUpdater()
         updater.start()
         
         # Create and start server
-        server = HTTPServer(('localhost', PORT), DashboardHandler)
+        server = create_server(('localhost', args.port), DashboardHandler, args.mode, args.workers, args.max_connections)
+        install_shutdown_handler(server)
         
-        logger.info(f"Server started successfully!")
-        logger.info(f"Dashboard URL: http://localhost:{PORT}")
-        logger.info(f"API Health: http://localhost:{PORT}/api/health")
-        logger.info(f"API Stats: http://localhost:{PORT}/api/stats")
+        logger.info(f"Server started successfully! ({args.mode} mode)")
+        logger.info(f"Dashboard URL: http://localhost:{args.port}")
+        logger.info(f"API Health: http://localhost:{args.port}/api/health")
+        logger.info(f"API Stats: http://localhost:{args.port}/api/stats")
         logger.info("Press Ctrl+C to stop the server")
         
         try:
@@ -273,7 +290,7 @@ def main():
             logger.info("Received shutdown signal")
         finally:
             updater.stop()
-            server.shutdown()
+            server.server_close()
             logger.info("Server stopped")
         
         return 0
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Traffic Simulator
+Seeded, deterministic interface traffic (diurnal load, bursts, counter wraps) and trace replay
+
+Usage:
+    python3 simulator.py fill-history --data-dir /tmp/history --days 365 [--seed 1] [--interfaces eth0,eth1]
+    python3 simulator.py record --output trace.csv [--interval 1] [--duration 3600]
+    python3 simulator.py fill-history --data-dir /tmp/history --trace trace.csv --days 7
+    python3 simulator.py serve [--seed 1] [--interfaces eth0,wg0] [--trace trace.csv] [server.py options]
+
+server_local.py uses TrafficSimulator for its mock stats (--seed, --speed, --trace).
+`serve` runs the real server.py against a simulated /proc/net/dev, so its rate
+sampler, history store, percentiles and quota see the simulated traffic.
+"""
+
+import os
+import sys
+import csv
+import math
+import time
+import bisect
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import logging
+
+import collector
+
+# Configuration
+DEFAULT_SEED = 1
+DEFAULT_INTERFACES = ['eth0']
+BURST_WINDOW = 600  # seconds; each window may hold one burst
+BURST_PROBABILITY = 0.15
+NOISE = 0.3  # +/- fraction of per-second jitter around the diurnal curve
+RX_PACKET_SIZE = 1200  # average bytes per packet, for packet counters
+TX_PACKET_SIZE = 800
+HISTORY_DAYS = 30  # days of daily totals kept for daily_history
+MAX_STEPS_PER_ADVANCE = 100000  # integration steps per advance(); longer gaps use coarser steps
+BACKFILL_STEP = 300  # seconds per step when backfilling the month and daily history
+COUNTER_TICK = 0.25  # seconds between simulated /proc/net/dev rewrites in `serve`
+
+logger = logging.getLogger(__name__)
+
+MASK_64 = 2 ** 64 - 1
+
+def unit_hash(*values):
+    """Deterministic value in [0, 1) from integers (splitmix64 over the inputs)"""
+    x = 0
+    for value in values:
+        x = (x ^ (value & MASK_64)) * 0x9E3779B97F4A7C15 & MASK_64
+        x ^= x >> 30
+        x = x * 0xBF58476D1CE4E5B9 & MASK_64
+        x ^= x >> 27
+        x = x * 0x94D049BB133111EB & MASK_64
+        x ^= x >> 31
+    return x / 2 ** 64
+
+class DiurnalModel:
+    """Seeded rate model: a daily curve per interface with jitter and bursts.
+
+    rates(index, t) is a pure function of the seed, interface and second,
+    so any time range can be generated in any order with identical results.
+    """
+
+    def __init__(self, interfaces=DEFAULT_INTERFACES, seed=DEFAULT_SEED):
+        self.interfaces = list(interfaces)
+        self.seed = seed
+        generator = random.Random(seed)
+        self.profiles = []
+        for _ in self.interfaces:
+            self.profiles.append({
+                'peak': generator.uniform(2e6, 5e7),  # bytes/s at the busiest hour
+                'tx_ratio': generator.uniform(0.2, 1.1),
+                'peak_hour': generator.uniform(18, 23),
+                'floor': generator.uniform(0.05, 0.25)  # fraction of peak at the quietest hour
+            })
+        self.utc_offset = time.localtime().tm_gmtoff
+
+    def rates(self, index, t):
+        """(rx, tx) bytes per second for interface `index` during second t"""
+        profile = self.profiles[index]
+        second = int(t)
+
+        # Daily curve: peaks at peak_hour local time, bottoms out 12 hours later
+        hour = ((second + self.utc_offset) % 86400) / 3600
+        daily = 0.5 + 0.5 * math.cos(2 * math.pi * (hour - profile['peak_hour']) / 24)
+        level = profile['peak'] * (profile['floor'] + (1 - profile['floor']) * daily)
+
+        level *= 1 + NOISE * (unit_hash(self.seed, index, second, 1) - 0.5) * 2
+        level *= self.burst_factor(index, second)
+
+        tx_jitter = 1 + 0.2 * (unit_hash(self.seed, index, second, 2) - 0.5)
+        return level, level * profile['tx_ratio'] * tx_jitter
+
+    def burst_factor(self, index, second):
+        """Multiplier of a burst covering this second, or 1"""
+        window = second // BURST_WINDOW
+        if unit_hash(self.seed, index, window, 3) >= BURST_PROBABILITY:
+            return 1.0
+        start = window * BURST_WINDOW + int(unit_hash(self.seed, index, window, 4) * BURST_WINDOW * 0.8)
+        duration = 10 + int(unit_hash(self.seed, index, window, 5) * 110)
+        if start <= second < start + duration:
+            return 3 + 7 * unit_hash(self.seed, index, window, 6)
+        return 1.0
+
+class TraceReplay:
+    """Rates from a recorded counter trace (CSV: timestamp,interface,rx_bytes,tx_bytes).
+
+    Trace time is mapped onto the requested time modulo the trace length,
+    so a short recording repeats for as long as it is replayed.
+    """
+
+    def __init__(self, path):
+        series = {}
+        with open(path, 'r', newline='') as f:
+            for row in csv.reader(f):
+                if not row or row[0] == 'timestamp':
+                    continue
+                series.setdefault(row[1], []).append((float(row[0]), int(row[2]), int(row[3])))
+
+        self.interfaces = sorted(series)
+        self.segments = []  # per interface: (segment start times, [(rx rate, tx rate)])
+        starts = []
+        ends = []
+        for name in self.interfaces:
+            samples = sorted(series[name])
+            if len(samples) < 2:
+                raise ValueError(f"Trace {path} needs at least two samples for {name}")
+            if samples[-1][0] <= samples[0][0]:
+                raise ValueError(f"Trace {path} covers no time for {name}: all samples share one timestamp")
+            times = [sample[0] for sample in samples[:-1]]
+            rates = []
+            for (t0, rx0, tx0), (t1, rx1, tx1) in zip(samples, samples[1:]):
+                elapsed = max(t1 - t0, 1e-6)
+                rates.append((collector.counter_delta(rx0, rx1) / elapsed, collector.counter_delta(tx0, tx1) / elapsed))
+            self.segments.append((times, rates))
+            starts.append(samples[0][0])
+            ends.append(samples[-1][0])
+
+        if not starts:
+            raise ValueError(f"Trace {path} has no samples")
+        self.start = min(starts)
+        self.duration = max(ends) - self.start
+
+    def rates(self, index, t):
+        """(rx, tx) bytes per second for interface `index` at trace-relative time t"""
+        times, rates = self.segments[index]
+        position = self.start + (t % self.duration)
+        slot = max(0, bisect.bisect_right(times, position) - 1)
+        return rates[slot]
+
+class TrafficSimulator:
+    """Integrates a rate source into per-interface counters and day/month totals.
+
+    Counters, today's and this month's totals all come from the same
+    integrated stream, so they always agree with each other and with the
+    reported rates. Counters wrap at 2**counter_bits.
+    """
+
+    def __init__(self, source, counter_bits=64, seed=DEFAULT_SEED):
+        self.source = source
+        self.interfaces = source.interfaces
+        self.counter_limit = 2 ** counter_bits
+        generator = random.Random(seed)
+        # rx bytes, tx bytes, rx packets, tx packets: random starting counters plus totals since start
+        self.offsets = [[generator.randrange(self.counter_limit) for _ in range(4)] for _ in self.interfaces]
+        self.totals = [[0.0] * 4 for _ in self.interfaces]
+        self.days = [{} for _ in self.interfaces]  # date: [rx, tx]
+        self.months = [{} for _ in self.interfaces]  # YYYY-MM: [rx, tx]
+        self.time = None
+        self.day_end = None
+        self.day_key = None
+        self.month_key = None
+
+    def _set_period(self, t):
+        """Cache the local date keys of t and the end of its day"""
+        moment = datetime.fromtimestamp(t)
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.day_key = midnight.strftime('%Y-%m-%d')
+        self.month_key = midnight.strftime('%Y-%m')
+        self.day_end = (midnight + timedelta(days=1)).timestamp()
+
+    def backfill(self, now, days=HISTORY_DAYS):
+        """Start at whichever is earlier, this month's start or `days` ago, and integrate up to now"""
+        self.advance(min(start_of_month(now), now - days * 86400))
+        self.advance(now, step=BACKFILL_STEP)
+
+    def advance(self, t, step=1.0):
+        """Integrate rates from the current time up to t (the first call only sets the start)"""
+        if self.time is None:
+            self.time = t
+            self._set_period(t)
+            return
+        if t <= self.time:
+            return
+
+        step = max(step, (t - self.time) / MAX_STEPS_PER_ADVANCE)
+        now = self.time
+        while now < t:
+            if now >= self.day_end:
+                self._set_period(now)
+                self._trim_days()
+            seconds = min(step, t - now, self.day_end - now)
+            for index in range(len(self.interfaces)):
+                rx_rate, tx_rate = self.source.rates(index, now)
+                rx, tx = rx_rate * seconds, tx_rate * seconds
+                totals = self.totals[index]
+                totals[0] += rx
+                totals[1] += tx
+                totals[2] += rx / RX_PACKET_SIZE
+                totals[3] += tx / TX_PACKET_SIZE
+                day = self.days[index].setdefault(self.day_key, [0.0, 0.0])
+                day[0] += rx
+                day[1] += tx
+                month = self.months[index].setdefault(self.month_key, [0.0, 0.0])
+                month[0] += rx
+                month[1] += tx
+            now += seconds
+        self.time = t
+
+    def _trim_days(self):
+        """Keep a bounded number of daily totals"""
+        for days in self.days:
+            for key in sorted(days)[:-(HISTORY_DAYS + 1)]:
+                del days[key]
+
+    def read_counters(self):
+        """{name: (rx_bytes, tx_bytes, rx_packets, tx_packets)} like collector.read_all_counters()"""
+        return {
+            name: tuple((offset + int(total)) % self.counter_limit
+                        for offset, total in zip(self.offsets[index], self.totals[index]))
+            for index, name in enumerate(self.interfaces)
+        }
+
+    def write_proc_net_dev(self, path):
+        """Write the counters in /proc/net/dev format, replacing the file atomically"""
+        lines = [
+            'Inter-|   Receive                                                |  Transmit\n',
+            ' face |bytes    packets errs drop fifo frame compressed multicast|'
+            'bytes    packets errs drop fifo colls carrier compressed\n'
+        ]
+        for name, (rx_bytes, tx_bytes, rx_packets, tx_packets) in self.read_counters().items():
+            lines.append(f'{name:>6}: {rx_bytes} {rx_packets} 0 0 0 0 0 0 {tx_bytes} {tx_packets} 0 0 0 0 0 0\n')
+
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w') as f:
+            f.writelines(lines)
+        os.replace(temp_file, path)
+
+    def usage_block(self, index):
+        """current/today/month/daily_history for one interface at the simulated time"""
+        rx_rate, tx_rate = self.source.rates(index, self.time)
+        today = self.days[index].get(self.day_key, [0, 0])
+        month = self.months[index].get(self.month_key, [0, 0])
+        return {
+            'current': {'rx_rate': int(rx_rate), 'tx_rate': int(tx_rate)},
+            'today': {'rx': int(today[0]), 'tx': int(today[1]), 'total': int(today[0]) + int(today[1])},
+            'month': {'rx': int(month[0]), 'tx': int(month[1]), 'total': int(month[0]) + int(month[1])},
+            'daily_history': [
+                {'date': key, 'rx': int(rx), 'tx': int(tx)}
+                for key, (rx, tx) in sorted(self.days[index].items())[-HISTORY_DAYS:]
+            ]
+        }
+
+    def stats(self, server_ip='127.0.0.1', uptime='Simulated'):
+        """Stats document with the stats.json schema of the native collector"""
+        interfaces = {name: self.usage_block(index) for index, name in enumerate(self.interfaces)}
+        primary = self.interfaces[0]
+        block = interfaces[primary]
+        return {
+            'current': block['current'],
+            'today': block['today'],
+            'month': block['month'],
+            'daily_history': block['daily_history'],
+            'interface': primary,
+            'interfaces': interfaces,
+            'aggregate': collector.aggregate_usage(interfaces.values()),
+            'server_ip': server_ip,
+            'uptime': uptime,
+            'vnstat_version': 'Simulated',
+            'timestamp': self.time
+        }
+
+class SimulatedCollector(collector.NativeCollector):
+    """Native collector fed by a TrafficSimulator: counters through a simulated
+    /proc/net/dev file, vnstat totals straight from the simulator"""
+
+    def __init__(self, traffic, proc_net_dev, clock=None):
+        super().__init__(interface=traffic.interfaces[0], proc_net_dev=proc_net_dev)
+        self.traffic = traffic
+        self.clock = clock or SimulatedClock()
+        self.traffic_lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def read_vnstat_usage(self):
+        """today/month/daily_history per interface from the simulated totals"""
+        with self.traffic_lock:
+            usage = {name: self.traffic.usage_block(index) for index, name in enumerate(self.traffic.interfaces)}
+        for block in usage.values():
+            del block['current']  # live rates come from the counters like on a real host
+        return usage
+
+    def update(self):
+        """Advance the simulation to now and rewrite the counters file"""
+        with self.traffic_lock:
+            self.traffic.advance(self.clock.now())
+            self.traffic.write_proc_net_dev(self.proc_net_dev)
+
+    def start(self):
+        """Keep the counters file moving in the background"""
+        self.update()
+        self.running = True
+        self.thread = threading.Thread(target=self._counter_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop updating the counters file"""
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def _counter_loop(self):
+        """Counter update loop"""
+        while self.running:
+            try:
+                self.update()
+            except Exception as e:
+                logger.error(f"Error updating simulated counters: {e}")
+            time.sleep(COUNTER_TICK)
+
+class SimulatedClock:
+    """Maps wall-clock time onto simulated time running `speed` times faster"""
+
+    def __init__(self, speed=1.0, origin=None):
+        self.speed = speed
+        self.wall_origin = time.time()
+        self.origin = origin if origin is not None else self.wall_origin
+
+    def now(self):
+        """Current simulated time"""
+        return self.origin + (time.time() - self.wall_origin) * self.speed
+
+def start_of_month(t):
+    """Local midnight on the first day of t's month"""
+    return datetime.fromtimestamp(t).replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+def create_source(interfaces=None, seed=DEFAULT_SEED, trace=None):
+    """Trace replay when a trace file is given, else the seeded diurnal model"""
+    if trace:
+        return TraceReplay(trace)
+    return DiurnalModel(interfaces or DEFAULT_INTERFACES, seed)
+
+def fill_history(args):
+    """Write per-second samples for a time range straight into a history store"""
+    import timeseries
+
+    source = create_source(args.interfaces, args.seed, args.trace)
+    end = args.end if args.end is not None else time.time()
+    start = int(end - args.days * 86400)
+    store = timeseries.TimeSeriesStore(args.data_dir)
+
+    logger.info(f"Filling {args.days} days of {args.step}s samples for {', '.join(source.interfaces)} "
+                f"into {args.data_dir}")
+    began = time.perf_counter()
+    samples = 0
+    t = start
+    try:
+        while t < end:
+            for index, name in enumerate(source.interfaces):
+                rx_rate, tx_rate = source.rates(index, t)
+                store.add_sample(name, t, rx_rate, tx_rate, args.step)
+            samples += len(source.interfaces)
+            t += args.step
+            if samples % 1000000 < len(source.interfaces):
+                elapsed = time.perf_counter() - began
+                logger.info(f"{samples} samples, {samples / elapsed:.0f}/s, at {datetime.fromtimestamp(t)}")
+    finally:
+        store.close()
+
+    elapsed = time.perf_counter() - began
+    logger.info(f"Wrote {samples} samples in {elapsed:.1f}s ({samples / max(elapsed, 1e-9):.0f} samples/s)")
+    return 0
+
+def record_trace(args):
+    """Record real interface counters into a replayable CSV trace"""
+    deadline = time.time() + args.duration if args.duration else None
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'interface', 'rx_bytes', 'tx_bytes'])
+        try:
+            while deadline is None or time.time() < deadline:
+                now = time.time()
+                counters = collector.read_proc_net_dev()
+                for name in collector.select_interfaces(counters, args.interfaces):
+                    writer.writerow([f"{now:.3f}", name, counters[name]['rx_bytes'], counters[name]['tx_bytes']])
+                f.flush()
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+    logger.info(f"Trace written to {args.output}")
+    return 0
+
+def serve(args, server_args):
+    """Run server.py in this process against simulated interface counters"""
+    import server
+
+    root = tempfile.mkdtemp(prefix='v2rayzone-sim-')
+    traffic = TrafficSimulator(create_source(args.interfaces, args.seed, args.trace), args.counter_bits, args.seed)
+    traffic.backfill(time.time())
+    simulated = SimulatedCollector(traffic, os.path.join(root, 'net_dev'))
+    simulated.start()
+    logger.info(f"Simulating {', '.join(traffic.interfaces)} (seed {args.seed}) in {root}")
+
+    # Point the server at the repository's dashboard files and the simulated collector
+    server.INSTALL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard')
+    server.STATS_FILE = os.path.join(root, 'api', 'stats.json')
+    server.static_assets = server.StaticAssetCache(server.INSTALL_DIR)
+    server.native_collector = simulated
+    sys.argv = ['server.py', '--data-dir', os.path.join(root, 'data'), '--vnstat-backend', 'json'] + server_args
+    try:
+        return server.main()
+    finally:
+        simulated.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='V2RayZone Dash traffic simulator')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fill = commands.add_parser('fill-history', help='Write simulated per-second history into a data dir')
+    fill.add_argument('--data-dir', required=True, help='History directory (as server.py --data-dir)')
+    fill.add_argument('--days', type=float, default=1, help='Days of history ending now')
+    fill.add_argument('--end', type=float, help='Unix time the history ends at (default: now)')
+    fill.add_argument('--step', type=int, default=1, help='Seconds per sample')
+    fill.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Seed for the traffic model')
+    fill.add_argument('--interfaces', type=lambda v: [p for p in v.split(',') if p], default=DEFAULT_INTERFACES,
+                      help='Comma-separated simulated interfaces')
+    fill.add_argument('--trace', help='Replay a recorded trace instead of the model')
+
+    record = commands.add_parser('record', help='Record real interface counters as a trace')
+    record.add_argument('--output', required=True, help='CSV file to write')
+    record.add_argument('--interval', type=float, default=1.0, help='Seconds between readings')
+    record.add_argument('--duration', type=float, default=0, help='Seconds to record (0: until Ctrl+C)')
+    record.add_argument('--interfaces', type=lambda v: [p for p in v.split(',') if p],
+                        help='Comma-separated interface patterns (default: all but loopback and virtual)')
+
+    run = commands.add_parser('serve', help='Run server.py on simulated counters; other options go to server.py')
+    run.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Seed for the traffic model')
+    run.add_argument('--interfaces', type=lambda v: [p for p in v.split(',') if p], default=DEFAULT_INTERFACES,
+                     help='Comma-separated simulated interfaces; the first one is primary')
+    run.add_argument('--trace', help='Replay a recorded trace instead of the model')
+    run.add_argument('--counter-bits', type=int, choices=[32, 64], default=64,
+                     help='Width of the simulated interface counters')
+
+    args, extra = parser.parse_known_args()
+    if extra and args.command != 'serve':
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args, extra
+
+def main():
+    """Main function"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args, extra = parse_args()
+    if args.command == 'fill-history':
+        return fill_history(args)
+    if args.command == 'serve':
+        return serve(args, extra)
+    return record_trace(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
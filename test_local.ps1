@@ -164,9 +164,22 @@ try {
     
     $files = @{
         "server_local.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/server_local.py"
+        "server.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/server.py"
+        "collector.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/collector.py"
+        "percentiles.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/percentiles.py"
+        "simulator.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/simulator.py"
+        "vnstat_db.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/vnstat_db.py"
+        "encoding.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/encoding.py"
+        "fleet.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/fleet.py"
+        "attribution.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/attribution.py"
+        "quota.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/quota.py"
+        "metrics.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/metrics.py"
+        "timeseries.py" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/timeseries.py"
         "dashboard/index.html" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/index.html"
         "dashboard/style.css" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/style.css"
         "dashboard/script.js" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/script.js"
+        "dashboard/fleet.html" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/fleet.html"
+        "dashboard/fleet.js" = "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/fleet.js"
     }
     
     foreach ($file in $files.GetEnumerator()) {
@@ -169,9 +169,22 @@ test_local_server() {
     
     # Download main files
     curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/server_local.py" -o server_local.py 2>/dev/null || warn "Could not download server_local.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/server.py" -o server.py 2>/dev/null || warn "Could not download server.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/collector.py" -o collector.py 2>/dev/null || warn "Could not download collector.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/percentiles.py" -o percentiles.py 2>/dev/null || warn "Could not download percentiles.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/simulator.py" -o simulator.py 2>/dev/null || warn "Could not download simulator.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/vnstat_db.py" -o vnstat_db.py 2>/dev/null || warn "Could not download vnstat_db.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/encoding.py" -o encoding.py 2>/dev/null || warn "Could not download encoding.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/fleet.py" -o fleet.py 2>/dev/null || warn "Could not download fleet.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/attribution.py" -o attribution.py 2>/dev/null || warn "Could not download attribution.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/quota.py" -o quota.py 2>/dev/null || warn "Could not download quota.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/metrics.py" -o metrics.py 2>/dev/null || warn "Could not download metrics.py"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/timeseries.py" -o timeseries.py 2>/dev/null || warn "Could not download timeseries.py"
     curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/index.html" -o dashboard/index.html 2>/dev/null || warn "Could not download index.html"
     curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/style.css" -o dashboard/style.css 2>/dev/null || warn "Could not download style.css"
     curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/script.js" -o dashboard/script.js 2>/dev/null || warn "Could not download script.js"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/fleet.html" -o dashboard/fleet.html 2>/dev/null || warn "Could not download fleet.html"
+    curl -s "https://raw.githubusercontent.com/V2rayZone/vps-bandwidth-dashboard/main/dashboard/fleet.js" -o dashboard/fleet.js 2>/dev/null || warn "Could not download fleet.js"
     
     if [[ -f "server_local.py" ]]; then
         log "You can now test the server locally by running:"
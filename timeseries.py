@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - Time-Series Store
+Fixed-record, memory-mapped ring files holding rx/tx history per interface
+"""
+
+import os
+import math
+import mmap
+import struct
+import threading
+import logging
+
+# Configuration
+# resolution name: (bucket size in seconds, number of buckets kept)
+RESOLUTIONS = {
+    'second': (1, 86400),      # 1 day of per-second samples
+    'minute': (60, 43200),     # 30 days of minutes
+    'hour': (3600, 17520),     # 2 years of hours
+    'day': (86400, 3650)       # 10 years of days
+}
+
+MAGIC = b'V2TS'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')  # magic, version, step, capacity
+HEADER_SIZE = 64
+# bucket start, seconds covered, rx bytes, tx bytes, rx min/max rate, tx min/max rate
+RECORD = struct.Struct('<qddddddd')
+READ_CHUNK = 1024  # records copied per lock acquisition when reading
+MAX_POINTS = 1000  # upper bound on points returned by a downsampled query
+
+logger = logging.getLogger(__name__)
+
+class SeriesFile:
+    """One resolution of one interface, stored as a fixed-size ring of records.
+
+    A bucket always lives at slot (bucket // step) % capacity, so appends and
+    lookups are O(1) and old buckets are overwritten once retention is reached.
+    """
+
+    def __init__(self, path, step, capacity):
+        self.path = path
+        self.step = step
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.closed = False
+
+        size = HEADER_SIZE + capacity * RECORD.size
+        exists = os.path.exists(path)
+        self.file = open(path, 'r+b' if exists else 'w+b')
+
+        if not exists or not self._header_matches():
+            if exists:
+                logger.warning(f"Resetting {path}: layout changed")
+            self.file.truncate(0)
+            self.file.truncate(size)  # Sparse; unused slots read as zeros
+            self.file.seek(0)
+            self.file.write(HEADER.pack(MAGIC, VERSION, step, capacity))
+            self.file.flush()
+
+        self.mm = mmap.mmap(self.file.fileno(), size)
+
+    def _header_matches(self):
+        """Check the file was written with the same layout"""
+        self.file.seek(0)
+        data = self.file.read(HEADER.size)
+        if len(data) < HEADER.size:
+            return False
+        return HEADER.unpack(data) == (MAGIC, VERSION, self.step, self.capacity)
+
+    def _offset(self, bucket):
+        """Byte offset of the slot holding a bucket"""
+        return HEADER_SIZE + (bucket // self.step % self.capacity) * RECORD.size
+
+    def add(self, timestamp, seconds, rx_bytes, tx_bytes, rx_rate, tx_rate):
+        """Merge one sample into its bucket"""
+        bucket = int(timestamp // self.step) * self.step
+        offset = self._offset(bucket)
+
+        with self.lock:
+            if self.closed:
+                return
+            record = RECORD.unpack_from(self.mm, offset)
+            if record[0] == bucket:
+                record = (
+                    bucket,
+                    record[1] + seconds,
+                    record[2] + rx_bytes,
+                    record[3] + tx_bytes,
+                    min(record[4], rx_rate),
+                    max(record[5], rx_rate),
+                    min(record[6], tx_rate),
+                    max(record[7], tx_rate)
+                )
+            else:
+                # Empty slot or a bucket that has aged out of retention
+                record = (bucket, seconds, rx_bytes, tx_bytes, rx_rate, rx_rate, tx_rate, tx_rate)
+            RECORD.pack_into(self.mm, offset, *record)
+
+    def read(self, start, end):
+        """Yield records for buckets in [start, end], oldest first, without loading the range at once"""
+        last = int(end // self.step) * self.step
+        first = int(start // self.step) * self.step
+        first = max(first, last - (self.capacity - 1) * self.step)
+
+        bucket = first
+        while bucket <= last:
+            chunk_end = min(last, bucket + (READ_CHUNK - 1) * self.step)
+            with self.lock:
+                if self.closed:
+                    return  # Released while being read
+                records = [
+                    RECORD.unpack_from(self.mm, self._offset(b))
+                    for b in range(bucket, chunk_end + 1, self.step)
+                ]
+            for b, record in zip(range(bucket, chunk_end + 1, self.step), records):
+                if record[0] == b:
+                    yield record
+            bucket = chunk_end + self.step
+
+    def flush(self):
+        """Flush dirty pages to disk"""
+        with self.lock:
+            if not self.closed:
+                self.mm.flush()
+
+    def close(self):
+        """Flush and close the file"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.mm.flush()
+            self.mm.close()
+            self.file.close()
+
+class TimeSeriesStore:
+    """Per-interface rx/tx history rolled up into second/minute/hour/day buckets"""
+
+    def __init__(self, data_dir, resolutions=None):
+        self.data_dir = data_dir
+        self.resolutions = resolutions or RESOLUTIONS
+        self.series = {}
+        self.lock = threading.Lock()
+        os.makedirs(data_dir, exist_ok=True)
+
+    def get_series(self, interface, resolution):
+        """Return (opening or creating if needed) the series file for an interface"""
+        key = (interface, resolution)
+        series = self.series.get(key)
+        if series is None:
+            with self.lock:
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = self._open(interface, resolution)
+        return series
+
+    def _open(self, interface, resolution):
+        """Open the series file for an interface and resolution"""
+        step, capacity = self.resolutions[resolution]
+        return SeriesFile(os.path.join(self.data_dir, f"{interface}.{resolution}.tsdb"), step, capacity)
+
+    def add_sample(self, interface, timestamp, rx_rate, tx_rate, elapsed):
+        """Record one rate sample covering `elapsed` seconds in every resolution"""
+        rx_bytes = rx_rate * elapsed
+        tx_bytes = tx_rate * elapsed
+        for resolution in self.resolutions:
+            self.get_series(interface, resolution).add(timestamp, elapsed, rx_bytes, tx_bytes, rx_rate, tx_rate)
+
+    def read(self, interface, resolution, start, end):
+        """Yield stored records for an interface and resolution"""
+        if resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        if interface not in self.interfaces():
+            return iter(())
+        series = self.series.get((interface, resolution))
+        if series is not None:
+            return series.read(start, end)
+        return self._read_closed(interface, resolution, start, end)
+
+    def _read_closed(self, interface, resolution, start, end):
+        """Read a series nobody is writing (e.g. a departed interface) without keeping it open"""
+        series = self._open(interface, resolution)
+        try:
+            yield from series.read(start, end)
+        finally:
+            series.close()
+
+    def interfaces(self):
+        """Interfaces with stored history"""
+        names = set(interface for interface, _ in self.series)
+        for filename in os.listdir(self.data_dir):
+            if filename.endswith('.tsdb'):
+                names.add(filename.rsplit('.', 2)[0])
+        return sorted(names)
+
+    def release(self, interface):
+        """Close an interface's series files; its history stays on disk and reopens on the next sample"""
+        with self.lock:
+            keys = [key for key in self.series if key[0] == interface]
+            for key in keys:
+                self.series.pop(key).close()
+
+    def flush(self):
+        """Flush all series files"""
+        for series in list(self.series.values()):
+            series.flush()
+
+    def close(self):
+        """Close all series files"""
+        with self.lock:
+            for series in self.series.values():
+                series.close()
+            self.series = {}
+
+def choose_resolution(resolutions, start, end, step, now):
+    """Pick the coarsest resolution that is no coarser than step and still covers start"""
+    candidates = sorted(resolutions.items(), key=lambda item: item[1][0])
+    chosen = candidates[0][0]
+    for name, (res_step, capacity) in candidates:
+        if res_step > step:
+            break
+        chosen = name
+
+    # Prefer coverage: fall back to coarser data if the range is older than retention
+    for name, (res_step, capacity) in candidates:
+        if resolutions[chosen][0] <= res_step and now - res_step * capacity <= start:
+            return name
+    return candidates[-1][0]
+
+def plan_query(resolutions, start, end, step=None, max_points=MAX_POINTS, now=None):
+    """Return (step, resolution) for a range so at most max_points buckets come back"""
+    span = max(end - start, 1)
+    min_step = math.ceil(span / max(1, min(max_points, MAX_POINTS)))
+    step = max(int(step or 0), min_step, 1)
+    return step, choose_resolution(resolutions, start, end, step, now if now is not None else end)
+
+def downsample(records, start, step):
+    """Aggregate stored records into step-sized buckets.
+
+    Yields (bucket, seconds, rx_bytes, tx_bytes, rx_min, rx_max, tx_min, tx_max)
+    one output bucket at a time, so memory stays flat for any input length.
+    """
+    current = None
+    for record in records:
+        bucket = start + (int(record[0] - start) // step) * step
+        if current is not None and current[0] == bucket:
+            current = (
+                bucket,
+                current[1] + record[1],
+                current[2] + record[2],
+                current[3] + record[3],
+                min(current[4], record[4]),
+                max(current[5], record[5]),
+                min(current[6], record[6]),
+                max(current[7], record[7])
+            )
+        else:
+            if current is not None:
+                yield current
+            current = (bucket,) + tuple(record[1:])
+    if current is not None:
+        yield current
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+V2RayZone Dash - vnstat Database Reader
+Reads today, month and daily history straight from vnstat 2.x's SQLite database
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+
+# Configuration
+VNSTAT_DB = '/var/lib/vnstat/vnstat.db'
+BUSY_TIMEOUT = 2  # seconds to wait while vnstatd holds its write lock
+CACHED_STATEMENTS = 16
+DAILY_HISTORY_DAYS = 30
+
+# Targeted queries; each is served by vnstat's UNIQUE (interface, date) index
+INTERFACES_QUERY = 'SELECT id, name FROM interface ORDER BY id'
+DAYS_QUERY = 'SELECT date, rx, tx FROM day WHERE interface = ? ORDER BY date DESC LIMIT ?'
+MONTH_QUERY = 'SELECT date, rx, tx FROM month WHERE interface = ? ORDER BY date DESC LIMIT 1'
+
+logger = logging.getLogger(__name__)
+
+def file_signature(path):
+    """Identity and change marker of the database plus its WAL file, if any"""
+    stat = os.stat(path)
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    try:
+        wal = os.stat(f"{path}-wal")
+        signature += (wal.st_mtime_ns, wal.st_size)
+    except FileNotFoundError:
+        pass
+    return signature
+
+class VnstatDatabase:
+    """Read-only access to vnstat's database, re-queried only when the file changes.
+
+    Direct mode keeps one read-only connection open on the live database.
+    Copy mode takes a consistent in-memory copy with the SQLite backup API
+    whenever the file changes and queries that, so vnstatd is never kept
+    waiting on our read lock. Either way the connection is long-lived, so
+    sqlite3 reuses its prepared statements across refreshes, and vnstatd
+    only writes every few minutes, so most refreshes are served from cache.
+    """
+
+    def __init__(self, path=VNSTAT_DB, copy=False, history_days=DAILY_HISTORY_DAYS):
+        self.path = path
+        self.copy = copy
+        self.history_days = history_days
+        self.connection = None
+        self.inode = None
+        self.signature = None
+        self.usage_cache = None
+        self.lock = threading.Lock()
+
+    def usage(self):
+        """Return {interface: usage} in the same shape as collector.parse_vnstat_all()"""
+        with self.lock:
+            try:
+                signature = file_signature(self.path)
+                if signature == self.signature and self.usage_cache is not None:
+                    return self.usage_cache
+
+                self._connect(signature)
+                usage = self._query()
+            except (OSError, sqlite3.Error) as e:
+                self._close_locked()
+                raise RuntimeError(f"Could not read vnstat database {self.path}: {e}")
+
+            self.signature = signature
+            self.usage_cache = usage
+            return usage
+
+    def close(self):
+        """Close the connection"""
+        with self.lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        """Drop the connection and cached results (lock must be held)"""
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
+        self.inode = None
+        self.signature = None
+        self.usage_cache = None
+
+    def _connect(self, signature):
+        """Open (or refresh) the connection the queries run on"""
+        if self.copy:
+            if self.connection is None:
+                self.connection = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False,
+                                                  cached_statements=CACHED_STATEMENTS)
+            source = self._open_source()
+            try:
+                source.backup(self.connection)
+            finally:
+                source.close()
+            return
+
+        # A replaced database file (new inode) needs a new connection
+        if self.connection is None or self.inode != signature[0]:
+            self._close_locked()
+            self.connection = self._open_source()
+            self.inode = signature[0]
+
+    def _open_source(self):
+        """Open the live database read-only"""
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT, isolation_level=None,
+                               check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+
+    def _query(self):
+        """Run the per-interface queries in one read transaction"""
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN')
+        try:
+            usage = {}
+            for interface_id, name in cursor.execute(INTERFACES_QUERY).fetchall():
+                days = cursor.execute(DAYS_QUERY, (interface_id, self.history_days)).fetchall()
+                month = cursor.execute(MONTH_QUERY, (interface_id,)).fetchone()
+                usage[name] = self._usage_block(days, month)
+            return usage
+        finally:
+            cursor.execute('COMMIT')
+
+    @staticmethod
+    def _usage_block(days, month):
+        """Build one interface's usage block from newest-first day rows and the latest month row"""
+        block = {
+            'today': {'rx': 0, 'tx': 0, 'total': 0},
+            'month': {'rx': 0, 'tx': 0, 'total': 0},
+            'daily_history': [
+                {'date': str(date)[:10], 'rx': rx, 'tx': tx}
+                for date, rx, tx in reversed(days)
+            ]
+        }
+        if days:
+            _, rx, tx = days[0]
+            block['today'] = {'rx': rx, 'tx': tx, 'total': rx + tx}
+        if month is not None:
+            _, rx, tx = month
+            block['month'] = {'rx': rx, 'tx': tx, 'total': rx + tx}
+        return block